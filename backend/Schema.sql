@@ -30,7 +30,8 @@ CREATE TABLE IF NOT EXISTS transactions (
     updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, date DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+    ON transactions (user_id, date DESC, created_at DESC, transaction_id DESC);
 CREATE INDEX IF NOT EXISTS idx_transactions_user_merchant ON transactions (user_id, merchant);
 CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_import_fingerprint
     ON transactions (user_id, import_fingerprint) WHERE import_fingerprint IS NOT NULL;
@@ -68,7 +69,9 @@ CREATE TABLE IF NOT EXISTS merchant_rules (
     is_essential BOOLEAN,
     created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE (user_id, merchant_pattern)
+    match_type VARCHAR(16) NOT NULL DEFAULT 'exact'
+        CONSTRAINT merchant_rules_match_type_check CHECK (match_type IN ('exact', 'prefix', 'contains', 'regex')),
+    CONSTRAINT merchant_rules_user_id_match_type_merchant_pattern_key UNIQUE (user_id, match_type, merchant_pattern)
 );
 
 CREATE TABLE IF NOT EXISTS import_batches (
@@ -77,6 +80,11 @@ CREATE TABLE IF NOT EXISTS import_batches (
     source VARCHAR(32) NOT NULL CHECK (source IN ('CSVImport', 'BankStatementPDF', 'FinancialSMS')),
     filename VARCHAR(255),
     status VARCHAR(32) NOT NULL DEFAULT 'review_required',
+    -- Progress of a streamed upload, committed chunk by chunk.
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    rows_duplicate INTEGER NOT NULL DEFAULT 0,
+    rows_invalid INTEGER NOT NULL DEFAULT 0,
+    error_message VARCHAR(255),
     created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     confirmed_at TIMESTAMPTZ
 );
@@ -101,6 +109,18 @@ CREATE TABLE IF NOT EXISTS import_items (
 
 CREATE INDEX IF NOT EXISTS idx_import_items_batch_status ON import_items (import_id, status);
 
+-- A user's column mapping for a bank export, keyed by its normalised header row.
+CREATE TABLE IF NOT EXISTS import_header_profiles (
+    profile_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    header_signature CHAR(64) NOT NULL,
+    headers JSONB NOT NULL,
+    column_map JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, header_signature)
+);
+
 CREATE TABLE IF NOT EXISTS recurring_commitments (
     commitment_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
@@ -129,7 +149,7 @@ CREATE TABLE IF NOT EXISTS expense_insights (
     amount NUMERIC(12, 2),
     projected_annual_cost NUMERIC(12, 2),
     evidence JSONB NOT NULL DEFAULT '{}'::jsonb,
-    status VARCHAR(32) NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'helpful', 'incorrect', 'expected', 'ignored')),
+    status VARCHAR(32) NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'helpful', 'incorrect', 'expected', 'ignored', 'resolved')),
     feedback_at TIMESTAMPTZ,
     created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
@@ -163,3 +183,312 @@ CREATE TABLE IF NOT EXISTS chat_messages (
 
 CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created
     ON chat_messages (session_id, created_at, message_id);
+
+-- Incremental expense insights. Every expense write marks the merchants it
+-- touched as dirty, so a refresh recomputes only those merchants instead of
+-- re-reading the user's whole history. The key mirrors the merchant grouping
+-- in expense_intelligence.build_expense_insights.
+CREATE OR REPLACE FUNCTION expense_merchant_key(merchant TEXT, title TEXT)
+RETURNS TEXT LANGUAGE SQL IMMUTABLE AS $$
+    SELECT lower(btrim(COALESCE(NULLIF(merchant, ''), title, '')))
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_merchant_key
+    ON transactions (user_id, expense_merchant_key(merchant, title))
+    WHERE transaction_type = 'Expense';
+
+CREATE TABLE IF NOT EXISTS expense_insight_merchants (
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    merchant_key VARCHAR(255) NOT NULL,
+    dirty BOOLEAN NOT NULL DEFAULT TRUE,
+    insight_keys TEXT[] NOT NULL DEFAULT '{}',
+    refreshed_at TIMESTAMPTZ,
+    PRIMARY KEY (user_id, merchant_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_expense_insight_merchants_dirty
+    ON expense_insight_merchants (user_id) WHERE dirty;
+
+-- Price-creep windows move with the calendar, so recent merchants are
+-- re-marked once per day even without writes.
+CREATE TABLE IF NOT EXISTS expense_insight_state (
+    user_id UUID PRIMARY KEY REFERENCES customers(user_id) ON DELETE CASCADE,
+    computed_on DATE NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION mark_expense_merchants_dirty()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO expense_insight_merchants (user_id, merchant_key)
+        SELECT DISTINCT user_id, expense_merchant_key(merchant, title)
+        FROM new_rows WHERE transaction_type = 'Expense'
+        ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO expense_insight_merchants (user_id, merchant_key)
+        -- Rows removed by an account deletion cascade have no owner to mark.
+        SELECT DISTINCT user_id, expense_merchant_key(merchant, title)
+        FROM old_rows WHERE transaction_type = 'Expense'
+          AND EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
+    ELSE
+        -- Only columns the insight rules read can change a merchant's signals.
+        INSERT INTO expense_insight_merchants (user_id, merchant_key)
+        SELECT DISTINCT changed.user_id, changed.merchant_key
+        FROM old_rows AS before_row
+        JOIN new_rows AS after_row USING (transaction_id)
+        CROSS JOIN LATERAL (VALUES
+            (before_row.user_id, expense_merchant_key(before_row.merchant, before_row.title), before_row.transaction_type),
+            (after_row.user_id, expense_merchant_key(after_row.merchant, after_row.title), after_row.transaction_type)
+        ) AS changed (user_id, merchant_key, transaction_type)
+        WHERE changed.transaction_type = 'Expense'
+          AND (before_row.amount, before_row.date, before_row.merchant, before_row.title, before_row.transaction_type)
+              IS DISTINCT FROM (after_row.amount, after_row.date, after_row.merchant, after_row.title, after_row.transaction_type)
+        ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_insights_insert ON transactions;
+CREATE TRIGGER trg_transactions_insights_insert AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_expense_merchants_dirty();
+DROP TRIGGER IF EXISTS trg_transactions_insights_update ON transactions;
+CREATE TRIGGER trg_transactions_insights_update AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_expense_merchants_dirty();
+DROP TRIGGER IF EXISTS trg_transactions_insights_delete ON transactions;
+CREATE TRIGGER trg_transactions_insights_delete AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_expense_merchants_dirty();
+
+-- Monthly rollups. Every transaction write adjusts the per-month totals it
+-- touched, so expense guidance and the assistant's context read a few rows
+-- per month instead of scanning the whole ledger. Months are truncated in the
+-- server's time zone, as the queries that read them are.
+CREATE TABLE IF NOT EXISTS transaction_monthly_rollups (
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    transaction_type VARCHAR(50) NOT NULL,
+    is_essential BOOLEAN NOT NULL,
+    total NUMERIC(16, 2) NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month, category, transaction_type, is_essential)
+);
+
+CREATE OR REPLACE FUNCTION apply_transaction_rollups()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    -- Deltas are grouped per key and applied in key order, so one statement
+    -- touches each rollup row once and concurrent writers lock in the same order.
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO transaction_monthly_rollups AS rollup
+            (user_id, month, category, transaction_type, is_essential, total, transaction_count)
+        SELECT user_id, date_trunc('month', date)::date, category, transaction_type, is_essential,
+               SUM(amount), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4, 5 ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (user_id, month, category, transaction_type, is_essential) DO UPDATE SET
+            total = rollup.total + EXCLUDED.total,
+            transaction_count = rollup.transaction_count + EXCLUDED.transaction_count;
+        RETURN NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO transaction_monthly_rollups AS rollup
+            (user_id, month, category, transaction_type, is_essential, total, transaction_count)
+        -- Rows removed by an account deletion cascade have no owner to update.
+        SELECT user_id, date_trunc('month', date)::date, category, transaction_type, is_essential,
+               -SUM(amount), -COUNT(*)
+        FROM old_rows
+        WHERE EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        GROUP BY 1, 2, 3, 4, 5 ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (user_id, month, category, transaction_type, is_essential) DO UPDATE SET
+            total = rollup.total + EXCLUDED.total,
+            transaction_count = rollup.transaction_count + EXCLUDED.transaction_count;
+    ELSE
+        INSERT INTO transaction_monthly_rollups AS rollup
+            (user_id, month, category, transaction_type, is_essential, total, transaction_count)
+        SELECT changed.user_id, changed.month, changed.category, changed.transaction_type,
+               changed.is_essential, SUM(changed.amount), SUM(changed.count)
+        FROM old_rows AS before_row
+        JOIN new_rows AS after_row USING (transaction_id)
+        CROSS JOIN LATERAL (VALUES
+            (before_row.user_id, date_trunc('month', before_row.date)::date, before_row.category,
+             before_row.transaction_type, before_row.is_essential, -before_row.amount, -1),
+            (after_row.user_id, date_trunc('month', after_row.date)::date, after_row.category,
+             after_row.transaction_type, after_row.is_essential, after_row.amount, 1)
+        ) AS changed (user_id, month, category, transaction_type, is_essential, amount, count)
+        WHERE (before_row.user_id, before_row.date, before_row.category, before_row.transaction_type,
+               before_row.is_essential, before_row.amount)
+              IS DISTINCT FROM (after_row.user_id, after_row.date, after_row.category,
+               after_row.transaction_type, after_row.is_essential, after_row.amount)
+        GROUP BY 1, 2, 3, 4, 5 ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (user_id, month, category, transaction_type, is_essential) DO UPDATE SET
+            total = rollup.total + EXCLUDED.total,
+            transaction_count = rollup.transaction_count + EXCLUDED.transaction_count;
+    END IF;
+    DELETE FROM transaction_monthly_rollups
+    WHERE transaction_count = 0 AND user_id IN (SELECT DISTINCT user_id FROM old_rows);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_rollups_insert ON transactions;
+CREATE TRIGGER trg_transactions_rollups_insert AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_rollups();
+DROP TRIGGER IF EXISTS trg_transactions_rollups_update ON transactions;
+CREATE TRIGGER trg_transactions_rollups_update AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_rollups();
+DROP TRIGGER IF EXISTS trg_transactions_rollups_delete ON transactions;
+CREATE TRIGGER trg_transactions_rollups_delete AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_rollups();
+
+-- Ledger versions. Any write to a user's transactions or commitments bumps
+-- their version, which keys the cached chat snapshot (story and financial
+-- context), so a snapshot is reused exactly until the ledger changes.
+CREATE TABLE IF NOT EXISTS ledger_versions (
+    user_id UUID PRIMARY KEY REFERENCES customers(user_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+CREATE OR REPLACE FUNCTION bump_ledger_versions()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO ledger_versions (user_id)
+        -- Rows removed by an account deletion cascade have no owner to bump.
+        SELECT DISTINCT user_id FROM old_rows
+        WHERE EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = ledger_versions.version + 1;
+    ELSE
+        INSERT INTO ledger_versions (user_id)
+        SELECT DISTINCT user_id FROM new_rows ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = ledger_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_version_insert ON transactions;
+CREATE TRIGGER trg_transactions_version_insert AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_transactions_version_update ON transactions;
+CREATE TRIGGER trg_transactions_version_update AFTER UPDATE ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_transactions_version_delete ON transactions;
+CREATE TRIGGER trg_transactions_version_delete AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_commitments_version_insert ON recurring_commitments;
+CREATE TRIGGER trg_commitments_version_insert AFTER INSERT ON recurring_commitments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_commitments_version_update ON recurring_commitments;
+CREATE TRIGGER trg_commitments_version_update AFTER UPDATE ON recurring_commitments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_commitments_version_delete ON recurring_commitments;
+CREATE TRIGGER trg_commitments_version_delete AFTER DELETE ON recurring_commitments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+
+-- Transactional email outbox. Routes insert messages in the same transaction
+-- as the change that caused them; email_outbox.py delivers them with retries,
+-- so a Brevo slowdown never holds a request or a database connection.
+CREATE TABLE IF NOT EXISTS email_outbox (
+    email_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID REFERENCES customers(user_id) ON DELETE CASCADE,
+    kind VARCHAR(32) NOT NULL,
+    recipient VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    text_content TEXT,
+    html_content TEXT,
+    -- Replacing or deleting the reset token cancels its queued email.
+    reset_token_id UUID REFERENCES password_reset_tokens(token_id) ON DELETE SET NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'cancelled')),
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMPTZ,
+    last_error VARCHAR(500),
+    sent_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+    ON email_outbox (next_attempt_at) WHERE status IN ('pending', 'sending');
+
+-- Merchant rule versions. Any write to a user's merchant rules bumps their
+-- version, which keys each worker's compiled copy of the rules, so imports
+-- match in memory and a changed rule is picked up on the next request.
+CREATE TABLE IF NOT EXISTS merchant_rule_versions (
+    user_id UUID PRIMARY KEY REFERENCES customers(user_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+CREATE OR REPLACE FUNCTION bump_merchant_rule_versions()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO merchant_rule_versions (user_id)
+        -- Rules removed by an account deletion cascade have no owner to bump.
+        SELECT DISTINCT user_id FROM old_rows
+        WHERE EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = merchant_rule_versions.version + 1;
+    ELSE
+        INSERT INTO merchant_rule_versions (user_id)
+        SELECT DISTINCT user_id FROM new_rows ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = merchant_rule_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_merchant_rules_version_insert ON merchant_rules;
+CREATE TRIGGER trg_merchant_rules_version_insert AFTER INSERT ON merchant_rules
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_merchant_rule_versions();
+DROP TRIGGER IF EXISTS trg_merchant_rules_version_update ON merchant_rules;
+CREATE TRIGGER trg_merchant_rules_version_update AFTER UPDATE ON merchant_rules
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_merchant_rule_versions();
+DROP TRIGGER IF EXISTS trg_merchant_rules_version_delete ON merchant_rules;
+CREATE TRIGGER trg_merchant_rules_version_delete AFTER DELETE ON merchant_rules
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_merchant_rule_versions();
+
+-- Retroactive merchant rules. Creating or changing a rule queues a backfill
+-- that rule_backfill.py applies to the user's past transactions in chunks,
+-- each committed on its own; the row reports its progress to the client.
+-- The transaction triggers above keep insights, rollups and ledger versions
+-- current as the chunks land.
+CREATE TABLE IF NOT EXISTS merchant_rule_backfills (
+    rule_id UUID PRIMARY KEY REFERENCES merchant_rules(rule_id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    rows_total INTEGER,
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    rows_updated INTEGER NOT NULL DEFAULT 0,
+    -- Keyset position of the last chunk, newest transactions first.
+    after_date TIMESTAMPTZ,
+    after_created_at TIMESTAMPTZ,
+    after_transaction_id UUID,
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    lease_id UUID,
+    locked_until TIMESTAMPTZ,
+    error_message VARCHAR(255),
+    queued_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_merchant_rule_backfills_due
+    ON merchant_rule_backfills (queued_at) WHERE status IN ('pending', 'running');
@@ -7,25 +7,31 @@ and evidence-backed rather than model-generated database queries.
 
 from __future__ import annotations
 
+import base64
+import csv
 import hashlib
 import html
+import io
 import json
 import os
+import queue
 import re
 import secrets
+import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal, InvalidOperation
-from functools import wraps
-from typing import Any, Iterator
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from functools import partial, wraps
+from itertools import islice
+from typing import Any, Callable, Iterator
 
 import psycopg2
 from dotenv import load_dotenv
-from flask import Flask, g, jsonify, request
-from flask_bcrypt import Bcrypt
+from flask import Flask, g, has_request_context, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import (
     JWTManager,
@@ -37,12 +43,78 @@ from flask_jwt_extended import (
 )
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
 try:  # Supports both `python backend/app.py` and `flask --app backend.app`.
-    from .expense_intelligence import build_expense_insights, build_expense_story
+    from .db_pool import ConnectionPool, PoolExhausted
+    from .chat_stream import ReplyExtractor, sse_event
+    from .data_export import encode_stream, write_csv, write_json, write_ndjson
+    from .expense_intelligence import (
+        EXPENSE_RECORD_COLUMNS,
+        build_expense_insights,
+        build_expense_story,
+        expense_records,
+        rank_insights,
+    )
+    from .instrumentation import (
+        Metrics,
+        SlowRequestProfiler,
+        TimedCursor,
+        TimedRealDictCursor,
+        begin_profile,
+        end_profile,
+        timed,
+        timer,
+    )
+    from .json_encoding import FastJSONProvider, to_json
+    from .merchant_rules import CompiledRules, merchant_text, merge_rule, normalise_pattern
+    from .model_client import ModelClients
+    from .password_hashing import HasherBusy, PasswordHasher
+    from .prepared_statements import QueryRegistry
+    from .snapshot_cache import LocalSnapshotCache, SharedSnapshotCache
+    from .statement_import import (
+        COLUMN_FIELDS,
+        StatementFormatError,
+        header_signature,
+        iter_csv_items,
+        iter_ofx_items,
+    )
+    from .token_revocation import RevocationCache
 except ImportError:  # pragma: no cover - direct-script fallback
-    from expense_intelligence import build_expense_insights, build_expense_story
+    from db_pool import ConnectionPool, PoolExhausted
+    from chat_stream import ReplyExtractor, sse_event
+    from data_export import encode_stream, write_csv, write_json, write_ndjson
+    from expense_intelligence import (
+        EXPENSE_RECORD_COLUMNS,
+        build_expense_insights,
+        build_expense_story,
+        expense_records,
+        rank_insights,
+    )
+    from instrumentation import (
+        Metrics,
+        SlowRequestProfiler,
+        TimedCursor,
+        TimedRealDictCursor,
+        begin_profile,
+        end_profile,
+        timed,
+        timer,
+    )
+    from json_encoding import FastJSONProvider, to_json
+    from merchant_rules import CompiledRules, merchant_text, merge_rule, normalise_pattern
+    from model_client import ModelClients
+    from password_hashing import HasherBusy, PasswordHasher
+    from prepared_statements import QueryRegistry
+    from snapshot_cache import LocalSnapshotCache, SharedSnapshotCache
+    from statement_import import (
+        COLUMN_FIELDS,
+        StatementFormatError,
+        header_signature,
+        iter_csv_items,
+        iter_ofx_items,
+    )
+    from token_revocation import RevocationCache
 
 load_dotenv()
 
@@ -76,10 +148,9 @@ app.config.update(
     JWT_ACCESS_TOKEN_EXPIRES=timedelta(minutes=30),
     JWT_REFRESH_TOKEN_EXPIRES=timedelta(days=30),
     JWT_TOKEN_LOCATION=["headers"],
-    JSON_SORT_KEYS=False,
 )
+app.json = FastJSONProvider(app)
 CORS(app, resources={r"/*": {"origins": _origins()}}, supports_credentials=False)
-bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
 limiter = Limiter(
     key_func=get_remote_address,
@@ -103,19 +174,132 @@ def get_db_connection():
     )
 
 
+_pool: ConnectionPool | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def _connection_pool() -> ConnectionPool:
+    """Return this worker's pool, creating it lazily after gunicorn forks."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # A pool inherited from the master process shares its sockets
+                # with every sibling worker, so each process opens its own.
+                _pool = ConnectionPool(
+                    get_db_connection,
+                    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+                    checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def _borrow_connection(pool: ConnectionPool) -> Any:
+    try:
+        return pool.getconn()
+    except PoolExhausted:
+        app.logger.warning("Database pool exhausted: %s", pool.stats())
+        raise ApiError("The service is busy. Please try again.", 503, "service_busy")
+
+
+password_hasher = PasswordHasher(
+    rounds=int(os.getenv("BCRYPT_LOG_ROUNDS", "12")),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_queue=int(os.getenv("PASSWORD_HASH_QUEUE", "16")),
+)
+
+
+def _password_work(function: Callable[..., Any], *args: Any) -> Any:
+    # bcrypt runs off the request thread; a saturated pool answers at once.
+    try:
+        return function(*args)
+    except HasherBusy:
+        app.logger.warning("Password hashing pool saturated: %s", password_hasher.stats())
+        raise ApiError("The service is busy. Please try again.", 503, "service_busy")
+
+
+# Opt-in: timed cursors, a Server-Timing header, /metrics and sampled
+# profiles of slow requests. Off, cursors are the plain psycopg2 ones.
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "false") == "true"
+_DICT_CURSOR = TimedRealDictCursor if INSTRUMENTATION_ENABLED else RealDictCursor
+_TUPLE_CURSOR = TimedCursor if INSTRUMENTATION_ENABLED else None
+
+
+def _request_db() -> tuple[Any, RealDictCursor]:
+    """Borrow one connection and cursor lazily for the whole request.
+
+    The token blocklist check and the view share it, so an authenticated call
+    checks out a single connection even when the revocation cache refreshes.
+    """
+    if "db" not in g:
+        connection = _borrow_connection(_connection_pool())
+        g.db = (connection, connection.cursor(cursor_factory=_DICT_CURSOR))
+    return g.db
+
+
+def _return_request_connection(error: BaseException | None = None) -> None:
+    """Hand the request's connection back to the pool before the request ends.
+
+    Views call this ahead of slow work that needs no database, such as a model
+    call; a later ``db_cursor()`` borrows a fresh connection.
+    """
+    db = g.pop("db", None)
+    if db is None:
+        return
+    connection, cursor = db
+    broken = False
+    try:
+        # db_cursor() blocks have already committed or rolled back their own
+        # work; this only ends a transaction left open by a bare read.
+        if error is None:
+            connection.commit()
+        else:
+            connection.rollback()
+    except psycopg2.Error:
+        broken = True
+    finally:
+        cursor.close()
+        _connection_pool().putconn(connection, discard=broken)
+
+
+@app.teardown_request
+def _release_request_db(error: BaseException | None) -> None:
+    _return_request_connection(error)
+
+
 @contextmanager
 def db_cursor() -> Iterator[tuple[Any, RealDictCursor]]:
-    connection = get_db_connection()
-    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    if has_request_context():
+        pool = None
+        connection, cursor = _request_db()
+    else:
+        pool = _connection_pool()
+        connection = _borrow_connection(pool)
+        cursor = connection.cursor(cursor_factory=_DICT_CURSOR)
+    broken = False
     try:
         yield connection, cursor
         connection.commit()
     except Exception:
-        connection.rollback()
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            broken = True
         raise
     finally:
-        cursor.close()
-        connection.close()
+        if pool is not None:
+            cursor.close()
+            pool.putconn(connection, discard=broken)
+
+
+# The hottest statements run as named prepared statements on each pooled
+# connection. Set PREPARED_STATEMENTS=false behind a transaction-mode PgBouncer.
+queries = QueryRegistry(enabled=os.getenv("PREPARED_STATEMENTS", "true") == "true")
 
 
 def _json(value: Any) -> Any:
@@ -133,7 +317,8 @@ def _json(value: Any) -> Any:
 
 
 def _response(payload: dict[str, Any], status: int = 200):
-    return jsonify(_json({"status": "success", **payload})), status
+    # The JSON provider converts Decimal, datetime and UUID values as it encodes.
+    return jsonify({"status": "success", **payload}), status
 
 
 def _request_json() -> dict[str, Any]:
@@ -239,38 +424,33 @@ def _auth_payload(user_id: str, name: str, email: str, phone_no: str | None = No
     }
 
 
-def _send_brevo_email(recipient: str, subject: str, text_content: str, html_content: str) -> None:
-    """Send a branded FinManager transactional email with Brevo."""
-    api_key = os.getenv("BREVO_API_KEY")
-    sender_email = os.getenv("BREVO_SENDER_EMAIL")
-    sender_name = os.getenv("BREVO_SENDER_NAME", "FinManager")
-    if not api_key or not sender_email:
-        raise RuntimeError("Brevo email is not configured.")
+def _email_configured() -> bool:
+    return bool(os.getenv("BREVO_API_KEY") and os.getenv("BREVO_SENDER_EMAIL"))
 
-    payload = {
-        "sender": {"name": sender_name, "email": sender_email},
-        "to": [{"email": recipient}],
-        "subject": subject,
-        "textContent": text_content,
-        "htmlContent": html_content,
-    }
-    request_body = json.dumps(payload).encode("utf-8")
-    brevo_request = Request(
-        "https://api.brevo.com/v3/smtp/email",
-        data=request_body,
-        headers={
-            "accept": "application/json",
-            "api-key": api_key,
-            "content-type": "application/json",
-        },
-        method="POST",
+
+def _queue_email(
+    cursor: RealDictCursor,
+    kind: str,
+    recipient: str,
+    content: tuple[str, str, str],
+    *,
+    user_id: str,
+    reset_token_id: str | None = None,
+) -> None:
+    """Add a message to the outbox in the caller's transaction.
+
+    The email worker (email_outbox.py) delivers it once this commits, so the
+    request never waits on Brevo.
+    """
+    subject, text_content, html_content = content
+    cursor.execute(
+        """
+        INSERT INTO email_outbox (email_id, user_id, kind, recipient, subject, text_content, html_content, reset_token_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (str(uuid.uuid4()), user_id, kind, recipient, subject, text_content, html_content, reset_token_id),
     )
-    try:
-        with urlopen(brevo_request, timeout=10) as response:
-            if not 200 <= response.status < 300:
-                raise RuntimeError(f"Brevo returned HTTP {response.status}.")
-    except (HTTPError, URLError, TimeoutError) as error:
-        raise RuntimeError("Brevo could not send transactional email.") from error
+    cursor.execute("NOTIFY email_outbox")
 
 
 def _finmanager_email(content: str) -> str:
@@ -296,11 +476,10 @@ def _finmanager_email(content: str) -> str:
 </html>"""
 
 
-def _send_password_reset_email(recipient: str, code: str) -> None:
-    """Deliver a branded, one-time password-reset code."""
+def _password_reset_email(code: str) -> tuple[str, str, str]:
+    """Subject, text and HTML of a branded, one-time password-reset code."""
     safe_code = html.escape(code)
-    _send_brevo_email(
-        recipient,
+    return (
         "Reset your FinManager password",
         (
             f"Your FinManager password reset code is {code}. "
@@ -317,11 +496,10 @@ def _send_password_reset_email(recipient: str, code: str) -> None:
     )
 
 
-def _send_welcome_email(recipient: str, name: str) -> None:
-    """Welcome new customers without making account creation depend on email."""
+def _welcome_email(name: str) -> tuple[str, str, str]:
+    """Subject, text and HTML welcoming a new customer."""
     safe_name = html.escape(name)
-    _send_brevo_email(
-        recipient,
+    return (
         "Welcome to FinManager",
         (
             f"Welcome to FinManager, {name}! Your account is ready. "
@@ -354,6 +532,54 @@ def handle_unexpected_error(error: Exception):
     return jsonify({"status": "error", "code": "internal_error", "message": "Something went wrong. Please try again."}), 500
 
 
+metrics = Metrics()
+slow_request_profiler = SlowRequestProfiler(
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    threshold=float(os.getenv("PROFILE_SLOW_MS", "1000")) / 1000,
+    directory=os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "finmanager-profiles")),
+)
+
+
+def _begin_instrumentation() -> None:
+    g.profile = begin_profile()
+    g.profiler = slow_request_profiler.start()
+
+
+def _finish_instrumentation(response):
+    profile = end_profile()
+    if profile is None:
+        return response
+    elapsed = time.perf_counter() - profile.started
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe(request.method, route, response.status_code, elapsed, profile)
+    # A streamed response's header covers the time until its first byte.
+    response.headers["Server-Timing"] = profile.server_timing(elapsed)
+    profiler = g.pop("profiler", None)
+    saved = slow_request_profiler.finish(profiler, elapsed, f"{request.method} {route}") if profiler else None
+    if elapsed >= slow_request_profiler.threshold:
+        app.logger.warning(
+            "Slow request %s %s: %.0f ms, %d statements in %.0f ms, timings %s, slowest %s, profile %s",
+            request.method, route, elapsed * 1000, len(profile.statements), profile.sql_seconds * 1000,
+            {name: round(seconds * 1000, 1) for name, seconds in profile.timings.items()},
+            [(statement.text, round(statement.seconds * 1000, 1), statement.rows) for statement in profile.slowest_statements(3)],
+            saved,
+        )
+    return response
+
+
+def _abandon_instrumentation(_error: BaseException | None) -> None:
+    # Only reached with work left over when an after_request hook failed.
+    end_profile()
+    if profiler := g.pop("profiler", None):
+        slow_request_profiler.finish(profiler, 0.0, "")
+
+
+if INSTRUMENTATION_ENABLED:
+    app.before_request(_begin_instrumentation)
+    app.after_request(_finish_instrumentation)
+    app.teardown_request(_abandon_instrumentation)
+
+
 @jwt.unauthorized_loader
 def missing_token(message: str):
     return jsonify({"status": "error", "code": "unauthorized", "message": message}), 401
@@ -369,12 +595,61 @@ def revoked_token(_header: dict[str, Any], _payload: dict[str, Any]):
     return jsonify({"status": "error", "code": "revoked_token", "message": "This session has ended."}), 401
 
 
+queries.register(
+    "revocations_all",
+    "SELECT jti, expires_at, created_at FROM token_blocklist WHERE expires_at > CURRENT_TIMESTAMP",
+)
+queries.register(
+    "revocations_since",
+    """
+    SELECT jti, expires_at, created_at FROM token_blocklist
+    WHERE expires_at > CURRENT_TIMESTAMP AND created_at > %s
+    """,
+)
+
+
+def _load_revocations(since: datetime | None) -> list[tuple[str, datetime, datetime]]:
+    with db_cursor() as (_connection, cursor):
+        if since is None:
+            queries.execute(cursor, "revocations_all")
+        else:
+            queries.execute(cursor, "revocations_since", (since,))
+        return [(row["jti"], row["expires_at"], row["created_at"]) for row in cursor.fetchall()]
+
+
+revocations = RevocationCache(
+    _load_revocations,
+    refresh_interval=float(os.getenv("TOKEN_BLOCKLIST_REFRESH_SECONDS", "5")),
+    max_staleness=float(os.getenv("TOKEN_BLOCKLIST_MAX_STALENESS", "30")),
+)
+
+
+def _create_snapshot_cache() -> LocalSnapshotCache | SharedSnapshotCache:
+    url = os.getenv("SNAPSHOT_CACHE_URL")
+    if url:
+        try:
+            import redis
+
+            return SharedSnapshotCache(
+                redis.Redis.from_url(url, socket_timeout=0.25),
+                ttl=int(os.getenv("SNAPSHOT_CACHE_TTL", "3600")),
+            )
+        except ImportError:
+            app.logger.warning("SNAPSHOT_CACHE_URL is set but redis is not installed; using the in-process cache.")
+    return LocalSnapshotCache(int(os.getenv("SNAPSHOT_CACHE_SIZE", "1024")))
+
+
+snapshot_cache = _create_snapshot_cache()
+# Compiled merchant rules, per worker, keyed by merchant_rule_versions.
+merchant_rule_cache = LocalSnapshotCache(int(os.getenv("MERCHANT_RULE_CACHE_SIZE", "1024")))
+
+
 @jwt.token_in_blocklist_loader
 def is_token_revoked(_header: dict[str, Any], payload: dict[str, Any]) -> bool:
     try:
-        with db_cursor() as (_connection, cursor):
-            cursor.execute("SELECT 1 FROM token_blocklist WHERE jti = %s", (payload["jti"],))
-            return cursor.fetchone() is not None
+        # Answered from memory; the cache only reads token_blocklist when its
+        # refresh interval has passed.
+        return revocations.is_revoked(payload["jti"])
     except Exception:
         # Failing closed is safer than accepting a token whose revocation state
         # cannot be checked.
@@ -432,28 +707,50 @@ def _fingerprint(transaction: dict[str, Any]) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-def _apply_merchant_rule(cursor: RealDictCursor, user_id: str, transaction: dict[str, Any]) -> dict[str, Any]:
-    merchant = transaction.get("merchant")
-    if not merchant:
-        return transaction
-    cursor.execute(
-        """
-        SELECT display_merchant, category, is_essential
-        FROM merchant_rules WHERE user_id = %s AND merchant_pattern = %s
-        """,
-        (user_id, merchant.casefold()),
-    )
-    rule = cursor.fetchone()
+def _merge_merchant_rule(transaction: dict[str, Any], rule: dict[str, Any] | None) -> dict[str, Any]:
     if not rule:
         return transaction
-    updated = dict(transaction)
-    if rule["display_merchant"]:
-        updated["merchant"] = rule["display_merchant"]
-    if rule["category"] and rule["category"] in (EXPENSE_CATEGORIES if updated["transaction_type"] == "Expense" else INCOME_CATEGORIES):
-        updated["category"] = rule["category"]
-    if rule["is_essential"] is not None:
-        updated["is_essential"] = rule["is_essential"]
-    return updated
+    return merge_rule(transaction, rule, EXPENSE_CATEGORIES if transaction["transaction_type"] == "Expense" else INCOME_CATEGORIES)
+
+
+queries.register("merchant_rule_version", "SELECT version FROM merchant_rule_versions WHERE user_id = %s")
+queries.register(
+    "merchant_rules_all",
+    """
+    SELECT rule_id, match_type, merchant_pattern, display_merchant, category, is_essential
+    FROM merchant_rules WHERE user_id = %s ORDER BY created_at, rule_id
+    """,
+)
+
+
+def _merchant_rules(cursor: RealDictCursor, user_id: str) -> CompiledRules:
+    """The user's rules, compiled once per rule version in each worker.
+
+    As in _chat_snapshot, the version is read first, so a rule written
+    meanwhile can only make the cached set newer than its version.
+    """
+    queries.execute(cursor, "merchant_rule_version", (user_id,))
+    row = cursor.fetchone()
+    version = str(row["version"] if row else 0)
+    rules = merchant_rule_cache.get(user_id, version)
+    if rules is None:
+        queries.execute(cursor, "merchant_rules_all", (user_id,))
+        rules = CompiledRules(cursor.fetchall())
+        merchant_rule_cache.set(user_id, version, rules)
+    return rules
+
+
+def _apply_merchant_rule(cursor: RealDictCursor, user_id: str, transaction: dict[str, Any]) -> dict[str, Any]:
+    return _merge_merchant_rule(transaction, _merchant_rules(cursor, user_id).match(merchant_text(transaction)))
+
+
+def _apply_merchant_rules(cursor: RealDictCursor, user_id: str, transactions: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Batch form of _apply_merchant_rule: the whole batch is matched in memory."""
+    rules = _merchant_rules(cursor, user_id) if transactions else None
+    if not rules:
+        return transactions
+    matched = rules.match_many(merchant_text(transaction) for transaction in transactions)
+    return [_merge_merchant_rule(transaction, rule) for transaction, rule in zip(transactions, matched)]
 
 
 TRANSACTION_COLUMNS = """
@@ -462,30 +759,76 @@ merchant, source, payment_method, recurrence_status, confidence, import_fingerpr
 is_essential, user_category_override, created_at, updated_at
 """
 
+_TRANSACTION_INSERT = """
+INSERT INTO transactions (
+    transaction_id, user_id, title, description, amount, category, transaction_type,
+    date, merchant, source, payment_method, recurrence_status, confidence,
+    import_fingerprint, is_essential, user_category_override
+)
+"""
+
+
+def _transaction_values(user_id: str, transaction: dict[str, Any], fingerprint: str | None) -> tuple[Any, ...]:
+    return (
+        str(uuid.uuid4()), user_id, transaction["title"], transaction["description"],
+        transaction["amount"], transaction["category"], transaction["transaction_type"],
+        transaction["date"], transaction["merchant"], transaction["source"],
+        transaction["payment_method"], transaction["recurrence_status"], transaction["confidence"],
+        fingerprint, transaction["is_essential"], transaction["user_category_override"],
+    )
+
+
+queries.register(
+    "transaction_insert",
+    f"""
+    {_TRANSACTION_INSERT} VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    ) ON CONFLICT (user_id, import_fingerprint)
+      WHERE import_fingerprint IS NOT NULL DO NOTHING
+      RETURNING {TRANSACTION_COLUMNS}
+    """,
+)
+queries.register(
+    "transaction_by_id",
+    f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE transaction_id = %s AND user_id = %s",
+)
+
 
 def _insert_transaction(cursor: RealDictCursor, user_id: str, transaction: dict[str, Any], fingerprint: str | None = None) -> dict[str, Any]:
     transaction = _apply_merchant_rule(cursor, user_id, transaction)
-    cursor.execute(
+    queries.execute(cursor, "transaction_insert", _transaction_values(user_id, transaction, fingerprint))
+    return cursor.fetchone()
+
+
+def _insert_transactions(
+    cursor: RealDictCursor, user_id: str, rows: list[tuple[dict[str, Any], str | None]]
+) -> list[dict[str, Any] | None]:
+    """Insert many (transaction, fingerprint) pairs in one statement.
+
+    Returns the created row for each pair, or None where the fingerprint was
+    already recorded, mirroring _insert_transaction.
+    """
+    if not rows:
+        return []
+    transactions = _apply_merchant_rules(cursor, user_id, [transaction for transaction, _fingerprint in rows])
+    values = [
+        _transaction_values(user_id, transaction, fingerprint)
+        for transaction, (_original, fingerprint) in zip(transactions, rows)
+    ]
+    created = execute_values(
+        cursor,
         f"""
-        INSERT INTO transactions (
-            transaction_id, user_id, title, description, amount, category, transaction_type,
-            date, merchant, source, payment_method, recurrence_status, confidence,
-            import_fingerprint, is_essential, user_category_override
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        ) ON CONFLICT (user_id, import_fingerprint)
+        {_TRANSACTION_INSERT} VALUES %s
+        ON CONFLICT (user_id, import_fingerprint)
           WHERE import_fingerprint IS NOT NULL DO NOTHING
           RETURNING {TRANSACTION_COLUMNS}
         """,
-        (
-            str(uuid.uuid4()), user_id, transaction["title"], transaction["description"],
-            transaction["amount"], transaction["category"], transaction["transaction_type"],
-            transaction["date"], transaction["merchant"], transaction["source"],
-            transaction["payment_method"], transaction["recurrence_status"], transaction["confidence"],
-            fingerprint, transaction["is_essential"], transaction["user_category_override"],
-        ),
+        values,
+        page_size=len(values),
+        fetch=True,
     )
-    return cursor.fetchone()
+    by_id = {str(row["transaction_id"]): row for row in created}
+    return [by_id.get(value[0]) for value in values]
 
 
 @app.get("/")
@@ -493,6 +836,29 @@ def home():
     return _response({"service": "FinManager expense-intelligence API", "version": "2"})
 
 
+@app.get("/metrics")
+@limiter.exempt
+def prometheus_metrics():
+    """Prometheus text exposition; present only with instrumentation on."""
+    if not INSTRUMENTATION_ENABLED:
+        raise ApiError("Resource not found.", 404, "not_found")
+    # Metrics name routes and pool sizes, so they are never served openly.
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        raise ApiError("Set METRICS_TOKEN to serve metrics.", 404, "not_found")
+    if not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        raise ApiError("A valid metrics token is required.", 401, "unauthorized")
+    body = metrics.render({
+        "db_pool": _connection_pool().stats(),
+        "snapshot_cache": snapshot_cache.stats(),
+        "merchant_rule_cache": merchant_rule_cache.stats(),
+        "model_clients": model_clients.stats(),
+        "password_hasher": password_hasher.stats(),
+        "prepared_statements": queries.stats(),
+    })
+    return app.response_class(body, mimetype="text/plain; version=0.0.4")
+
+
 @app.post("/auth/register")
 @app.post("/register")  # Transitional alias for the existing Flutter client.
 @limiter.limit("10 per hour")
@@ -507,6 +873,8 @@ def register():
         raise ApiError("email must be valid.")
     email = email.casefold()
     phone_no = _text(payload.get("phone_no"), "phone_no", max_length=15)
+    # Hashed before a connection is borrowed, so bcrypt never holds one.
+    password_hash = _password_work(password_hasher.hash, password)
     with db_cursor() as (_connection, cursor):
         cursor.execute("SELECT 1 FROM customers WHERE email = %s", (email,))
         if cursor.fetchone():
@@ -517,13 +885,13 @@ def register():
             INSERT INTO customers (user_id, name, email, password, phone_no)
             VALUES (%s, %s, %s, %s, %s)
             """,
-            (user_id, name, email, bcrypt.generate_password_hash(password).decode("utf-8"), phone_no),
+            (user_id, name, email, password_hash, phone_no),
         )
-    try:
-        _send_welcome_email(email, name)
-    except RuntimeError:
-        # Registration has already succeeded; an email outage must not block it.
-        app.logger.exception("Unable to send welcome email through Brevo")
+        # Queued with the account itself; an email outage cannot block registration.
+        if _email_configured():
+            _queue_email(cursor, "welcome", email, _welcome_email(name), user_id=user_id)
+        else:
+            app.logger.warning("Brevo email is not configured; no welcome email was queued.")
     return _response(_auth_payload(user_id, name, email, phone_no), 201)
 
 
@@ -542,8 +910,19 @@ def login():
             (email.casefold(),),
         )
         user = cursor.fetchone()
-    if not user or not bcrypt.check_password_hash(user["password"], password):
+    _return_request_connection()
+    if not user:
         raise ApiError("Invalid email or password.", 401, "invalid_credentials")
+    matches, new_hash = _password_work(password_hasher.verify_and_update, password, user["password"])
+    if not matches:
+        raise ApiError("Invalid email or password.", 401, "invalid_credentials")
+    if new_hash:
+        # The stored hash used another cost; it is moved to the current one.
+        with db_cursor() as (_connection, cursor):
+            cursor.execute(
+                "UPDATE customers SET password = %s WHERE user_id = %s AND password = %s",
+                (new_hash, user["user_id"], user["password"]),
+            )
     return _response(_auth_payload(str(user["user_id"]), user["name"], user["email"], user["phone_no"]))
 
 
@@ -565,23 +944,29 @@ def forgot_password():
                 "DELETE FROM password_reset_tokens WHERE user_id = %s AND used_at IS NULL",
                 (account["user_id"],),
             )
-            cursor.execute(
-                """
-                INSERT INTO password_reset_tokens (token_id, user_id, token_hash, expires_at)
-                VALUES (%s, %s, %s, CURRENT_TIMESTAMP + INTERVAL '15 minutes')
-                """,
-                (str(uuid.uuid4()), account["user_id"], hashlib.sha256(code.encode()).hexdigest()),
-            )
-            try:
-                _send_password_reset_email(email, code)
-            except RuntimeError:
-                app.logger.exception("Unable to send password reset email through Brevo")
-                # Keep account existence private even when email delivery has
-                # an outage, and make sure an unsent code cannot be used.
+            # Keep account existence private even when email is not set up,
+            # and never store a code that cannot be delivered. Replacing the
+            # earlier token above cancels any reset email still queued for it;
+            # the worker deletes the token if its email finally fails.
+            if _email_configured():
+                token_id = str(uuid.uuid4())
                 cursor.execute(
-                    "DELETE FROM password_reset_tokens WHERE user_id = %s",
-                    (account["user_id"],),
+                    """
+                    INSERT INTO password_reset_tokens (token_id, user_id, token_hash, expires_at)
+                    VALUES (%s, %s, %s, CURRENT_TIMESTAMP + INTERVAL '15 minutes')
+                    """,
+                    (token_id, account["user_id"], hashlib.sha256(code.encode()).hexdigest()),
+                )
+                _queue_email(
+                    cursor,
+                    "password_reset",
+                    email,
+                    _password_reset_email(code),
+                    user_id=str(account["user_id"]),
+                    reset_token_id=token_id,
                 )
+            else:
+                app.logger.warning("Brevo email is not configured; no password reset code was issued.")
 
     # This response is deliberately identical for existing and unknown emails.
     return _response({"message": "If an account uses that email, a reset code has been sent."})
@@ -600,7 +985,6 @@ def reset_password():
         raise ApiError("Enter the six-digit code from your email.")
     if not isinstance(password, str) or len(password) < 8:
         raise ApiError("password must be at least 8 characters.")
-
     with db_cursor() as (_connection, cursor):
         cursor.execute(
             """
@@ -618,23 +1002,36 @@ def reset_password():
             (email.casefold(),),
         )
         reset = cursor.fetchone()
-        if not reset or not secrets.compare_digest(
+        matches = reset is not None and secrets.compare_digest(
             reset["token_hash"], hashlib.sha256(code.encode()).hexdigest()
-        ):
-            if reset:
-                cursor.execute(
-                    "UPDATE password_reset_tokens SET attempts = attempts + 1 WHERE token_id = %s",
-                    (reset["token_id"],),
-                )
-            raise ApiError("That reset code is invalid or has expired.", 400, "invalid_reset_code")
+        )
+        if reset and not matches:
+            # Committed with the block, so wrong guesses count even though the
+            # request fails.
+            cursor.execute(
+                "UPDATE password_reset_tokens SET attempts = attempts + 1 WHERE token_id = %s",
+                (reset["token_id"],),
+            )
+    if not matches:
+        raise ApiError("That reset code is invalid or has expired.", 400, "invalid_reset_code")
 
+    # Only a correct code costs a hash, and no row is locked while it runs.
+    _return_request_connection()
+    password_hash = _password_work(password_hasher.hash, password)
+    with db_cursor() as (_connection, cursor):
         cursor.execute(
-            "UPDATE customers SET password = %s WHERE user_id = %s",
-            (bcrypt.generate_password_hash(password).decode("utf-8"), reset["user_id"]),
+            """
+            UPDATE password_reset_tokens SET used_at = CURRENT_TIMESTAMP
+            WHERE token_id = %s AND used_at IS NULL AND expires_at > CURRENT_TIMESTAMP
+            """,
+            (reset["token_id"],),
         )
+        if cursor.rowcount != 1:
+            # Used by a concurrent reset, or replaced, while the hash ran.
+            raise ApiError("That reset code is invalid or has expired.", 400, "invalid_reset_code")
         cursor.execute(
-            "UPDATE password_reset_tokens SET used_at = CURRENT_TIMESTAMP WHERE token_id = %s",
-            (reset["token_id"],),
+            "UPDATE customers SET password = %s WHERE user_id = %s",
+            (password_hash, reset["user_id"]),
         )
         cursor.execute("DELETE FROM password_reset_tokens WHERE user_id = %s", (reset["user_id"],))
     return _response({"message": "Your password has been reset. Please log in."})
@@ -658,33 +1055,113 @@ def logout():
             """,
             (claims["jti"], g.user_id, claims["exp"]),
         )
+    # Other workers pick the revocation up on their next blocklist poll.
+    revocations.add(claims["jti"], claims["exp"])
     return _response({"message": "Logged out."})
 
 
+TRANSACTION_COUNT_MODES = {"none", "estimate", "exact"}
+
+
+def _encode_page_cursor(row: dict[str, Any]) -> str:
+    key = [row["date"].isoformat(), row["created_at"].isoformat(), str(row["transaction_id"])]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def _decode_page_cursor(value: str) -> tuple[datetime, datetime, str]:
+    try:
+        raw_date, raw_created_at, transaction_id = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+        return datetime.fromisoformat(raw_date), datetime.fromisoformat(raw_created_at), str(uuid.UUID(transaction_id))
+    except (TypeError, ValueError):
+        raise ApiError("cursor is not valid.")
+
+
+def _transaction_count(cursor: RealDictCursor, mode: str, where: str, params: list[Any]) -> int | None:
+    if mode == "exact":
+        cursor.execute(f"SELECT COUNT(*) AS count FROM transactions WHERE {where}", params)
+        return cursor.fetchone()["count"]
+    if mode == "estimate":
+        # The planner's row estimate comes from table statistics and costs no scan.
+        cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM transactions WHERE {where}", params)
+        return int(cursor.fetchone()["QUERY PLAN"][0]["Plan"]["Plan Rows"])
+    return None
+
+
+_PAGE_AFTER = " AND (date, created_at, transaction_id) < (%s, %s, %s::uuid)"
+
+
+def _transactions_page_statement(name: str, where: str, page_filter: str) -> str:
+    if name not in queries:
+        # One extra row says whether another page exists without counting.
+        queries.register(
+            name,
+            f"""
+            SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE {where}{page_filter}
+            ORDER BY date DESC, created_at DESC, transaction_id DESC LIMIT %s OFFSET %s
+            """,
+        )
+    return name
+
+
+_transactions_page_statement("transactions_page", "user_id = %s", "")
+_transactions_page_statement("transactions_page_after", "user_id = %s", _PAGE_AFTER)
+
+
 @app.get("/transactions")
 @_owner_required
 def get_transactions():
-    page = max(int(request.args.get("page", 1)), 1)
+    """Page through a user's transactions, newest first.
+
+    Pages are keyed on (date, created_at, transaction_id): pass the previous
+    response's ``next_cursor`` as ``cursor`` and each page is an index range
+    scan however deep it is.  ``page`` keeps the older offset paging for
+    existing clients.  ``count`` chooses whether ``total`` is omitted, the
+    planner's estimate or an exact ``COUNT(*)``; it defaults to exact only for
+    offset paging.
+    """
     page_size = min(max(int(request.args.get("page_size", 100)), 1), 100)
-    filters, params = ["user_id = %s"], [g.user_id]
+    page = max(int(request.args.get("page", 1)), 1) if "page" in request.args else None
+    count_mode = request.args.get("count", "exact" if page else "none")
+    if count_mode not in TRANSACTION_COUNT_MODES:
+        raise ApiError("count must be none, estimate, or exact.")
+    # Each combination of filters is its own prepared statement.
+    filters, params, statement = ["user_id = %s"], [g.user_id], ["transactions_page"]
     if transaction_type := request.args.get("transaction_type"):
         if transaction_type not in {"Income", "Expense"}:
             raise ApiError("transaction_type must be Income or Expense.")
         filters.append("transaction_type = %s")
         params.append(transaction_type)
+        statement.append("type")
     if category := request.args.get("category"):
         filters.append("category = %s")
         params.append(category)
+        statement.append("category")
     where = " AND ".join(filters)
+    page_filter, page_params, offset = "", [], 0
+    if page:
+        offset = (page - 1) * page_size
+    elif after := request.args.get("cursor"):
+        page_filter = _PAGE_AFTER
+        page_params = list(_decode_page_cursor(after))
+        statement.append("after")
+    name = _transactions_page_statement("_".join(statement), where, page_filter)
     with db_cursor() as (_connection, cursor):
-        cursor.execute(f"SELECT COUNT(*) AS count FROM transactions WHERE {where}", params)
-        total = cursor.fetchone()["count"]
-        cursor.execute(
-            f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE {where} ORDER BY date DESC, created_at DESC LIMIT %s OFFSET %s",
-            [*params, page_size, (page - 1) * page_size],
-        )
+        total = _transaction_count(cursor, count_mode, where, params)
+        queries.execute(cursor, name, [*params, *page_params, page_size + 1, offset])
         transactions = cursor.fetchall()
-    return _response({"transactions": transactions, "pagination": {"page": page, "page_size": page_size, "total": total}})
+    has_more = len(transactions) > page_size
+    transactions = transactions[:page_size]
+    pagination = {
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_cursor": _encode_page_cursor(transactions[-1]) if has_more else None,
+    }
+    if page:
+        pagination["page"] = page
+    if total is not None:
+        pagination["total"] = total
+        pagination["total_is_estimate"] = count_mode == "estimate"
+    return _response({"transactions": transactions, "pagination": pagination})
 
 
 @app.post("/transactions")
@@ -701,7 +1178,7 @@ def add_transaction():
 @_owner_required
 def transaction_detail(transaction_id: str):
     with db_cursor() as (_connection, cursor):
-        cursor.execute(f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE transaction_id = %s AND user_id = %s", (transaction_id, g.user_id))
+        queries.execute(cursor, "transaction_by_id", (transaction_id, g.user_id))
         current = cursor.fetchone()
         if not current:
             raise ApiError("Transaction not found.", 404, "not_found")
@@ -740,6 +1217,96 @@ def _import_item_payload(item: Any, source: str) -> dict[str, Any]:
     return {**payload, "import_fingerprint": _text(item.get("import_fingerprint"), "import_fingerprint", max_length=128) or _fingerprint(payload)}
 
 
+IMPORT_ITEM_LIMIT = 50_000
+
+_IMPORT_STAGING_COLUMNS = (
+    "item_id", "title", "description", "amount", "category", "transaction_type", "transaction_date",
+    "merchant", "payment_method", "confidence", "import_fingerprint", "error_message",
+)
+IMPORT_ITEM_COLUMNS = """
+item_id, import_id, title, description, amount, category, transaction_type, transaction_date,
+merchant, payment_method, confidence, import_fingerprint, status, error_message, created_at
+"""
+
+
+def _stage_import_items(
+    cursor: RealDictCursor,
+    user_id: str,
+    import_id: str,
+    source: str,
+    items: list[Any],
+    *,
+    returning: str = IMPORT_ITEM_COLUMNS,
+) -> list[dict[str, Any]]:
+    """Validate import rows in Python, then write them in a fixed number of statements.
+
+    Rows are copied into a temporary staging table, duplicates of existing
+    transactions are found with one join on (user_id, import_fingerprint) and
+    every row lands in import_items with a single INSERT.  Invalid rows are
+    kept with status 'invalid' so the client can show what was rejected.
+    """
+    staged = io.StringIO()
+    writer = csv.writer(staged)
+    item_ids = []
+    for item in items:
+        item_id = str(uuid.uuid4())
+        item_ids.append(item_id)
+        try:
+            parsed = _import_item_payload(item, source)
+            writer.writerow((
+                item_id, parsed["title"], parsed["description"], parsed["amount"], parsed["category"],
+                parsed["transaction_type"], parsed["date"].isoformat(), parsed["merchant"],
+                parsed["payment_method"], parsed["confidence"], parsed["import_fingerprint"], None,
+            ))
+        except ApiError as error:
+            writer.writerow((
+                item_id, "Invalid import row", None, 1, "Others", "Expense", None, None, None, 0,
+                hashlib.sha256(str(item).encode()).hexdigest(), error.message[:255],
+            ))
+    staged.seek(0)
+    cursor.execute(
+        """
+        CREATE TEMPORARY TABLE IF NOT EXISTS import_staging (
+          item_id UUID, title VARCHAR(255), description TEXT, amount NUMERIC(12, 2),
+          category VARCHAR(100), transaction_type VARCHAR(50), transaction_date TIMESTAMPTZ,
+          merchant VARCHAR(255), payment_method VARCHAR(100), confidence NUMERIC(3, 2),
+          import_fingerprint VARCHAR(128), error_message VARCHAR(255)
+        ) ON COMMIT DROP
+        """
+    )
+    cursor.copy_expert(
+        f"COPY import_staging ({', '.join(_IMPORT_STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", staged
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO import_items (
+          item_id, import_id, title, description, amount, category, transaction_type,
+          transaction_date, merchant, payment_method, confidence, import_fingerprint, status, error_message
+        )
+        SELECT staged.item_id, %s::uuid, staged.title, staged.description, staged.amount, staged.category,
+               staged.transaction_type, COALESCE(staged.transaction_date, CURRENT_TIMESTAMP),
+               staged.merchant, staged.payment_method, staged.confidence, staged.import_fingerprint,
+               CASE
+                 WHEN staged.error_message IS NOT NULL THEN 'invalid'
+                 WHEN existing.transaction_id IS NOT NULL THEN 'duplicate'
+                 ELSE 'pending'
+               END,
+               staged.error_message
+        FROM import_staging AS staged
+        LEFT JOIN transactions AS existing
+          ON existing.user_id = %s AND existing.import_fingerprint = staged.import_fingerprint
+         AND staged.error_message IS NULL
+        RETURNING {returning}
+        """,
+        (import_id, user_id),
+    )
+    created = {str(row["item_id"]): row for row in cursor.fetchall()}
+    # ON COMMIT DROP clears the table at commit; this clears it for a second
+    # call in the same transaction, which would otherwise stage both batches.
+    cursor.execute("TRUNCATE import_staging")
+    return [created[item_id] for item_id in item_ids]
+
+
 @app.post("/imports")
 @_owner_required
 def create_import():
@@ -750,8 +1317,8 @@ def create_import():
     items = payload.get("items")
     if not isinstance(items, list) or not items:
         raise ApiError("items must be a non-empty list.")
-    if len(items) > 1000:
-        raise ApiError("An import is limited to 1,000 items.")
+    if len(items) > IMPORT_ITEM_LIMIT:
+        raise ApiError(f"An import is limited to {IMPORT_ITEM_LIMIT:,} items.")
     filename = _text(payload.get("filename"), "filename", max_length=255)
     with db_cursor() as (_connection, cursor):
         import_id = str(uuid.uuid4())
@@ -759,42 +1326,155 @@ def create_import():
             "INSERT INTO import_batches (import_id, user_id, source, filename) VALUES (%s, %s, %s, %s)",
             (import_id, g.user_id, source, filename),
         )
-        created_items = []
-        for item in items:
-            try:
-                parsed = _import_item_payload(item, source)
-                cursor.execute(
-                    "SELECT 1 FROM transactions WHERE user_id = %s AND import_fingerprint = %s",
-                    (g.user_id, parsed["import_fingerprint"]),
-                )
-                status = "duplicate" if cursor.fetchone() else "pending"
+        created_items = _stage_import_items(cursor, g.user_id, import_id, source, items)
+    return _response({"import": {"import_id": import_id, "source": source, "status": "review_required"}, "items": created_items}, 201)
+
+
+IMPORT_UPLOAD_CHUNK = 5_000
+IMPORT_UPLOAD_ROW_LIMIT = 250_000
+
+
+def _statement_format(filename: str | None) -> str:
+    statement_format = (request.args.get("format") or "").lower()
+    if not statement_format:
+        is_ofx = request.mimetype in {"application/x-ofx", "application/ofx"} or (filename or "").lower().endswith((".ofx", ".qfx"))
+        statement_format = "ofx" if is_ofx else "csv"
+    if statement_format not in {"csv", "ofx"}:
+        raise ApiError("format must be csv or ofx.")
+    return statement_format
+
+
+def _header_profile_resolver(user_id: str) -> Callable[[list[str]], dict[str, str] | None]:
+    def resolve(headers: list[str]) -> dict[str, str] | None:
+        with db_cursor() as (_connection, cursor):
+            cursor.execute(
+                "SELECT column_map FROM import_header_profiles WHERE user_id = %s AND header_signature = %s",
+                (user_id, header_signature(headers)),
+            )
+            profile = cursor.fetchone()
+        return profile["column_map"] if profile else None
+
+    return resolve
+
+
+@app.post("/imports/upload")
+@_owner_required
+@limiter.limit("20 per hour")
+def upload_import():
+    """Parse a raw CSV or OFX statement body as it streams in.
+
+    Rows are validated and staged in chunks, each committed on its own, so
+    memory stays flat for very large exports and the batch row reports
+    progress while the upload runs.  The batch ends in review_required, or in
+    failed with an error_message.
+    """
+    source = _text(request.args.get("source", "CSVImport"), "source", required=True, max_length=32)
+    if source not in IMPORT_SOURCES:
+        raise ApiError("source must be CSVImport, BankStatementPDF, or FinancialSMS.")
+    filename = _text(request.args.get("filename"), "filename", max_length=255)
+    statement_format = _statement_format(filename)
+    import_id = str(uuid.uuid4())
+    with db_cursor() as (_connection, cursor):
+        cursor.execute(
+            """
+            INSERT INTO import_batches (import_id, user_id, source, filename, status)
+            VALUES (%s, %s, %s, %s, 'processing')
+            """,
+            (import_id, g.user_id, source, filename),
+        )
+
+    text = io.TextIOWrapper(request.stream, encoding="utf-8-sig", errors="replace", newline="")
+    if statement_format == "ofx":
+        items = iter_ofx_items(iter(lambda: text.read(64 * 1024), ""))
+    else:
+        items = iter_csv_items(text, _header_profile_resolver(g.user_id))
+    processed = 0
+    try:
+        while chunk := list(islice(items, IMPORT_UPLOAD_CHUNK)):
+            processed += len(chunk)
+            if processed > IMPORT_UPLOAD_ROW_LIMIT:
+                raise ApiError(f"An upload is limited to {IMPORT_UPLOAD_ROW_LIMIT:,} rows.")
+            with db_cursor() as (_connection, cursor):
+                staged = _stage_import_items(cursor, g.user_id, import_id, source, chunk, returning="item_id, status")
                 cursor.execute(
                     """
-                    INSERT INTO import_items (
-                        item_id, import_id, title, description, amount, category, transaction_type,
-                        transaction_date, merchant, payment_method, confidence, import_fingerprint, status
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING *
+                    UPDATE import_batches SET rows_processed = rows_processed + %s,
+                      rows_duplicate = rows_duplicate + %s, rows_invalid = rows_invalid + %s
+                    WHERE import_id = %s
                     """,
                     (
-                        str(uuid.uuid4()), import_id, parsed["title"], parsed["description"], parsed["amount"],
-                        parsed["category"], parsed["transaction_type"], parsed["date"], parsed["merchant"],
-                        parsed["payment_method"], parsed["confidence"], parsed["import_fingerprint"], status,
+                        len(staged),
+                        sum(item["status"] == "duplicate" for item in staged),
+                        sum(item["status"] == "invalid" for item in staged),
+                        import_id,
                     ),
                 )
-            except ApiError as error:
-                cursor.execute(
-                    """
-                    INSERT INTO import_items (
-                        item_id, import_id, title, amount, category, transaction_type, transaction_date,
-                        confidence, import_fingerprint, status, error_message
-                    ) VALUES (%s, %s, %s, 1, 'Others', 'Expense', CURRENT_TIMESTAMP, 0, %s, 'invalid', %s)
-                    RETURNING *
-                    """,
-                    (str(uuid.uuid4()), import_id, "Invalid import row", hashlib.sha256(str(item).encode()).hexdigest(), error.message),
-                )
-            created_items.append(cursor.fetchone())
-    return _response({"import": {"import_id": import_id, "source": source, "status": "review_required"}, "items": created_items}, 201)
+        if not processed:
+            raise ApiError("No rows with a valid amount were found.")
+    except Exception as error:
+        if isinstance(error, ApiError):
+            message = error.message
+        elif isinstance(error, StatementFormatError):
+            message = str(error)
+        else:
+            message = "The upload could not be processed."
+        with db_cursor() as (_connection, cursor):
+            cursor.execute(
+                "UPDATE import_batches SET status = 'failed', error_message = %s WHERE import_id = %s",
+                (message[:255], import_id),
+            )
+        if isinstance(error, StatementFormatError):
+            raise ApiError(message) from error
+        raise
+
+    with db_cursor() as (_connection, cursor):
+        cursor.execute(
+            "UPDATE import_batches SET status = 'review_required' WHERE import_id = %s RETURNING *",
+            (import_id,),
+        )
+        imported = cursor.fetchone()
+    return _response({"import": imported}, 201)
+
+
+@app.route("/imports/header-profiles", methods=["GET", "POST"])
+@_owner_required
+def import_header_profiles():
+    if request.method == "GET":
+        with db_cursor() as (_connection, cursor):
+            cursor.execute(
+                "SELECT * FROM import_header_profiles WHERE user_id = %s ORDER BY updated_at DESC",
+                (g.user_id,),
+            )
+            profiles = cursor.fetchall()
+        return _response({"header_profiles": profiles})
+
+    payload = _request_json()
+    headers = payload.get("headers")
+    if not isinstance(headers, list) or not headers or not all(isinstance(header, str) for header in headers):
+        raise ApiError("headers must be a non-empty list of strings.")
+    column_map = payload.get("columns")
+    if not isinstance(column_map, dict) or not column_map:
+        raise ApiError("columns must map fields to header names.")
+    for field, header in column_map.items():
+        if field not in COLUMN_FIELDS:
+            raise ApiError(f"columns may only map {', '.join(COLUMN_FIELDS)}.")
+        if header not in headers:
+            raise ApiError(f"{field} must name one of the headers.")
+    if not {"amount", "debit", "credit"} & set(column_map):
+        raise ApiError("columns must map an amount, debit or credit column.")
+    with db_cursor() as (_connection, cursor):
+        cursor.execute(
+            """
+            INSERT INTO import_header_profiles (profile_id, user_id, header_signature, headers, column_map)
+            VALUES (%s, %s, %s, %s::jsonb, %s::jsonb)
+            ON CONFLICT (user_id, header_signature) DO UPDATE SET
+              headers = EXCLUDED.headers, column_map = EXCLUDED.column_map, updated_at = CURRENT_TIMESTAMP
+            RETURNING *
+            """,
+            (str(uuid.uuid4()), g.user_id, header_signature(headers), json.dumps(headers), json.dumps(column_map)),
+        )
+        profile = cursor.fetchone()
+    return _response({"header_profile": profile}, 201)
 
 
 @app.post("/imports/validate_csv_headers")
@@ -805,13 +1485,10 @@ def validate_csv_headers():
     if not isinstance(headers, list):
         raise ApiError("headers must be a list of strings.")
 
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
+    if not os.getenv("GROQ_API_KEY"):
         return _response({"valid": True})
 
     try:
-        from langchain_groq import ChatGroq
-        
         prompt = f"""You are a data validation assistant for FinManager. The user is trying to upload a CSV file of financial transactions.
         
 The headers of the CSV file are: {json.dumps(headers)}
@@ -824,11 +1501,7 @@ Reply with ONLY a single JSON object (no markdown, nothing outside it):
 }}
 or false if it clearly has no relation to financial transactions.
 """
-        raw = ChatGroq(
-            model_name=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
-            temperature=0.0,
-            groq_api_key=api_key,
-        ).invoke(prompt).content
+        raw = model_clients.invoke(prompt, temperature=HEADER_CHECK_TEMPERATURE)
         
         parsed = _parse_agent_json(raw)
         is_valid = bool(parsed.get("valid", True)) if parsed else True
@@ -850,8 +1523,12 @@ def _get_import(cursor: RealDictCursor, import_id: str, user_id: str) -> dict[st
 @app.get("/imports/<import_id>")
 @_owner_required
 def get_import(import_id: str):
+    # Polling an upload's progress only needs the batch row.
+    include_items = request.args.get("include_items") != "false"
     with db_cursor() as (_connection, cursor):
         imported = _get_import(cursor, import_id, g.user_id)
+        if not include_items:
+            return _response({"import": imported})
         cursor.execute("SELECT * FROM import_items WHERE import_id = %s ORDER BY created_at", (import_id,))
         items = cursor.fetchall()
     return _response({"import": imported, "items": items})
@@ -864,35 +1541,65 @@ def confirm_import(import_id: str):
     decisions = payload.get("items")
     if not isinstance(decisions, list) or not decisions or len(decisions) > 500:
         raise ApiError("items must contain between 1 and 500 review decisions.")
+    by_item: dict[str, dict[str, Any]] = {}
+    for decision in decisions:
+        if not isinstance(decision, dict):
+            raise ApiError("Each review decision must be an object.")
+        item_id = _text(decision.get("item_id"), "item_id", required=True, max_length=36)
+        try:
+            item_id = str(uuid.UUID(item_id))
+        except ValueError:
+            raise ApiError("An import item was not found.", 404, "not_found")
+        # A repeated item was already decided by its first occurrence.
+        by_item.setdefault(item_id, decision)
+
     accepted, discarded, duplicate = [], [], []
     with db_cursor() as (_connection, cursor):
-        _get_import(cursor, import_id, g.user_id)
-        for decision in decisions:
-            if not isinstance(decision, dict):
-                raise ApiError("Each review decision must be an object.")
-            item_id = _text(decision.get("item_id"), "item_id", required=True, max_length=36)
-            cursor.execute("SELECT * FROM import_items WHERE item_id = %s AND import_id = %s FOR UPDATE", (item_id, import_id))
-            item = cursor.fetchone()
-            if not item:
-                raise ApiError("An import item was not found.", 404, "not_found")
+        # Imported transactions retain the source of the batch, never the
+        # client supplied value in a review decision.
+        source = _get_import(cursor, import_id, g.user_id)["source"]
+        cursor.execute(
+            "SELECT * FROM import_items WHERE import_id = %s AND item_id = ANY(%s::uuid[]) FOR UPDATE",
+            (import_id, list(by_item)),
+        )
+        items = {str(item["item_id"]): item for item in cursor.fetchall()}
+        if len(items) != len(by_item):
+            raise ApiError("An import item was not found.", 404, "not_found")
+
+        statuses: dict[str, str] = {}
+        to_insert: list[tuple[str, dict[str, Any], str]] = []
+        for item_id, decision in by_item.items():
+            item = items[item_id]
             if item["status"] != "pending":
                 continue
             if decision.get("accept", True) is False:
-                cursor.execute("UPDATE import_items SET status = 'discarded' WHERE item_id = %s", (item_id,))
+                statuses[item_id] = "discarded"
                 discarded.append(item_id)
                 continue
-            merged = {**_json(item), **decision, "date": _json(item["transaction_date"]), "source": "Manual"}
-            # Imported transactions retain the source of the batch, never the
-            # client supplied value in a review decision.
-            merged["source"] = _get_import(cursor, import_id, g.user_id)["source"]
-            transaction = _normalise_transaction(merged, source=merged["source"])
-            created = _insert_transaction(cursor, g.user_id, transaction, item["import_fingerprint"])
+            merged = {**_json(item), **decision, "date": _json(item["transaction_date"]), "source": source}
+            to_insert.append((item_id, _normalise_transaction(merged, source=source), item["import_fingerprint"]))
+
+        created_rows = _insert_transactions(
+            cursor, g.user_id, [(transaction, fingerprint) for _item_id, transaction, fingerprint in to_insert]
+        )
+        for (item_id, _transaction, _fingerprint), created in zip(to_insert, created_rows):
             if created:
-                cursor.execute("UPDATE import_items SET status = 'accepted' WHERE item_id = %s", (item_id,))
+                statuses[item_id] = "accepted"
                 accepted.append(created)
             else:
-                cursor.execute("UPDATE import_items SET status = 'duplicate' WHERE item_id = %s", (item_id,))
+                statuses[item_id] = "duplicate"
                 duplicate.append(item_id)
+        if statuses:
+            execute_values(
+                cursor,
+                """
+                UPDATE import_items AS item SET status = decided.status
+                FROM (VALUES %s) AS decided (item_id, status)
+                WHERE item.item_id = decided.item_id::uuid
+                """,
+                list(statuses.items()),
+                page_size=len(statuses),
+            )
         cursor.execute(
             """
             UPDATE import_batches SET status = 'confirmed', confirmed_at = CURRENT_TIMESTAMP
@@ -903,36 +1610,88 @@ def confirm_import(import_id: str):
     return _response({"accepted": accepted, "discarded_item_ids": discarded, "duplicate_item_ids": duplicate})
 
 
+# Each rule carries the progress of its latest backfill (rule_backfill.py), or
+# null when it was created without one.
+_MERCHANT_RULES = """
+SELECT rules.*, (
+  SELECT json_build_object(
+    'status', backfill.status, 'rows_total', backfill.rows_total,
+    'rows_processed', backfill.rows_processed, 'rows_updated', backfill.rows_updated,
+    'error_message', backfill.error_message, 'queued_at', backfill.queued_at,
+    'finished_at', backfill.finished_at
+  )
+  FROM merchant_rule_backfills AS backfill WHERE backfill.rule_id = rules.rule_id
+) AS backfill
+FROM merchant_rules AS rules WHERE rules.user_id = %s
+"""
+
+
 @app.get("/merchant-rules")
 @_owner_required
 def list_merchant_rules():
     with db_cursor() as (_connection, cursor):
-        cursor.execute("SELECT * FROM merchant_rules WHERE user_id = %s ORDER BY updated_at DESC", (g.user_id,))
+        cursor.execute(f"{_MERCHANT_RULES} ORDER BY rules.updated_at DESC", (g.user_id,))
         rules = cursor.fetchall()
     return _response({"merchant_rules": rules})
 
 
+@app.get("/merchant-rules/<rule_id>")
+@_owner_required
+def get_merchant_rule(rule_id: str):
+    with db_cursor() as (_connection, cursor):
+        cursor.execute(f"{_MERCHANT_RULES} AND rules.rule_id = %s", (g.user_id, rule_id))
+        rule = cursor.fetchone()
+    if not rule:
+        raise ApiError("Merchant rule not found.", 404, "not_found")
+    return _response({"merchant_rule": rule})
+
+
 @app.post("/merchant-rules")
 @_owner_required
 def create_merchant_rule():
     payload = _request_json()
     pattern = _text(payload.get("merchant_pattern"), "merchant_pattern", required=True)
+    match_type = _text(payload.get("match_type", "exact"), "match_type", required=True, max_length=16)
+    try:
+        pattern = normalise_pattern(match_type, pattern)
+    except ValueError as error:
+        raise ApiError(str(error)) from None
     category = _text(payload.get("category"), "category", max_length=100)
     if category and category not in EXPENSE_CATEGORIES | INCOME_CATEGORIES:
         raise ApiError("category is not supported.")
     with db_cursor() as (_connection, cursor):
         cursor.execute(
             """
-            INSERT INTO merchant_rules (rule_id, user_id, merchant_pattern, display_merchant, category, is_essential)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT (user_id, merchant_pattern) DO UPDATE SET
+            INSERT INTO merchant_rules (rule_id, user_id, match_type, merchant_pattern, display_merchant, category, is_essential)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (user_id, match_type, merchant_pattern) DO UPDATE SET
               display_merchant = EXCLUDED.display_merchant, category = EXCLUDED.category,
               is_essential = EXCLUDED.is_essential, updated_at = CURRENT_TIMESTAMP
-            RETURNING *
+            RETURNING rule_id
             """,
-            (str(uuid.uuid4()), g.user_id, pattern.casefold(), _text(payload.get("display_merchant"), "display_merchant"), category, payload.get("is_essential")),
+            (str(uuid.uuid4()), g.user_id, match_type, pattern, _text(payload.get("display_merchant"), "display_merchant"), category, payload.get("is_essential")),
         )
+        rule_id = cursor.fetchone()["rule_id"]
+        if payload.get("apply_to_existing", True):
+            # Past transactions follow the rule too; rule_backfill.py rewrites
+            # them in chunks after this commits. Changing a rule starts over.
+            cursor.execute(
+                """
+                INSERT INTO merchant_rule_backfills (rule_id, user_id) VALUES (%s, %s)
+                ON CONFLICT (rule_id) DO UPDATE SET
+                  status = 'pending', rows_total = NULL, rows_processed = 0, rows_updated = 0,
+                  after_date = NULL, after_created_at = NULL, after_transaction_id = NULL,
+                  attempts = 0, lease_id = NULL, locked_until = NULL, error_message = NULL,
+                  queued_at = CURRENT_TIMESTAMP, finished_at = NULL
+                """,
+                (rule_id, g.user_id),
+            )
+            cursor.execute("NOTIFY merchant_rule_backfills")
+        cursor.execute(f"{_MERCHANT_RULES} AND rules.rule_id = %s", (g.user_id, rule_id))
         rule = cursor.fetchone()
+    # The trigger-bumped version already retires the compiled rules in every
+    # worker; dropping this worker's copy just frees it sooner.
+    merchant_rule_cache.discard(g.user_id)
     return _response({"merchant_rule": rule}, 201)
 
 
@@ -943,6 +1702,7 @@ def delete_merchant_rule(rule_id: str):
         cursor.execute("DELETE FROM merchant_rules WHERE rule_id = %s AND user_id = %s RETURNING rule_id", (rule_id, g.user_id))
         if not cursor.fetchone():
             raise ApiError("Merchant rule not found.", 404, "not_found")
+    merchant_rule_cache.discard(g.user_id)
     return _response({"message": "Merchant rule deleted."})
 
 
@@ -1008,17 +1768,158 @@ def commitment_detail(commitment_id: str):
         return _response({"commitment": cursor.fetchone()})
 
 
-def _generated_insights(cursor: RealDictCursor, user_id: str) -> list[dict[str, Any]]:
+def _store_insights(
+    cursor: RealDictCursor,
+    user_id: str,
+    insights: list[dict[str, Any]],
+    *,
+    stale_keys: list[str] | None = None,
+    stale_kind: str | None = None,
+) -> list[dict[str, Any]]:
+    """Upsert generated insights and resolve the ones they supersede.
+
+    One statement writes the whole set.  Open insights named in ``stale_keys``
+    (or of ``stale_kind``) that were not regenerated are marked resolved in the
+    same transaction; a resolved insight that fires again is reopened.
+    """
     cursor.execute(
         """
-        SELECT transaction_id, title, merchant, amount, transaction_type, date
-        FROM transactions WHERE user_id = %s AND transaction_type = 'Expense'
-          AND date >= CURRENT_TIMESTAMP - INTERVAL '400 days'
-        ORDER BY date
+        WITH generated AS (
+          SELECT * FROM UNNEST(
+            %s::text[], %s::text[], %s::text[], %s::text[],
+            %s::numeric[], %s::numeric[], %s::numeric[], %s::jsonb[]
+          ) AS generated (insight_key, kind, title, message, confidence, amount, projected_annual_cost, evidence)
+        ), resolved AS (
+          UPDATE expense_insights SET status = 'resolved', updated_at = CURRENT_TIMESTAMP
+          WHERE user_id = %s AND status = 'open'
+            AND (insight_key = ANY(%s::text[]) OR kind = %s)
+            AND insight_key NOT IN (SELECT insight_key FROM generated)
+        )
+        INSERT INTO expense_insights (
+          insight_id, user_id, insight_key, kind, title, message, confidence,
+          amount, projected_annual_cost, evidence
+        )
+        SELECT uuid_generate_v4(), %s::uuid, insight_key, kind, title, message, confidence,
+               amount, projected_annual_cost, evidence
+        FROM generated
+        ON CONFLICT (user_id, insight_key) DO UPDATE SET
+          title=EXCLUDED.title, message=EXCLUDED.message, confidence=EXCLUDED.confidence,
+          amount=EXCLUDED.amount, projected_annual_cost=EXCLUDED.projected_annual_cost,
+          evidence=EXCLUDED.evidence, updated_at=CURRENT_TIMESTAMP,
+          status=CASE WHEN expense_insights.status = 'resolved' THEN 'open' ELSE expense_insights.status END
+        RETURNING *
+        """,
+        (
+            [insight["insight_key"] for insight in insights],
+            [insight["kind"] for insight in insights],
+            [insight["title"] for insight in insights],
+            [insight["message"] for insight in insights],
+            [insight["confidence"] for insight in insights],
+            [insight["amount"] for insight in insights],
+            [insight["projected_annual_cost"] for insight in insights],
+            [json.dumps(insight["evidence"]) for insight in insights],
+            user_id, stale_keys or [], stale_kind, user_id,
+        ),
+    )
+    return cursor.fetchall()
+
+
+def _refresh_merchant_insights(cursor: RealDictCursor, user_id: str) -> tuple[list[dict[str, Any]], list[str]]:
+    """Recompute insights only for merchants whose expenses changed.
+
+    Triggers on transactions mark every merchant an insert, update or delete
+    touches as dirty (see Schema.sql).  Price-creep windows also move with the
+    calendar, so on the first refresh of each day merchants with activity in
+    the last 60 days, counted from the previous refresh, are re-marked, as are
+    merchants that still hold insights but no longer any expense in the
+    400-day history.
+
+    Returns the regenerated insights and the keys those merchants produced
+    before, so the caller can resolve the ones that no longer fire.
+    """
+    cursor.execute(
+        """
+        WITH previous AS (SELECT computed_on FROM expense_insight_state WHERE user_id = %s)
+        INSERT INTO expense_insight_state (user_id, computed_on) VALUES (%s, CURRENT_DATE)
+        ON CONFLICT (user_id) DO UPDATE SET computed_on = EXCLUDED.computed_on
+          WHERE expense_insight_state.computed_on < EXCLUDED.computed_on
+        RETURNING (SELECT computed_on FROM previous) AS previous_computed_on
+        """,
+        (user_id, user_id),
+    )
+    new_day = cursor.fetchone()
+    if new_day:
+        today = date.today()
+        since = min(new_day["previous_computed_on"] or today, today) - timedelta(days=60)
+        # Merchants whose last expense has left the 400-day window are
+        # re-marked too, so the insights they still hold are resolved.
+        cursor.execute(
+            """
+            INSERT INTO expense_insight_merchants (user_id, merchant_key)
+            SELECT DISTINCT user_id, expense_merchant_key(merchant, title)
+            FROM transactions WHERE user_id = %s AND transaction_type = 'Expense' AND date >= %s
+            UNION
+            SELECT state.user_id, state.merchant_key FROM expense_insight_merchants AS state
+            WHERE state.user_id = %s AND state.insight_keys <> '{}' AND NOT EXISTS (
+              SELECT 1 FROM transactions
+              WHERE user_id = state.user_id AND transaction_type = 'Expense'
+                AND expense_merchant_key(merchant, title) = state.merchant_key
+                AND date >= CURRENT_TIMESTAMP - INTERVAL '400 days'
+            )
+            ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE
+            """,
+            (user_id, max(since, today - timedelta(days=400)), user_id),
+        )
+
+    cursor.execute(
+        """
+        UPDATE expense_insight_merchants SET dirty = FALSE, refreshed_at = CURRENT_TIMESTAMP
+        WHERE user_id = %s AND dirty RETURNING merchant_key, insight_keys
         """,
         (user_id,),
     )
-    transactions = cursor.fetchall()
+    claimed = cursor.fetchall()
+    if not claimed:
+        return [], []
+    merchant_keys = [row["merchant_key"] for row in claimed]
+    # A plain tuple cursor: rows become compact records, never dicts.
+    with cursor.connection.cursor(cursor_factory=_TUPLE_CURSOR) as history:
+        history.execute(
+            f"""
+            SELECT {EXPENSE_RECORD_COLUMNS}
+            FROM transactions WHERE user_id = %s AND transaction_type = 'Expense'
+              AND expense_merchant_key(merchant, title) = ANY(%s)
+              AND date >= CURRENT_TIMESTAMP - INTERVAL '400 days'
+            ORDER BY date
+            """,
+            (user_id, merchant_keys),
+        )
+        with timer("build_expense_insights"):
+            generated = build_expense_insights(expense_records(history), [], limit=None)
+    keys_by_merchant: dict[str, list[str]] = {key: [] for key in merchant_keys}
+    for insight in generated:
+        merchant_key = insight["evidence"]["merchant_key"]
+        if merchant_key in keys_by_merchant:
+            keys_by_merchant[merchant_key].append(insight["insight_key"])
+    execute_values(
+        cursor,
+        """
+        UPDATE expense_insight_merchants AS state SET insight_keys = refreshed.insight_keys::text[]
+        FROM (VALUES %s) AS refreshed (user_id, merchant_key, insight_keys)
+        WHERE state.user_id = refreshed.user_id::uuid AND state.merchant_key = refreshed.merchant_key
+        """,
+        [(user_id, key, keys) for key, keys in keys_by_merchant.items()],
+    )
+    return generated, [key for row in claimed for key in row["insight_keys"]]
+
+
+def _generated_insights(cursor: RealDictCursor, user_id: str) -> list[dict[str, Any]]:
+    """Refresh and return the user's current insights, most urgent first.
+
+    A refresh costs the same handful of statements however many insights
+    fire; only the merchant history it reads grows with the change.
+    """
+    generated, stale_keys = _refresh_merchant_insights(cursor, user_id)
     cursor.execute(
         """
         SELECT commitment_id, title, expected_amount, frequency, next_due_date
@@ -1027,29 +1928,25 @@ def _generated_insights(cursor: RealDictCursor, user_id: str) -> list[dict[str,
         """,
         (user_id,),
     )
-    generated = build_expense_insights(transactions, cursor.fetchall())
-    stored = []
-    for insight in generated:
-        cursor.execute(
-            """
-            INSERT INTO expense_insights (
-              insight_id, user_id, insight_key, kind, title, message, confidence,
-              amount, projected_annual_cost, evidence
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb)
-            ON CONFLICT (user_id, insight_key) DO UPDATE SET
-              title=EXCLUDED.title, message=EXCLUDED.message, confidence=EXCLUDED.confidence,
-              amount=EXCLUDED.amount, projected_annual_cost=EXCLUDED.projected_annual_cost,
-              evidence=EXCLUDED.evidence, updated_at=CURRENT_TIMESTAMP
-            RETURNING *
-            """,
-            (
-                str(uuid.uuid4()), user_id, insight["insight_key"], insight["kind"], insight["title"],
-                insight["message"], insight["confidence"], insight["amount"], insight["projected_annual_cost"],
-                json.dumps(insight["evidence"]),
-            ),
-        )
-        stored.append(cursor.fetchone())
-    return stored
+    # Commitment insights depend on today's date rather than on ledger
+    # history, and there are only a handful, so they are rebuilt every time.
+    with timer("build_expense_insights"):
+        generated += build_expense_insights([], cursor.fetchall(), limit=None)
+    stored = _store_insights(
+        cursor, user_id, generated, stale_keys=stale_keys, stale_kind="upcoming_commitment"
+    )
+    stored_keys = {row["insight_key"] for row in stored}
+    cursor.execute(
+        """
+        SELECT insight.* FROM expense_insights AS insight
+        JOIN expense_insight_merchants AS state
+          ON state.user_id = insight.user_id AND insight.insight_key = ANY(state.insight_keys)
+        WHERE insight.user_id = %s
+        """,
+        (user_id,),
+    )
+    unchanged = [row for row in cursor.fetchall() if row["insight_key"] not in stored_keys]
+    return rank_insights([*stored, *unchanged])
 
 
 @app.get("/expense-insights")
@@ -1081,6 +1978,8 @@ def expense_insight_feedback(insight_id: str):
         insight = cursor.fetchone()
         if not insight:
             raise ApiError("Insight not found.", 404, "not_found")
+        # Dismissing an insight changes the story a cached chat snapshot holds.
+        _bump_ledger_version(cursor, g.user_id)
     return _response({"insight": insight})
 
 
@@ -1097,11 +1996,14 @@ def expense_story():
 @_owner_required
 def expense_guidance():
     with db_cursor() as (_connection, cursor):
+        # Rollups hold one row per month and category, so this reads a handful
+        # of rows however long the ledger is.
         cursor.execute(
             """
-            SELECT COALESCE(SUM(amount), 0) AS current_flexible_spend
-            FROM transactions WHERE user_id=%s AND transaction_type='Expense' AND is_essential=FALSE
-              AND date >= date_trunc('month', CURRENT_TIMESTAMP)
+            SELECT COALESCE(SUM(total), 0) AS current_flexible_spend
+            FROM transaction_monthly_rollups
+            WHERE user_id=%s AND transaction_type='Expense' AND is_essential=FALSE
+              AND month >= date_trunc('month', CURRENT_TIMESTAMP)::date
             """,
             (g.user_id,),
         )
@@ -1109,10 +2011,11 @@ def expense_guidance():
         cursor.execute(
             """
             SELECT COALESCE(AVG(monthly_total), 0) AS historical_monthly_average FROM (
-              SELECT date_trunc('month', date) AS month, SUM(amount) AS monthly_total
-              FROM transactions WHERE user_id=%s AND transaction_type='Expense' AND is_essential=FALSE
-                AND date >= date_trunc('month', CURRENT_TIMESTAMP) - INTERVAL '3 months'
-                AND date < date_trunc('month', CURRENT_TIMESTAMP)
+              SELECT month, SUM(total) AS monthly_total
+              FROM transaction_monthly_rollups
+              WHERE user_id=%s AND transaction_type='Expense' AND is_essential=FALSE
+                AND month >= (date_trunc('month', CURRENT_TIMESTAMP) - INTERVAL '3 months')::date
+                AND month < date_trunc('month', CURRENT_TIMESTAMP)::date
               GROUP BY 1
             ) monthly
             """,
@@ -1194,16 +2097,18 @@ def _recent_chat_messages(cursor: RealDictCursor, session_id: str, limit: int =
     return cursor.fetchall()
 
 
+@timed("financial_context")
 def _financial_context(cursor: RealDictCursor, user_id: str) -> dict[str, Any]:
     """Deterministic, read-only snapshot of the user's money for the assistant.
 
     The model never touches the database or writes SQL; it only reasons over this
-    bounded, server-computed context, scoped to the current user's rows.
+    bounded, server-computed context, scoped to the current user's rows.  Totals
+    come from the monthly rollups; only the recent list reads transactions.
     """
     cursor.execute(
         """
-        SELECT transaction_type, COALESCE(SUM(amount), 0) AS total, COUNT(*) AS count
-        FROM transactions WHERE user_id = %s GROUP BY transaction_type
+        SELECT transaction_type, COALESCE(SUM(total), 0) AS total, SUM(transaction_count) AS count
+        FROM transaction_monthly_rollups WHERE user_id = %s GROUP BY transaction_type
         """,
         (user_id,),
     )
@@ -1234,9 +2139,9 @@ def _financial_context(cursor: RealDictCursor, user_id: str) -> dict[str, Any]:
 
     cursor.execute(
         """
-        SELECT category, COALESCE(SUM(amount), 0) AS total
-        FROM transactions WHERE user_id = %s AND transaction_type = 'Expense'
-          AND date >= date_trunc('month', CURRENT_TIMESTAMP)
+        SELECT category, COALESCE(SUM(total), 0) AS total
+        FROM transaction_monthly_rollups WHERE user_id = %s AND transaction_type = 'Expense'
+          AND month >= date_trunc('month', CURRENT_TIMESTAMP)::date
         GROUP BY category ORDER BY total DESC
         """,
         (user_id,),
@@ -1245,8 +2150,8 @@ def _financial_context(cursor: RealDictCursor, user_id: str) -> dict[str, Any]:
 
     cursor.execute(
         """
-        SELECT category, COALESCE(SUM(amount), 0) AS total
-        FROM transactions WHERE user_id = %s AND transaction_type = 'Expense'
+        SELECT category, COALESCE(SUM(total), 0) AS total
+        FROM transaction_monthly_rollups WHERE user_id = %s AND transaction_type = 'Expense'
         GROUP BY category ORDER BY total DESC LIMIT 5
         """,
         (user_id,),
@@ -1267,6 +2172,38 @@ def _financial_context(cursor: RealDictCursor, user_id: str) -> dict[str, Any]:
     }
 
 
+def _bump_ledger_version(cursor: RealDictCursor, user_id: str) -> None:
+    cursor.execute(
+        """
+        INSERT INTO ledger_versions (user_id) VALUES (%s)
+        ON CONFLICT (user_id) DO UPDATE SET version = ledger_versions.version + 1
+        """,
+        (user_id,),
+    )
+
+
+def _chat_snapshot(cursor: RealDictCursor, user_id: str) -> dict[str, Any]:
+    """Expense story and financial context, reused until the ledger changes.
+
+    The version is read before anything is computed, so a write that lands
+    meanwhile can only make the cached snapshot newer than its version.
+    """
+    cursor.execute("SELECT version FROM ledger_versions WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    # Insight windows and "this month" move with the calendar, so the day is
+    # part of the version too.
+    version = f"{row['version'] if row else 0}:{date.today().isoformat()}"
+    snapshot = snapshot_cache.get(user_id, version)
+    if snapshot is None:
+        generated = _generated_insights(cursor, user_id)
+        snapshot = _json({
+            "story": build_expense_story([_json(item) for item in generated if item["status"] == "open"]),
+            "context": _financial_context(cursor, user_id),
+        })
+        snapshot_cache.set(user_id, version, snapshot)
+    return snapshot
+
+
 def _deterministic_chat_answer(context: dict[str, Any], story: dict[str, Any]) -> str:
     """Grounded answer used when no LLM key is configured."""
     if context["transaction_count"] == 0:
@@ -1328,33 +2265,48 @@ def _agent_add_transaction(
     return _insert_transaction(cursor, user_id, transaction)
 
 
-def _agent_reply(
-    cursor: RealDictCursor,
-    user_id: str,
+CHAT_MODEL_TIMEOUT = float(os.getenv("CHAT_MODEL_TIMEOUT", "25"))
+CHAT_TEMPERATURE = 0.1
+HEADER_CHECK_TEMPERATURE = 0.0
+
+
+def _create_chat_model(temperature: float) -> Any:
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model_name=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+        temperature=temperature,
+        groq_api_key=os.getenv("GROQ_API_KEY"),
+        request_timeout=CHAT_MODEL_TIMEOUT,
+    )
+
+
+model_clients = ModelClients(_create_chat_model)
+
+
+def warm_chat_model() -> None:
+    """Build this process's model clients before its first chat turn."""
+    if os.getenv("GROQ_API_KEY"):
+        model_clients.warm([CHAT_TEMPERATURE, HEADER_CHECK_TEMPERATURE])
+
+# Model calls wait on the network, not the CPU, so a few threads per worker
+# are enough to keep them off the request's database connection.
+_model_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CHAT_MODEL_THREADS", "8")), thread_name_prefix="chat-model"
+)
+
+
+def _agent_prompt(
     message: str,
     history: list[dict[str, Any]],
     story: dict[str, Any],
     context: dict[str, Any],
 ) -> str:
-    """A chat turn that can answer questions OR add a transaction.
-
-    The model only proposes a structured action as JSON; this server validates
-    and performs any write. It never writes SQL or touches the database itself.
-    Missing details are gathered conversationally across turns (the recent
-    history is the slot-filling state).
-    """
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        return _deterministic_chat_answer(context, story)
-
-    try:
-        from langchain_groq import ChatGroq
-
-        transcript = "\n".join(
-            f"{m['role'].capitalize()}: {m['content']}" for m in history[-12:]
-        )
-        today = datetime.now(timezone.utc).date().isoformat()
-        prompt = f"""You are FinManager's expense assistant. You can chat about the user's money and you can ADD a transaction (income or expense) to their account when they ask.
+    transcript = "\n".join(
+        f"{m['role'].capitalize()}: {m['content']}" for m in history[-12:]
+    )
+    today = datetime.now(timezone.utc).date().isoformat()
+    return f"""You are FinManager's expense assistant. You can chat about the user's money and you can ADD a transaction (income or expense) to their account when they ask.
 
 Reply with ONLY a single JSON object (no markdown, nothing outside it), shaped exactly like:
 {{
@@ -1395,16 +2347,92 @@ Spending insights:
 Conversation:
 {transcript}
 """
-        raw = ChatGroq(
-            model_name=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
-            temperature=0.1,
-            groq_api_key=api_key,
-        ).invoke(prompt).content
-        action = _parse_agent_json(raw)
+
+
+def _model_chunks(prompt: str, timeout: float) -> Iterator[str]:
+    """Yield the model's output as it is generated on the model executor.
+
+    Raises TimeoutError once ``timeout`` seconds have passed without the reply
+    finishing; the executor thread then stops at its next chunk.
+    """
+    chunks: queue.Queue[Any] = queue.Queue()
+    cancelled = threading.Event()
+
+    def generate() -> None:
+        try:
+            for chunk in model_clients.stream(prompt, temperature=CHAT_TEMPERATURE):
+                if cancelled.is_set():
+                    return
+                chunks.put(chunk)
+        except Exception as error:
+            chunks.put(error)
+        finally:
+            chunks.put(None)
+
+    _model_executor.submit(generate)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                chunk = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                model_clients.record_timeout()
+                raise TimeoutError(f"The model did not finish within {timeout:g}s.")
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        cancelled.set()
+
+
+def _agent_action_events(
+    message: str,
+    history: list[dict[str, Any]],
+    story: dict[str, Any],
+    context: dict[str, Any],
+) -> Iterator[tuple[str, Any]]:
+    """Run the model for one chat turn without touching the database.
+
+    Yields ``("delta", text)`` for reply text as it streams, then exactly one
+    ``("action", action)`` with the parsed action, or None when no model is
+    configured or it failed, timed out or answered with something unusable.
+    """
+    if not os.getenv("GROQ_API_KEY"):
+        yield "action", None
+        return
+    extractor = ReplyExtractor()
+    raw: list[str] = []
+    try:
+        with timer("agent_reply"):
+            for chunk in _model_chunks(_agent_prompt(message, history, story, context), CHAT_MODEL_TIMEOUT):
+                raw.append(chunk)
+                delta = extractor.feed(chunk)
+                # A ready add is answered with the server's own confirmation.
+                if delta and not extractor.adds_transaction():
+                    yield "delta", delta
     except Exception:
         app.logger.warning("Agent model unavailable; returning deterministic fallback.")
-        return _deterministic_chat_answer(context, story)
+        yield "action", None
+        return
+    yield "action", _parse_agent_json("".join(raw))
+
+
+def _agent_answer(
+    cursor: RealDictCursor,
+    user_id: str,
+    action: dict[str, Any] | None,
+    story: dict[str, Any],
+    context: dict[str, Any],
+) -> str:
+    """Turn the model's proposed action into the final answer.
 
+    The model only proposes a structured action as JSON; this server validates
+    and performs any write. It never writes SQL or touches the database itself.
+    Missing details are gathered conversationally across turns (the recent
+    history is the slot-filling state).
+    """
     if action is None:
         return _deterministic_chat_answer(context, story)
 
@@ -1489,30 +2517,21 @@ def chat_history(session_id: str):
     return _response({"messages": messages})
 
 
-def _send_chat_message(payload: dict[str, Any], requested_session_id: str | None = None):
-    message = _text(payload.get("message") or payload.get("question"), "message", required=True, max_length=4000)
-    session_id = requested_session_id or _text(payload.get("session_id"), "session_id", max_length=36)
+def _finish_chat_turn(
+    user_id: str,
+    session_id: str,
+    message: str,
+    action: dict[str, Any] | None,
+    story: dict[str, Any],
+    context: dict[str, Any],
+) -> dict[str, Any]:
+    """Apply the model's action and persist the assistant's answer."""
     with db_cursor() as (_connection, cursor):
-        if session_id:
-            session = _get_chat_session(cursor, session_id, g.user_id)
-            if session["is_archived"]:
-                raise ApiError("Unarchive this chat before sending a new message.", 409, "chat_archived")
-        else:
-            session = _create_chat_session(cursor, g.user_id)
-            session_id = str(session["session_id"])
-
-        user_message = _insert_chat_message(cursor, session_id, g.user_id, "user", message)
-        history = _recent_chat_messages(cursor, session_id)
-        generated = _generated_insights(cursor, g.user_id)
-        story = build_expense_story([_json(item) for item in generated if item["status"] == "open"])
-        context = _financial_context(cursor, g.user_id)
-        answer = _agent_reply(
-            cursor, g.user_id, message, [_json(item) for item in history], story, context
-        )
+        answer = _agent_answer(cursor, user_id, action, story, context)
         assistant_message = _insert_chat_message(
             cursor,
             session_id,
-            g.user_id,
+            user_id,
             "assistant",
             answer,
             {"story_insight_keys": story["insight_keys"]},
@@ -1523,10 +2542,67 @@ def _send_chat_message(payload: dict[str, Any], requested_session_id: str | None
               updated_at = CURRENT_TIMESTAMP, last_message_at = CURRENT_TIMESTAMP
             WHERE session_id = %s AND user_id = %s RETURNING *
             """,
-            (_chat_title(message), session_id, g.user_id),
+            (_chat_title(message), session_id, user_id),
         )
         session = cursor.fetchone()
-    return _response({"session": session, "user_message": user_message, "assistant_message": assistant_message, "answer": answer, "story": story})
+    return {"session": session, "assistant_message": assistant_message, "answer": answer, "story": story}
+
+
+def _send_chat_message(payload: dict[str, Any], requested_session_id: str | None = None):
+    """One chat turn, with the model call made outside any database transaction.
+
+    The user's message is stored and the pooled connection handed back before
+    the model runs; the answer is written in a second short transaction.
+    With ``Accept: text/event-stream`` (or ``?stream=true``) the reply streams
+    as server-sent events: ``session``, then ``delta`` events with reply text,
+    then ``done`` carrying the same payload as the JSON response, whose
+    ``answer`` is authoritative.
+    """
+    message = _text(payload.get("message") or payload.get("question"), "message", required=True, max_length=4000)
+    session_id = requested_session_id or _text(payload.get("session_id"), "session_id", max_length=36)
+    user_id = g.user_id
+    with db_cursor() as (_connection, cursor):
+        if session_id:
+            session = _get_chat_session(cursor, session_id, user_id)
+            if session["is_archived"]:
+                raise ApiError("Unarchive this chat before sending a new message.", 409, "chat_archived")
+        else:
+            session = _create_chat_session(cursor, user_id)
+            session_id = str(session["session_id"])
+
+        user_message = _insert_chat_message(cursor, session_id, user_id, "user", message)
+        history = [_json(item) for item in _recent_chat_messages(cursor, session_id)]
+        snapshot = _chat_snapshot(cursor, user_id)
+        story, context = snapshot["story"], snapshot["context"]
+    # Everything above is committed; return the connection for the model call.
+    _return_request_connection()
+    events = _agent_action_events(message, history, story, context)
+
+    if request.args.get("stream") != "true" and "text/event-stream" not in request.headers.get("Accept", ""):
+        action = next(value for kind, value in events if kind == "action")
+        finished = _finish_chat_turn(user_id, session_id, message, action, story, context)
+        return _response({**finished, "user_message": user_message})
+
+    def stream() -> Iterator[str]:
+        yield sse_event("session", _json({"session": session, "user_message": user_message}))
+        action = None
+        # The request's profile closed with the headers, so timer() inside
+        # the events is a no-op here; this includes sending the deltas.
+        started = time.perf_counter()
+        for kind, value in events:
+            if kind == "delta":
+                yield sse_event("delta", {"text": value})
+            else:
+                action = value
+        if INSTRUMENTATION_ENABLED:
+            metrics.add_timing("agent_reply", time.perf_counter() - started)
+        finished = _finish_chat_turn(user_id, session_id, message, action, story, context)
+        yield sse_event("done", _json({"status": "success", **finished, "user_message": user_message}))
+
+    response = app.response_class(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.post("/chat/sessions/<session_id>/messages")
@@ -1544,30 +2620,77 @@ def ai_agent_invoke():
     return _send_chat_message(_request_json())
 
 
+EXPORT_FORMATS = {
+    "json": ("application/json", partial(write_json, dumps=to_json)),
+    "ndjson": ("application/x-ndjson", partial(write_ndjson, dumps=to_json)),
+    "csv": ("text/csv", partial(write_csv, convert=_json)),
+}
+EXPORT_ITERSIZE = 2_000
+
+_EXPORT_SECTIONS = (
+    ("transactions", f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE user_id=%s ORDER BY date DESC"),
+    ("merchant_rules", "SELECT * FROM merchant_rules WHERE user_id=%s"),
+    ("commitments", "SELECT * FROM recurring_commitments WHERE user_id=%s"),
+    ("chat_sessions", "SELECT * FROM chat_sessions WHERE user_id=%s ORDER BY created_at"),
+    ("chat_messages", "SELECT * FROM chat_messages WHERE user_id=%s ORDER BY created_at, message_id"),
+)
+
+
+def _export_sections(connection: Any, user_id: str) -> Iterator[tuple[str, Iterator[dict[str, Any]]]]:
+    """Yield each export section as rows read through a named server-side cursor.
+
+    The whole export runs in one read-only REPEATABLE READ transaction, so the
+    sections agree with each other even while the user keeps writing.
+    """
+    with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SELECT user_id, name, email, phone_no, created_at FROM customers WHERE user_id=%s", (user_id,))
+        yield "profile", iter(cursor.fetchall())
+    for section, query in _EXPORT_SECTIONS:
+        with connection.cursor(name=f"export_{section}", cursor_factory=RealDictCursor) as cursor:
+            cursor.itersize = EXPORT_ITERSIZE
+            cursor.execute(query, (user_id,))
+            yield section, iter(cursor)
+
+
 @app.get("/me/export")
 @_owner_required
 def export_my_data():
-    with db_cursor() as (_connection, cursor):
-        cursor.execute("SELECT user_id, name, email, phone_no, created_at FROM customers WHERE user_id=%s", (g.user_id,))
-        profile = cursor.fetchone()
-        cursor.execute(f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE user_id=%s ORDER BY date DESC", (g.user_id,))
-        transactions = cursor.fetchall()
-        cursor.execute("SELECT * FROM merchant_rules WHERE user_id=%s", (g.user_id,))
-        rules = cursor.fetchall()
-        cursor.execute("SELECT * FROM recurring_commitments WHERE user_id=%s", (g.user_id,))
-        commitments = cursor.fetchall()
-        cursor.execute("SELECT * FROM chat_sessions WHERE user_id=%s ORDER BY created_at", (g.user_id,))
-        chat_sessions = cursor.fetchall()
-        cursor.execute("SELECT * FROM chat_messages WHERE user_id=%s ORDER BY created_at, message_id", (g.user_id,))
-        chat_messages = cursor.fetchall()
-    return _response({"export": {
-        "profile": profile,
-        "transactions": transactions,
-        "merchant_rules": rules,
-        "commitments": commitments,
-        "chat_sessions": chat_sessions,
-        "chat_messages": chat_messages,
-    }})
+    """Stream the user's data as JSON (the default), NDJSON or sectioned CSV.
+
+    Rows are fetched EXPORT_ITERSIZE at a time and written as they arrive, and
+    the body is gzip-compressed when the client accepts it.  The export holds
+    its own pooled connection until the response is closed.
+    """
+    export_format = request.args.get("format", "json")
+    if export_format not in EXPORT_FORMATS:
+        raise ApiError("format must be json, ndjson, or csv.")
+    mimetype, writer = EXPORT_FORMATS[export_format]
+    compress = "gzip" in request.headers.get("Accept-Encoding", "")
+    pool = _connection_pool()
+    connection = _borrow_connection(pool)
+
+    def release() -> None:
+        broken = False
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            broken = True
+        pool.putconn(connection, discard=broken)
+
+    try:
+        body = encode_stream(writer(_export_sections(connection, g.user_id)), compress=compress)
+        response = app.response_class(body, mimetype=mimetype)
+    except Exception:
+        release()
+        raise
+    response.call_on_close(release)
+    if export_format != "json":
+        response.headers["Content-Disposition"] = f'attachment; filename="finmanager-export.{export_format}"'
+    response.headers["Vary"] = "Accept-Encoding"
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
 
 
 @app.delete("/me")
@@ -1579,8 +2702,10 @@ def delete_my_account():
     with db_cursor() as (_connection, cursor):
         cursor.execute("SELECT password FROM customers WHERE user_id = %s", (g.user_id,))
         account = cursor.fetchone()
-        if not account or not bcrypt.check_password_hash(account["password"], password):
-            raise ApiError("Password is incorrect.", 401, "invalid_credentials")
+    _return_request_connection()
+    if not account or not _password_work(password_hasher.verify, password, account["password"]):
+        raise ApiError("Password is incorrect.", 401, "invalid_credentials")
+    with db_cursor() as (_connection, cursor):
         cursor.execute("DELETE FROM customers WHERE user_id = %s", (g.user_id,))
     return _response({"message": "Your account and expense data have been deleted."})
 
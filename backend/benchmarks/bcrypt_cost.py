@@ -0,0 +1,52 @@
+"""Pick a bcrypt work factor for this machine.
+
+Times one hash at each cost in a range and recommends the highest cost whose
+median stays under the target, which is what ``BCRYPT_LOG_ROUNDS`` should be
+set to.  Run it on the production instance type, from ``backend/``::
+
+    python benchmarks/bcrypt_cost.py --target-ms 250
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+
+def time_cost(rounds: int, samples: int) -> float:
+    """Median milliseconds for one hash at ``rounds``."""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds=rounds))
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="latency budget for one hash")
+    parser.add_argument("--min-cost", type=int, default=10)
+    parser.add_argument("--max-cost", type=int, default=15)
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    recommended = None
+    for rounds in range(args.min_cost, args.max_cost + 1):
+        median = time_cost(rounds, args.samples)
+        print(f"cost {rounds:2d}: {median:8.1f} ms")
+        if median > args.target_ms:
+            # Each step doubles the work, so higher costs only get slower.
+            break
+        recommended = rounds
+    if recommended is None:
+        print(f"Even cost {args.min_cost} exceeds {args.target_ms:g} ms; lower --min-cost.")
+    else:
+        print(f"BCRYPT_LOG_ROUNDS={recommended}")
+
+
+if __name__ == "__main__":
+    main()
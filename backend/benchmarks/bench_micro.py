@@ -0,0 +1,110 @@
+"""Microbenchmarks for the insight engine and the request hot paths.
+
+Needs pytest-benchmark.  Ledger sizes come from ``BENCH_ROWS`` (default
+``1000,100000``; add ``1000000`` for the full run).  From the repository root::
+
+    python -m pytest backend/benchmarks/bench_micro.py --benchmark-autosave
+    python -m pytest backend/benchmarks/bench_micro.py --benchmark-compare --benchmark-compare-fail=median:15%
+
+The file is not named ``test_*``, so the normal test run never collects it.
+"""
+
+import os
+from functools import lru_cache
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-" + "x" * 32)
+
+from backend import app as api  # noqa: E402
+from backend.benchmarks import synthetic  # noqa: E402
+from backend.expense_intelligence import (  # noqa: E402
+    build_expense_insights,
+    expense_merchant_key,
+    expense_records,
+)
+from backend.json_encoding import to_json_bytes  # noqa: E402
+from backend.merchant_rules import CompiledRules, merchant_text  # noqa: E402
+
+ROWS = [int(rows) for rows in os.getenv("BENCH_ROWS", "1000,100000").split(",")]
+
+
+def _rounds(rows: int) -> int:
+    return max(1, min(20, 200_000 // rows))
+
+
+@lru_cache(maxsize=None)
+def _records(rows: int):
+    return expense_records(
+        (*row, expense_merchant_key(row[2], row[1])) for row in synthetic.expense_rows(rows)
+    )
+
+
+@lru_cache(maxsize=None)
+def _payloads(rows: int):
+    return synthetic.transaction_payloads(rows)
+
+
+@lru_cache(maxsize=None)
+def _normalised(rows: int):
+    return [api._normalise_transaction(payload) for payload in _payloads(rows)]
+
+
+@pytest.mark.parametrize("rows", ROWS)
+@pytest.mark.parametrize("columnar", [False, True], ids=["row", "columnar"])
+def test_build_expense_insights(benchmark, rows, columnar):
+    if columnar:
+        pytest.importorskip("numpy")
+    records = _records(rows)
+    benchmark.pedantic(
+        build_expense_insights,
+        args=(records, []),
+        kwargs={"now": synthetic.NOW, "limit": None, "columnar": columnar},
+        rounds=_rounds(rows),
+    )
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_normalise_transaction(benchmark, rows):
+    payloads = _payloads(rows)
+    benchmark.pedantic(
+        lambda: [api._normalise_transaction(payload) for payload in payloads], rounds=_rounds(rows)
+    )
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_fingerprint(benchmark, rows):
+    transactions = _normalised(rows)
+    benchmark.pedantic(lambda: [api._fingerprint(transaction) for transaction in transactions], rounds=_rounds(rows))
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_json(benchmark, rows):
+    payload = {"transactions": synthetic.api_rows(rows)}
+    benchmark.pedantic(api._json, args=(payload,), rounds=_rounds(rows))
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_response_encoding(benchmark, rows):
+    payload = {"status": "success", "transactions": synthetic.api_rows(rows)}
+    benchmark.pedantic(to_json_bytes, args=(payload,), rounds=_rounds(rows))
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_merchant_rules(benchmark, rows):
+    """Apply 50 rules of each kind to an import batch, as _apply_merchant_rules does."""
+    rules = CompiledRules(
+        {"match_type": match_type, "merchant_pattern": pattern.format(index), "display_merchant": None, "category": "Food", "is_essential": None}
+        for index in range(50)
+        for match_type, pattern in (
+            ("exact", "merchant {}"), ("prefix", "merchant {}0"), ("contains", "t {}1"), ("regex", r"^merchant {}2\d$"),
+        )
+    )
+    transactions = _normalised(rows)
+    benchmark.pedantic(
+        lambda: [api._merge_merchant_rule(transaction, rule) for transaction, rule in zip(
+            transactions, rules.match_many(merchant_text(transaction) for transaction in transactions)
+        )],
+        rounds=_rounds(rows),
+    )
@@ -0,0 +1,71 @@
+"""Compare the row and columnar paths of ``build_expense_insights``.
+
+Builds synthetic ledgers shaped like psycopg2 rows (aware datetimes, Decimal
+amounts) and turns them into ``ExpenseRecord`` values, as the app does, then
+checks that both paths return the same insights and prints the median time of
+each.  Needs NumPy.  From ``backend/``::
+
+    python benchmarks/expense_insights.py --rows 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from expense_intelligence import build_expense_insights, expense_records  # noqa: E402
+
+NOW = datetime(2026, 7, 24, tzinfo=timezone.utc)
+
+
+def ledger(rows: int, seed: int = 7) -> list:
+    random_ = random.Random(seed)
+    merchants = [f"Merchant {index}" for index in range(max(1, rows // 25))]
+    return expense_records(
+        (
+            f"t{index}",
+            merchant,
+            merchant,
+            Decimal(random_.choice((199, 499, 1250, random_.randint(50, 5000)))),
+            NOW - timedelta(seconds=random_.randint(0, 400 * 86_400)),
+            merchant.lower(),
+        )
+        for index, merchant in ((index, random_.choice(merchants)) for index in range(rows))
+    )
+
+
+def timed(transactions: list, columnar: bool, repeat: int) -> tuple[float, list]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = build_expense_insights(transactions, [], now=NOW, limit=None, columnar=columnar)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'row path':>10} {'columnar':>10} {'speedup':>8}")
+    for rows in args.rows:
+        transactions = ledger(rows)
+        row_seconds, row_result = timed(transactions, False, args.repeat)
+        columnar_seconds, columnar_result = timed(transactions, True, args.repeat)
+        if row_result != columnar_result:
+            raise SystemExit(f"The paths disagree at {rows} rows.")
+        print(f"{rows:>10,} {row_seconds:>9.3f}s {columnar_seconds:>9.3f}s {row_seconds / columnar_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
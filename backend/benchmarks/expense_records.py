@@ -0,0 +1,104 @@
+"""Memory per expense row: dict rows versus ``ExpenseRecord``.
+
+The insight engine used to take ``RealDictCursor`` rows and copy each into a
+second dict; it now builds ``ExpenseRecord`` tuples from a plain cursor.  This
+measures the bytes each representation keeps alive per row, with values
+freshly allocated per row as psycopg2 returns them.  From ``backend/``::
+
+    python benchmarks/expense_records.py --rows 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from expense_intelligence import _amount, _as_datetime, expense_records  # noqa: E402
+
+START = datetime(2025, 6, 1, tzinfo=timezone.utc)
+MERCHANTS = ("Swiggy", "Metro Card", "StreamCo", "Big Bazaar", "Electricity Board")
+
+
+def tuple_rows(rows: int) -> list[tuple]:
+    """What a plain cursor returns for ``EXPENSE_RECORD_COLUMNS``."""
+    return [
+        (
+            str(uuid.UUID(int=index)),
+            "".join(MERCHANTS[index % len(MERCHANTS)]),
+            "".join(MERCHANTS[index % len(MERCHANTS)]),
+            Decimal(f"{100 + index % 900}.50"),
+            START + timedelta(minutes=index),
+            "".join(MERCHANTS[index % len(MERCHANTS)]).lower(),
+        )
+        for index in range(rows)
+    ]
+
+
+def dict_rows(rows: int) -> list[dict]:
+    """What ``RealDictCursor`` returns for the previous query."""
+    return [
+        {
+            "transaction_id": transaction_id,
+            "title": title,
+            "merchant": merchant,
+            "amount": amount,
+            "transaction_type": "".join("Expense"),
+            "date": when,
+        }
+        for transaction_id, title, merchant, amount, when, _key in tuple_rows(rows)
+    ]
+
+
+def retained(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    rows = args.rows
+
+    def previous_engine():
+        # The RealDictCursor rows plus the per-row copy the engine used to make.
+        source = dict_rows(rows)
+        copies = [
+            {
+                **row,
+                "date": _as_datetime(row["date"]),
+                "amount": _amount(row["amount"]),
+                "merchant": (row.get("merchant") or row.get("title") or "").strip(),
+            }
+            for row in source
+        ]
+        return source, copies
+
+    measurements = {
+        "dict rows": lambda: dict_rows(rows),
+        "dict rows + engine copies": previous_engine,
+        "tuple rows": lambda: tuple_rows(rows),
+        "ExpenseRecord (rows released)": lambda: expense_records(tuple_rows(rows)),
+    }
+    baseline = retained(previous_engine) / rows
+    for label, build in measurements.items():
+        per_row = retained(build) / rows
+        print(f"{label:<32} {per_row:8.0f} bytes/row  ({per_row / baseline:5.0%} of the previous engine)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Response encoding: the ``_json`` walk plus Flask's encoder versus one pass.
+
+Encodes ``{"status": "success", "transactions": [...]}`` pages of stored rows
+(``Decimal`` amounts, ``datetime`` dates, ``UUID`` ids) the way ``_response``
+used to (``_json`` copy, then Flask's default provider) and the way it does
+now (``FastJSONProvider``, with orjson and with the standard library), and
+reports the best time and peak traced memory of each.  From ``backend/``::
+
+    python benchmarks/json_encoding.py --rows 100 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCHMARKS.parent), str(BENCHMARKS)]
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-" + "x" * 32)
+
+import json_encoding  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from synthetic import api_rows  # noqa: E402
+
+import app as api  # noqa: E402
+
+
+def best_seconds(encode: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def peak_bytes(encode: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    encode()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    previous = DefaultJSONProvider(api.app)
+    orjson = json_encoding.orjson
+
+    def stdlib_encode(payload: dict[str, Any]) -> bytes:
+        json_encoding.orjson = None
+        try:
+            return json_encoding.to_json_bytes(payload)
+        finally:
+            json_encoding.orjson = orjson
+
+    encoders: dict[str, Callable[[dict[str, Any]], Any]] = {
+        "_json + Flask default": lambda payload: previous.dumps(api._json(payload)).encode("utf-8"),
+        "one pass, stdlib": stdlib_encode,
+    }
+    if orjson is not None:
+        encoders["one pass, orjson"] = json_encoding.to_json_bytes
+
+    print(f"{'rows':>8}  {'encoder':<22} {'best ms':>9} {'peak MiB':>9} {'vs before':>10}")
+    for rows in args.rows:
+        payload = {"status": "success", "transactions": api_rows(rows)}
+        repeat = max(1, min(args.repeat * 20, args.repeat * 10_000 // rows))
+        baseline = None
+        for label, encode in encoders.items():
+            seconds = best_seconds(lambda: encode(payload), repeat)
+            peak = peak_bytes(lambda: encode(payload))
+            baseline = baseline or seconds
+            print(f"{rows:>8}  {label:<22} {seconds * 1000:9.2f} {peak / 2**20:9.2f} {seconds / baseline:10.0%}")
+
+
+if __name__ == "__main__":
+    main()
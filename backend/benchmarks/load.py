@@ -0,0 +1,267 @@
+"""End-to-end load harness for the API against a local PostgreSQL.
+
+Runs the Flask app in-process, with a fake chat model that streams a canned
+answer after ``--model-latency`` seconds, and drives the main user journeys
+from ``--concurrency`` threads:
+
+    GET /transactions, POST /transactions, POST /imports,
+    POST /imports/<id>/confirm, GET /expense-insights, POST /ai/agent/invoke
+
+Each virtual user is registered, given a ``--ledger-rows`` expense history and
+removed again at the end.  The database must already have ``Schema.sql``
+applied and should be a scratch one.  Latency percentiles and throughput are
+printed and can be saved as a baseline and compared later; a p95 more than
+``--tolerance`` above the baseline fails the run.  From ``backend/``::
+
+    python benchmarks/load.py --database-url postgresql:///finmanager_bench --save-baseline benchmarks/baseline.json
+    python benchmarks/load.py --database-url postgresql:///finmanager_bench --baseline benchmarks/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from psycopg2.extras import execute_values
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCHMARKS.parent), str(BENCHMARKS)]
+
+from synthetic import expense_rows, transaction_payloads  # noqa: E402
+
+OPERATIONS = (
+    "GET /transactions",
+    "POST /transactions",
+    "POST /imports",
+    "POST /imports/<id>/confirm",
+    "GET /expense-insights",
+    "POST /ai/agent/invoke",
+)
+REPLY = json.dumps({
+    "intent": "chat",
+    "ready_to_add": False,
+    "transaction": None,
+    "reply": "You spent most on food this month; your rent is due next week.",
+})
+
+
+class FakeChatModel:
+    """Streams a fixed action in a few chunks after a fixed delay."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _chunks(self):
+        class Chunk:
+            def __init__(self, content: str):
+                self.content = content
+
+        time.sleep(self.latency)
+        for start in range(0, len(REPLY), 16):
+            yield Chunk(REPLY[start:start + 16])
+
+    def stream(self, _prompt: str):
+        return self._chunks()
+
+    def invoke(self, _prompt: str):
+        return type("Reply", (), {"content": "yes"})()
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def call(self, operation: str, send: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[operation].append(elapsed)
+            if response.status_code >= 400:
+                self.errors[operation] += 1
+        return response
+
+    def summary(self, seconds: float) -> dict[str, Any]:
+        operations = {}
+        for operation in OPERATIONS:
+            ordered = sorted(self.latencies.get(operation, []))
+            if not ordered:
+                continue
+            operations[operation] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(operation, 0),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+                "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+            }
+        total = sum(item["requests"] for item in operations.values())
+        return {"seconds": round(seconds, 2), "requests": total, "requests_per_second": round(total / seconds, 1), "operations": operations}
+
+
+def _seed_ledger(connection: Any, user_id: str, rows: int, seed: int) -> None:
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO transactions (transaction_id, user_id, title, merchant, amount, category, transaction_type, date)
+            VALUES %s
+            """,
+            [
+                (transaction_id, user_id, title, merchant, amount, "Food", "Expense", when)
+                for transaction_id, title, merchant, amount, when in expense_rows(rows, seed)
+            ],
+            page_size=1_000,
+        )
+    connection.commit()
+
+
+def _journey(api: Any, recorder: Recorder, token: str, iteration: int, import_rows: int, session: dict[str, str]) -> None:
+    client = api.app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    payloads = transaction_payloads(import_rows + 1, seed=iteration)
+    recorder.call("GET /transactions", lambda: client.get("/transactions?page_size=50", headers=headers))
+    recorder.call("POST /transactions", lambda: client.post("/transactions", json=payloads[0], headers=headers))
+    created = recorder.call(
+        "POST /imports",
+        lambda: client.post("/imports", json={"source": "CSVImport", "items": payloads[1:]}, headers=headers),
+    )
+    if created.status_code == 201:
+        body = created.get_json()
+        import_id = body["import"]["import_id"]
+        decisions = [{"item_id": item["item_id"]} for item in body["items"]]
+        recorder.call(
+            "POST /imports/<id>/confirm",
+            lambda: client.post(f"/imports/{import_id}/confirm", json={"items": decisions}, headers=headers),
+        )
+    recorder.call("GET /expense-insights", lambda: client.get("/expense-insights", headers=headers))
+    answer = recorder.call(
+        "POST /ai/agent/invoke",
+        lambda: client.post(
+            "/ai/agent/invoke",
+            json={"message": "How is my spending this month?", **session},
+            headers=headers,
+        ),
+    )
+    if answer.status_code == 200 and not session:
+        session["session_id"] = str(answer.get_json()["session"]["session_id"])
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Describe every operation whose p95 grew more than ``tolerance``."""
+    regressions = []
+    for operation, measured in current["operations"].items():
+        before = baseline["operations"].get(operation)
+        if before and measured["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{operation}: p95 {before['p95_ms']} ms -> {measured['p95_ms']} ms")
+    floor = baseline["requests_per_second"] * (1 - tolerance)
+    if current["requests_per_second"] < floor:
+        regressions.append(f"throughput {baseline['requests_per_second']} -> {current['requests_per_second']} req/s")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=10, help="journeys per user")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ledger-rows", type=int, default=2_000, help="seeded expenses per user")
+    parser.add_argument("--import-rows", type=int, default=50)
+    parser.add_argument("--model-latency", type=float, default=0.2)
+    parser.add_argument("--baseline", type=Path, help="compare against this saved run")
+    parser.add_argument("--save-baseline", type=Path, help="write this run's results here")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # The app reads its settings at import time.
+    os.environ.update({
+        "DATABASE_URL": args.database_url,
+        "JWT_SECRET_KEY": "load-test-only-secret-" + "x" * 32,
+        "GROQ_API_KEY": "fake-model",
+        "BCRYPT_LOG_ROUNDS": "4",
+        "DB_POOL_MAX_SIZE": str(args.concurrency + 2),
+    })
+    import app as api
+    from model_client import ModelClients
+
+    api.limiter.enabled = False
+    api.model_clients = ModelClients(lambda _temperature: FakeChatModel(args.model_latency))
+    client = api.app.test_client()
+    connection = api.get_db_connection()
+
+    users = []
+    for index in range(args.users):
+        response = client.post("/auth/register", json={
+            "name": f"Load user {index}",
+            "email": f"load-{uuid.uuid4().hex[:12]}@example.com",
+            "password": "load-test-password",
+        })
+        if response.status_code != 201:
+            raise SystemExit(f"Could not register a load user: {response.get_json()}")
+        body = response.get_json()
+        users.append((str(body["user"]["user_id"]), body["access_token"]))
+        _seed_ledger(connection, users[-1][0], args.ledger_rows, seed=index)
+
+    recorder = Recorder()
+    sessions: dict[str, dict[str, str]] = {user_id: {} for user_id, _token in users}
+    jobs = [
+        (user_id, token, iteration)
+        for iteration in range(args.iterations)
+        for user_id, token in users
+    ]
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(
+                lambda job: _journey(api, recorder, job[1], job[2], args.import_rows, sessions[job[0]]), jobs
+            ))
+        elapsed = time.perf_counter() - started
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM customers WHERE user_id = ANY(%s::uuid[])", ([user_id for user_id, _token in users],))
+        connection.commit()
+        connection.close()
+
+    summary = recorder.summary(elapsed)
+    summary["parameters"] = {key: getattr(args, key) for key in ("users", "iterations", "concurrency", "ledger_rows", "import_rows", "model_latency")}
+    print(f"{'operation':<28} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for operation, measured in summary["operations"].items():
+        print(
+            f"{operation:<28} {measured['requests']:>8} {measured['errors']:>6} "
+            f"{measured['p50_ms']:>9.1f} {measured['p95_ms']:>9.1f} {measured['p99_ms']:>9.1f}"
+        )
+    print(f"{summary['requests']} requests in {summary['seconds']}s: {summary['requests_per_second']} req/s")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(summary, indent=2) + "\n")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("parameters") != summary["parameters"]:
+            print("Warning: the baseline was recorded with different parameters.")
+        regressions = compare(summary, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"Within {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Plain text versus prepared execution of the app's hottest statements.
+
+Seeds one throwaway user with ``--rows`` transactions inside a transaction
+that is rolled back at the end, then runs each registered statement
+``--iterations`` times as plain text and as ``EXECUTE``, and reports the mean
+round trip of each and the planner time PostgreSQL reports for one plain
+run.  Needs a database with ``Schema.sql`` applied.  From ``backend/``::
+
+    python benchmarks/prepared_statements.py --database-url postgresql:///finmanager_bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCHMARKS.parent), str(BENCHMARKS)]
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-" + "x" * 32)
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import RealDictCursor, execute_values  # noqa: E402
+from synthetic import expense_rows, transaction_payloads  # noqa: E402
+
+import app as api  # noqa: E402
+from prepared_statements import QueryRegistry  # noqa: E402
+
+
+def mean_seconds(runs, iterations: int) -> list[float]:
+    """Interleave the runs so table growth and caching favour neither."""
+    totals = [0.0] * len(runs)
+    for _ in range(iterations):
+        for index, run in enumerate(runs):
+            started = time.perf_counter()
+            run()
+            totals[index] += time.perf_counter() - started
+    return [total / iterations for total in totals]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--iterations", type=int, default=2_000)
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(args.database_url)
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    user_id = str(uuid.uuid4())
+    cursor.execute(
+        "INSERT INTO customers (user_id, name, email, password) VALUES (%s, 'Bench', %s, 'x')",
+        (user_id, f"bench-{user_id}@example.com"),
+    )
+    rows = expense_rows(args.rows)
+    execute_values(
+        cursor,
+        "INSERT INTO transactions (transaction_id, user_id, title, merchant, amount, category, transaction_type, date) VALUES %s",
+        [(transaction_id, user_id, title, merchant, amount, "Food", "Expense", when) for transaction_id, title, merchant, amount, when in rows],
+        page_size=1_000,
+    )
+    cursor.execute(
+        "INSERT INTO merchant_rules (rule_id, user_id, merchant_pattern, category) VALUES (%s, %s, 'merchant 3', 'Food')",
+        (str(uuid.uuid4()), user_id),
+    )
+    cursor.execute("ANALYZE transactions")
+    new_transaction = api._normalise_transaction(transaction_payloads(1)[0])
+
+    cases = {
+        "transaction_by_id": lambda: (rows[len(rows) // 2][0], user_id),
+        "merchant_rule_version": lambda: (user_id,),
+        "merchant_rules_all": lambda: (user_id,),
+        "transaction_insert": lambda: api._transaction_values(user_id, new_transaction, None),
+        "transactions_page": lambda: (user_id, 101, 0),
+    }
+    registry = QueryRegistry()
+    for name in cases:
+        registry.register(name, api.queries.statement(name))
+
+    print(f"{'statement':<20} {'plain us':>9} {'prepared us':>12} {'saved':>7} {'plan ms':>8}")
+    try:
+        for name, params in cases.items():
+            text = api.queries.statement(name)
+
+            def plain():
+                cursor.execute(text, params())
+                cursor.fetchall()
+
+            def prepared():
+                registry.execute(cursor, name, params())
+                cursor.fetchall()
+
+            plain(), prepared()  # warm the connection and the statement
+            plain_seconds, prepared_seconds = mean_seconds((plain, prepared), args.iterations)
+            cursor.execute("SAVEPOINT explain")
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {text}", params())
+            planning = cursor.fetchone()["QUERY PLAN"][0]["Planning Time"]
+            cursor.execute("ROLLBACK TO SAVEPOINT explain")
+            print(
+                f"{name:<20} {plain_seconds * 1e6:9.0f} {prepared_seconds * 1e6:12.0f} "
+                f"{1 - prepared_seconds / plain_seconds:7.0%} {planning:8.3f}"
+            )
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Deterministic synthetic ledgers shared by the benchmarks.
+
+Every generator takes a seed, so a run can be repeated and compared against a
+stored baseline.  Merchants follow a rough power law: a few are paid often
+(groceries, transit), most only now and then.
+"""
+
+from __future__ import annotations
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any
+
+NOW = datetime(2026, 7, 24, tzinfo=timezone.utc)
+CATEGORIES = ("Food", "Travel", "Bills", "Shopping", "Rent", "Others")
+
+
+def _merchants(rows: int) -> list[str]:
+    return [f"Merchant {index}" for index in range(max(5, rows // 40))]
+
+
+def expense_rows(rows: int, seed: int = 7) -> list[tuple]:
+    """``(transaction_id, title, merchant, amount, date)`` tuples over 400 days."""
+    random_ = random.Random(seed)
+    merchants = _merchants(rows)
+    weights = [1 / (rank + 1) for rank in range(len(merchants))]
+    chosen = random_.choices(merchants, weights, k=rows)
+    return [
+        (
+            str(uuid.UUID(int=random_.getrandbits(128))),
+            merchant,
+            merchant,
+            Decimal(random_.choice((199, 499, 1250, random_.randint(50, 5000)))),
+            NOW - timedelta(seconds=random_.randint(0, 400 * 86_400)),
+        )
+        for merchant in chosen
+    ]
+
+
+def transaction_payloads(rows: int, seed: int = 7) -> list[dict[str, Any]]:
+    """Request bodies as the app sends them to ``POST /transactions``."""
+    random_ = random.Random(seed)
+    merchants = _merchants(rows)
+    return [
+        {
+            "title": merchant,
+            "merchant": merchant,
+            "amount": f"{random_.randint(50, 5000)}.{random_.randint(0, 99):02d}",
+            "category": random_.choice(CATEGORIES),
+            "transaction_type": "Expense",
+            "date": (NOW - timedelta(seconds=random_.randint(0, 400 * 86_400))).isoformat(),
+            "payment_method": random_.choice(("UPI", "Card", None)),
+        }
+        for merchant in random_.choices(merchants, k=rows)
+    ]
+
+
+def api_rows(rows: int, seed: int = 7) -> list[dict[str, Any]]:
+    """Stored transaction rows, as ``RealDictCursor`` returns them, for ``_json``."""
+    return [
+        {
+            "transaction_id": uuid.UUID(transaction_id),
+            "title": title,
+            "merchant": merchant,
+            "amount": amount,
+            "category": "Food",
+            "transaction_type": "Expense",
+            "date": when,
+            "source": "Manual",
+            "confidence": Decimal("1.00"),
+            "is_essential": False,
+            "created_at": when,
+        }
+        for transaction_id, title, merchant, amount, when in expense_rows(rows, seed)
+    ]
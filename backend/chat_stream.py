@@ -0,0 +1,96 @@
+"""Helpers for streaming chat replies as server-sent events.
+
+The model answers with one JSON action object, so its raw tokens are not fit
+to show.  ``ReplyExtractor`` watches the stream and decodes only the text of
+the ``"reply"`` string as it arrives, which is what the client renders while
+the rest of the action is still being generated.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+_REPLY_START = re.compile(r'"reply"\s*:\s*"')
+_ADDS_TRANSACTION = (
+    re.compile(r'"intent"\s*:\s*"add_transaction"'),
+    re.compile(r'"ready_to_add"\s*:\s*true'),
+)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class ReplyExtractor:
+    """Incrementally decode the ``"reply"`` string of a streamed JSON object."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._position: int | None = None
+        self.complete = False
+
+    def adds_transaction(self) -> bool:
+        """Whether the action seen so far is a ready add, whose reply the server replaces."""
+        return all(pattern.search(self._buffer) for pattern in _ADDS_TRANSACTION)
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of model output and return any newly decoded reply text."""
+        self._buffer += chunk
+        if self.complete:
+            return ""
+        if self._position is None:
+            match = _REPLY_START.search(self._buffer)
+            if not match:
+                return ""
+            self._position = match.end()
+        buffer, index, decoded = self._buffer, self._position, []
+        while index < len(buffer):
+            char = buffer[index]
+            if char == '"':
+                self.complete = True
+                index += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                index += 1
+                continue
+            # An escape cut off by the chunk boundary waits for the next chunk.
+            if index + 1 >= len(buffer):
+                break
+            escape = buffer[index + 1]
+            if escape != "u":
+                decoded.append(_ESCAPES.get(escape, escape))
+                index += 2
+                continue
+            text, consumed = _unicode_escape(buffer, index)
+            if not consumed:
+                break
+            decoded.append(text)
+            index += consumed
+        self._position = index
+        return "".join(decoded)
+
+
+def _unicode_escape(buffer: str, index: int) -> tuple[str, int]:
+    """Decode ``\\uXXXX`` at ``index``, joining surrogate pairs; (text, 0) if incomplete."""
+    if index + 6 > len(buffer):
+        return "", 0
+    try:
+        code = int(buffer[index + 2:index + 6], 16)
+    except ValueError:
+        return "", 6
+    if 0xD800 <= code < 0xDC00:
+        if index + 12 > len(buffer):
+            return "", 0
+        if buffer[index + 6:index + 8] == "\\u":
+            try:
+                low = int(buffer[index + 8:index + 12], 16)
+            except ValueError:
+                low = 0
+            if 0xDC00 <= low < 0xE000:
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+        return "", 6
+    return chr(code), 6
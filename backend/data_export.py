@@ -0,0 +1,103 @@
+"""Streaming serialisers for the personal data export.
+
+An export is a sequence of ``(section, rows)`` pairs, where ``rows`` is any
+iterator of dicts, typically a server-side cursor.  Each writer turns that
+into text pieces one row at a time and ``encode_stream`` batches the pieces
+into bytes, gzip-compressing them when asked, so the memory an export needs
+does not depend on how much data the account holds.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from typing import Any, Callable, Iterable, Iterator
+
+Section = tuple[str, Iterator[dict[str, Any]]]
+
+FLUSH_BYTES = 64 * 1024
+
+
+def write_json(sections: Iterable[Section], dumps: Callable[[Any], str] = json.dumps) -> Iterator[str]:
+    """The original ``{"status": "success", "export": {...}}`` document.
+
+    The ``profile`` section is written as a single object, every other section
+    as a list, so existing clients read the same shape as before.  ``dumps``
+    encodes one row, including any ``Decimal`` or ``datetime`` values in it.
+    """
+    yield '{"status": "success", "export": {'
+    for index, (section, rows) in enumerate(sections):
+        prefix = ", " if index else ""
+        if section == "profile":
+            yield f'{prefix}"profile": {dumps(next(rows, None))}'
+            continue
+        yield f'{prefix}"{section}": ['
+        for position, row in enumerate(rows):
+            yield (", " if position else "") + dumps(row)
+        yield "]"
+    yield "}}"
+
+
+def write_ndjson(sections: Iterable[Section], dumps: Callable[[Any], str] = json.dumps) -> Iterator[str]:
+    """One ``{"section": ..., "data": {...}}`` line per row."""
+    for section, rows in sections:
+        for row in rows:
+            yield dumps({"section": section, "data": row}) + "\n"
+
+
+def write_csv(sections: Iterable[Section], convert: Callable[[Any], Any]) -> Iterator[str]:
+    """Sectioned CSV: every section starts with its own header row.
+
+    The first column names the section on every line, including the header,
+    so the file can be split with any CSV reader.  Sections without rows are
+    left out.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    for section, rows in sections:
+        columns: list[str] | None = None
+        for row in rows:
+            values = convert(row)
+            if columns is None:
+                columns = list(values)
+                writer.writerow(["section", *columns])
+            writer.writerow([section, *(_csv_cell(values.get(column)) for column in columns)])
+            yield drain()
+
+
+def _csv_cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return "" if value is None else value
+
+
+def encode_stream(pieces: Iterable[str], *, compress: bool = False) -> Iterator[bytes]:
+    """Batch text pieces into UTF-8 chunks of about ``FLUSH_BYTES``, optionally gzip."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 = gzip container
+    buffer: list[str] = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size < FLUSH_BYTES:
+            continue
+        data = "".join(buffer).encode()
+        buffer, size = [], 0
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    data = "".join(buffer).encode()
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
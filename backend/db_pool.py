@@ -0,0 +1,180 @@
+"""A small, bounded PostgreSQL connection pool.
+
+psycopg2 ships pools, but they raise as soon as every connection is in use and
+never check or recycle what they hand out.  This pool blocks for a bounded time
+instead, pings connections that have been idle for a while before lending them,
+and retires connections after a maximum lifetime so server-side memory and
+stale TLS sessions do not accumulate.  It is deliberately independent of Flask
+and of the driver so the behaviour can be tested with plain fakes.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+
+class PoolExhausted(RuntimeError):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+class _Slot:
+    __slots__ = ("connection", "created_at", "returned_at")
+
+    def __init__(self, connection: Any, created_at: float):
+        self.connection = connection
+        self.created_at = created_at
+        self.returned_at = created_at
+
+
+class ConnectionPool:
+    """Thread-safe pool holding between ``min_size`` and ``max_size`` connections.
+
+    ``connect`` is any zero-argument callable returning a DB-API connection.
+    Connections idle for longer than ``ping_after`` seconds are checked with
+    ``SELECT 1`` on checkout; connections older than ``max_lifetime`` seconds
+    are closed when they are returned or found idle.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        *,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_lifetime: float = 1800.0,
+        ping_after: float = 30.0,
+        checkout_timeout: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.checkout_timeout = checkout_timeout
+        self._clock = clock
+        self._idle: deque[_Slot] = deque()
+        self._in_use: dict[int, _Slot] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._counters = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "exhausted_waits": 0,
+            "exhausted_timeouts": 0,
+            "failed_health_checks": 0,
+        }
+        with self._condition:
+            for _ in range(min_size):
+                self._idle.append(self._open())
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._in_use)
+
+    def _open(self) -> _Slot:
+        # Called with the condition held; opening a connection is slow, but
+        # holding the lock keeps the size bound exact and the pool is small.
+        connection = self._connect()
+        self._counters["connections_opened"] += 1
+        return _Slot(connection, self._clock())
+
+    def _discard(self, slot: _Slot) -> None:
+        self._counters["connections_closed"] += 1
+        try:
+            slot.connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, slot: _Slot) -> bool:
+        return self._clock() - slot.created_at >= self.max_lifetime
+
+    def _healthy(self, slot: _Slot) -> bool:
+        connection = slot.connection
+        if getattr(connection, "closed", False):
+            return False
+        if self._clock() - slot.returned_at < self.ping_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self) -> Any:
+        """Borrow a healthy connection, waiting up to ``checkout_timeout`` seconds."""
+        deadline = self._clock() + self.checkout_timeout
+        waited = False
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolExhausted("The connection pool is closed.")
+                while self._idle:
+                    slot = self._idle.pop()
+                    if self._expired(slot):
+                        self._discard(slot)
+                    elif self._healthy(slot):
+                        return self._lend(slot)
+                    else:
+                        self._counters["failed_health_checks"] += 1
+                        self._discard(slot)
+                if self.size < self.max_size:
+                    return self._lend(self._open())
+                if not waited:
+                    waited = True
+                    self._counters["exhausted_waits"] += 1
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    self._counters["exhausted_timeouts"] += 1
+                    raise PoolExhausted(
+                        f"No database connection became free within {self.checkout_timeout:g}s."
+                    )
+                self._condition.wait(remaining)
+
+    def _lend(self, slot: _Slot) -> Any:
+        self._in_use[id(slot.connection)] = slot
+        self._counters["checkouts"] += 1
+        return slot.connection
+
+    def putconn(self, connection: Any, *, discard: bool = False) -> None:
+        """Return a borrowed connection; broken or expired connections are closed."""
+        with self._condition:
+            slot = self._in_use.pop(id(connection), None)
+            if slot is None:
+                return
+            if (
+                discard
+                or self._closed
+                or getattr(connection, "closed", False)
+                or self._expired(slot)
+            ):
+                self._discard(slot)
+            else:
+                slot.returned_at = self._clock()
+                self._idle.append(slot)
+            self._condition.notify()
+
+    def closeall(self) -> None:
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._condition.notify_all()
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                **self._counters,
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "max_size": self.max_size,
+            }
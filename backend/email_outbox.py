@@ -0,0 +1,316 @@
+"""Transactional email delivery from the ``email_outbox`` table.
+
+Routes never talk to Brevo.  They insert the message into ``email_outbox`` in
+the same transaction as the change that caused it, and this worker delivers
+it: it claims a batch of due rows with ``FOR UPDATE SKIP LOCKED`` (so several
+workers can run side by side), sends them over one reused HTTP connection and
+records every outcome in a single statement.  Failed sends are retried with
+exponential backoff and jitter; the last error is kept on the row.
+
+Run it next to the web process, from ``backend/``::
+
+    python email_outbox.py
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import random
+import select
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable
+from urllib.parse import urlsplit
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+BREVO_URL = "https://api.brevo.com/v3/smtp/email"
+NOTIFY_CHANNEL = "email_outbox"
+
+
+class DeliveryError(RuntimeError):
+    """A send failed; ``retryable`` is False when retrying cannot help."""
+
+    def __init__(self, message: str, *, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class BrevoSender:
+    """Sends outbox rows through Brevo's transactional email API.
+
+    One HTTP connection is kept open and reused for consecutive sends; it is
+    reopened after any error.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        sender_email: str,
+        sender_name: str = "FinManager",
+        *,
+        url: str = BREVO_URL,
+        timeout: float = 10.0,
+    ):
+        self.api_key = api_key
+        self.sender = {"name": sender_name, "email": sender_email}
+        parts = urlsplit(url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._netloc = parts.netloc
+        self._path = parts.path or "/"
+        self.timeout = timeout
+        self._connection: http.client.HTTPConnection | None = None
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __call__(self, message: dict[str, Any]) -> None:
+        body = json.dumps({
+            "sender": self.sender,
+            "to": [{"email": message["recipient"]}],
+            "subject": message["subject"],
+            "textContent": message["text_content"],
+            "htmlContent": message["html_content"],
+        }).encode("utf-8")
+        headers = {"accept": "application/json", "api-key": self.api_key, "content-type": "application/json"}
+        try:
+            if self._connection is None:
+                self._connection = self._connection_class(self._netloc, timeout=self.timeout)
+            self._connection.request("POST", self._path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as error:
+            self.close()
+            raise DeliveryError(f"Brevo could not be reached: {error}", retryable=True) from error
+        if response.will_close:
+            self.close()
+        if 200 <= response.status < 300:
+            return
+        # Throttling and server errors are retried; any other rejection would repeat.
+        retryable = response.status == 429 or response.status >= 500
+        raise DeliveryError(f"Brevo returned HTTP {response.status}.", retryable=retryable)
+
+
+@dataclass
+class Outcome:
+    email_id: str
+    status: str
+    error: str | None = None
+    next_attempt_at: datetime | None = None
+
+
+def backoff_delay(attempts: int, *, base: float, cap: float, jitter: Callable[[], float] = random.random) -> float:
+    """Exponential backoff with jitter: between half and all of ``base * 2**(attempts-1)``."""
+    delay = min(cap, base * 2 ** max(0, attempts - 1))
+    return delay * (0.5 + jitter() / 2)
+
+
+def deliver_batch(
+    messages: Iterable[dict[str, Any]],
+    send: Callable[[dict[str, Any]], None],
+    *,
+    now: datetime,
+    max_attempts: int = 6,
+    base_delay: float = 30.0,
+    max_delay: float = 3600.0,
+    jitter: Callable[[], float] = random.random,
+) -> list[Outcome]:
+    """Send claimed messages and decide what happens to each.
+
+    ``attempts`` on a message already counts this attempt.  A reset email whose
+    token has been replaced or used (``reset_token_id`` is None) or has expired
+    (``reset_expires_at``) is cancelled, and one is never retried past its
+    token's expiry: the code it carries would be refused by then.
+    """
+    outcomes = []
+    for message in messages:
+        email_id = str(message["email_id"])
+        expires_at = message["reset_expires_at"] if message["kind"] == "password_reset" else None
+        if message["kind"] == "password_reset" and (message["reset_token_id"] is None or expires_at <= now):
+            outcomes.append(Outcome(email_id, "cancelled"))
+            continue
+        try:
+            send(message)
+        except Exception as error:
+            # Anything other than a DeliveryError is unexpected and retried.
+            retryable = error.retryable if isinstance(error, DeliveryError) else True
+            retry_at = now + timedelta(
+                seconds=backoff_delay(message["attempts"], base=base_delay, cap=max_delay, jitter=jitter)
+            )
+            if retryable and message["attempts"] < max_attempts and (expires_at is None or retry_at < expires_at):
+                outcomes.append(Outcome(email_id, "pending", str(error)[:500], retry_at))
+            else:
+                outcomes.append(Outcome(email_id, "failed", str(error)[:500]))
+            continue
+        outcomes.append(Outcome(email_id, "sent"))
+    return outcomes
+
+
+class OutboxWorker:
+    """Claims due outbox rows in batches and records what happened to them."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        send: Callable[[dict[str, Any]], None],
+        *,
+        batch_size: int = 25,
+        max_attempts: int = 6,
+        base_delay: float = 30.0,
+        max_delay: float = 3600.0,
+        lease_seconds: int = 300,
+    ):
+        self._connect = connect
+        self._send = send
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self._connection: Any = None
+
+    def _cursor(self) -> RealDictCursor:
+        if self._connection is None or self._connection.closed:
+            self._connection = self._connect()
+        return self._connection.cursor(cursor_factory=RealDictCursor)
+
+    def _claim(self) -> list[dict[str, Any]]:
+        # A row stuck in 'sending' past its lease belongs to a worker that died
+        # mid-batch, and is claimed again.
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE email_outbox AS outbox
+                SET status = 'sending', attempts = outbox.attempts + 1,
+                    locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                WHERE outbox.email_id IN (
+                  SELECT email_id FROM email_outbox
+                  WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                     OR (status = 'sending' AND locked_until < CURRENT_TIMESTAMP)
+                  ORDER BY next_attempt_at
+                  LIMIT %s
+                  FOR UPDATE SKIP LOCKED
+                )
+                RETURNING outbox.*, (
+                  SELECT expires_at FROM password_reset_tokens WHERE token_id = outbox.reset_token_id
+                ) AS reset_expires_at
+                """,
+                (self.lease_seconds, self.batch_size),
+            )
+            claimed = cursor.fetchall()
+        self._connection.commit()
+        return claimed
+
+    def _record(self, outcomes: list[Outcome]) -> None:
+        with self._cursor() as cursor:
+            # Codes in reset emails are secrets; once a row is finished its
+            # bodies are dropped. An unsent code must not stay usable.
+            execute_values(
+                cursor,
+                """
+                UPDATE email_outbox AS outbox SET
+                  status = outcome.status,
+                  last_error = outcome.error,
+                  next_attempt_at = COALESCE(outcome.next_attempt_at::timestamptz, outbox.next_attempt_at),
+                  locked_until = NULL,
+                  sent_at = CASE WHEN outcome.status = 'sent' THEN CURRENT_TIMESTAMP END,
+                  text_content = CASE WHEN outbox.kind = 'password_reset' AND outcome.status <> 'pending'
+                                      THEN NULL ELSE outbox.text_content END,
+                  html_content = CASE WHEN outbox.kind = 'password_reset' AND outcome.status <> 'pending'
+                                      THEN NULL ELSE outbox.html_content END
+                FROM (VALUES %s) AS outcome (email_id, status, error, next_attempt_at)
+                WHERE outbox.email_id = outcome.email_id::uuid
+                """,
+                [(item.email_id, item.status, item.error, item.next_attempt_at) for item in outcomes],
+                page_size=len(outcomes),
+            )
+            failed = [item.email_id for item in outcomes if item.status == "failed"]
+            if failed:
+                cursor.execute(
+                    """
+                    DELETE FROM password_reset_tokens WHERE token_id IN (
+                      SELECT reset_token_id FROM email_outbox
+                      WHERE email_id = ANY(%s::uuid[]) AND reset_token_id IS NOT NULL
+                    )
+                    """,
+                    (failed,),
+                )
+        self._connection.commit()
+
+    def run_once(self) -> list[Outcome]:
+        """Deliver one batch of due messages; returns their outcomes."""
+        try:
+            claimed = self._claim()
+            if not claimed:
+                return []
+            outcomes = deliver_batch(
+                claimed,
+                self._send,
+                now=datetime.now(timezone.utc),
+                max_attempts=self.max_attempts,
+                base_delay=self.base_delay,
+                max_delay=self.max_delay,
+            )
+            self._record(outcomes)
+            return outcomes
+        except psycopg2.Error:
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = None
+            raise
+
+    def run_forever(self, listen: Any = None, *, poll_interval: float = 5.0) -> None:
+        """Drain batches, then sleep until NOTIFY wakes the worker or a poll is due.
+
+        ``listen`` is an autocommit connection that has run ``LISTEN
+        email_outbox``; without it the worker polls.
+        """
+        while True:
+            try:
+                if len(self.run_once()) == self.batch_size:
+                    continue
+            except psycopg2.Error:
+                time.sleep(poll_interval)
+                continue
+            if listen is None:
+                time.sleep(poll_interval)
+                continue
+            if select.select([listen], [], [], poll_interval)[0]:
+                listen.poll()
+                listen.notifies.clear()
+
+
+def main() -> None:
+    import logging
+    import os
+
+    try:
+        from .app import get_db_connection
+    except ImportError:  # pragma: no cover - direct-script fallback
+        from app import get_db_connection
+
+    logging.basicConfig(level=logging.INFO)
+    api_key = os.getenv("BREVO_API_KEY")
+    sender_email = os.getenv("BREVO_SENDER_EMAIL")
+    if not api_key or not sender_email:
+        raise SystemExit("BREVO_API_KEY and BREVO_SENDER_EMAIL must be set to deliver email.")
+    worker = OutboxWorker(
+        get_db_connection,
+        BrevoSender(api_key, sender_email, os.getenv("BREVO_SENDER_NAME", "FinManager")),
+        batch_size=int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "25")),
+        max_attempts=int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6")),
+    )
+    listen = get_db_connection()
+    listen.autocommit = True
+    with listen.cursor() as cursor:
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+    worker.run_forever(listen, poll_interval=float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5")))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,14 @@ from collections import defaultdict
 from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
 from statistics import median
-from typing import Any, Iterable
+from typing import Any, Iterable, NamedTuple
+
+try:  # Optional: large ledgers take a columnar path when NumPy is installed.
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without NumPy
+    np = None
+
+COLUMNAR_MIN_ROWS = 1_000
 
 
 def _as_datetime(value: Any) -> datetime:
@@ -32,6 +39,68 @@ def _money(value: Decimal) -> float:
     return float(value.quantize(Decimal("0.01")))
 
 
+def _rupees(paise: int) -> Decimal:
+    return Decimal(paise).scaleb(-2)
+
+
+class ExpenseRecord(NamedTuple):
+    """One expense as the insight rules read it.
+
+    Amounts are whole paise and the merchant is resolved (merchant, else
+    title) and keyed once, so the rules never touch the original row.
+    """
+
+    transaction_id: Any
+    merchant: str
+    merchant_key: str
+    paise: int
+    date: datetime
+
+
+# Column order ``expense_records`` expects from a tuple cursor.  The merchant
+# key comes from the same SQL function the transaction triggers use to mark
+# merchants dirty, so both sides always agree on which merchant a row is.
+EXPENSE_RECORD_COLUMNS = "transaction_id, title, merchant, amount, date, expense_merchant_key(merchant, title)"
+
+
+def expense_merchant_key(merchant: str | None, title: str | None) -> str:
+    """The Python twin of the ``expense_merchant_key`` SQL function.
+
+    Only for rows that did not come through ``EXPENSE_RECORD_COLUMNS``.
+    """
+    return (merchant or title or "").strip(" ").lower()
+
+
+def expense_records(rows: Iterable[tuple]) -> list[ExpenseRecord]:
+    """Build records from ``(transaction_id, title, merchant, amount, date, merchant_key)`` expense rows.
+
+    Rows without a merchant or title are skipped, as the rules ignore them.
+    Equal merchant names share one string, which matters for long ledgers.
+    """
+    merchants: dict[str, str] = {}
+    keys: dict[str, str] = {}
+    records = []
+    for transaction_id, title, merchant, amount, when, merchant_key in rows:
+        raw_name = merchant or title or ""
+        name = merchants.get(raw_name)
+        if name is None:
+            name = merchants[raw_name] = raw_name.strip()
+        if not name:
+            continue
+        scaled = _amount(amount) * 100
+        paise = int(scaled)
+        if paise != scaled:
+            raise ValueError(f"Amount {amount} of transaction {transaction_id} is not a whole number of paise.")
+        records.append(ExpenseRecord(
+            transaction_id,
+            name,
+            keys.setdefault(merchant_key, merchant_key),
+            paise,
+            when if type(when) is datetime and when.tzinfo else _as_datetime(when),
+        ))
+    return records
+
+
 def _insight(
     key: str,
     kind: str,
@@ -56,128 +125,262 @@ def _insight(
     }
 
 
-def build_expense_insights(
-    transactions: Iterable[dict[str, Any]],
-    commitments: Iterable[dict[str, Any]],
-    *,
-    now: datetime | None = None,
-) -> list[dict[str, Any]]:
-    """Return high-confidence expense signals for a single user.
+def _duplicate_insight(
+    transaction_ids: Iterable[Any], merchant_key: str, merchant: str, amount: Decimal, difference: timedelta
+) -> dict[str, Any]:
+    ids = sorted(str(transaction_id) for transaction_id in transaction_ids)
+    return _insight(
+        f"duplicate:{ids[0]}:{ids[1]}",
+        "possible_duplicate",
+        "Possible duplicate payment",
+        f"Two payments of ₹{_money(amount):,.2f} to {merchant} were recorded within 24 hours.",
+        0.92,
+        amount,
+        {
+            "transaction_ids": ids,
+            "merchant": merchant,
+            "merchant_key": merchant_key,
+            "time_difference_hours": round(difference.total_seconds() / 3600, 1),
+        },
+    )
 
-    Transactions must already be authorised and scoped to one user.  The
-    returned evidence contains only the transaction ids and values that led to
-    a conclusion, so the client can always explain an alert.
-    """
-    now = now or datetime.now(timezone.utc)
-    expenses = [
+
+def _recurring_insight(
+    merchant_key: str,
+    merchant: str,
+    transaction_ids: list[Any],
+    amounts: list[Decimal],
+    dates: list[date],
+) -> dict[str, Any] | None:
+    """Signal for a merchant's last three or four payments, oldest first."""
+    gaps = [(right - left).days for left, right in zip(dates, dates[1:])]
+    typical_gap = median(gaps)
+    if not (24 <= typical_gap <= 37 or 340 <= typical_gap <= 390):
+        return None
+    annual_multiplier = Decimal("12") if typical_gap < 100 else Decimal("1")
+    average = sum(amounts, Decimal("0")) / len(amounts)
+    cadence = "monthly" if annual_multiplier == 12 else "yearly"
+    next_due = dates[-1] + timedelta(days=round(typical_gap))
+    return _insight(
+        f"recurring:{merchant_key}:{cadence}",
+        "recurring_expense",
+        f"Likely {cadence} expense",
+        f"{merchant} has appeared {len(dates)} times at roughly {cadence} intervals. The next payment is likely around {next_due.isoformat()}.",
+        0.82,
+        average,
         {
-            **transaction,
-            "date": _as_datetime(transaction["date"]),
-            "amount": _amount(transaction["amount"]),
-            "merchant": (transaction.get("merchant") or transaction.get("title") or "").strip(),
-        }
-        for transaction in transactions
-        if transaction.get("transaction_type") == "Expense"
-    ]
+            "transaction_ids": [str(transaction_id) for transaction_id in transaction_ids],
+            "merchant": merchant,
+            "merchant_key": merchant_key,
+            "cadence": cadence,
+            "typical_gap_days": typical_gap,
+            "next_expected_date": next_due.isoformat(),
+        },
+        average * annual_multiplier,
+    )
+
+
+def _price_creep_insight(
+    merchant_key: str,
+    merchant: str,
+    now: datetime,
+    transaction_ids: list[Any],
+    current: tuple[Decimal, int],
+    previous: tuple[Decimal, int],
+) -> dict[str, Any] | None:
+    """Compare the totals and counts of the last 30 days and the 30 before."""
+    current_average = current[0] / current[1]
+    previous_average = previous[0] / previous[1]
+    increase = current_average - previous_average
+    if not (previous_average > 0 and increase >= Decimal("100") and current_average >= previous_average * Decimal("1.20")):
+        return None
+    percent = int((increase / previous_average) * 100)
+    return _insight(
+        f"price-creep:{merchant_key}:{now.strftime('%Y-%m')}",
+        "price_creep",
+        "This merchant is costing more",
+        f"Your average payment to {merchant} is {percent}% higher than in the previous 30 days.",
+        0.75,
+        increase,
+        {
+            "transaction_ids": [str(transaction_id) for transaction_id in transaction_ids],
+            "merchant": merchant,
+            "merchant_key": merchant_key,
+            "current_average": _money(current_average),
+            "previous_average": _money(previous_average),
+        },
+    )
+
+
+def _merchant_insights(expenses: list[ExpenseRecord], now: datetime) -> list[dict[str, Any]]:
     insights: list[dict[str, Any]] = []
-    by_merchant: dict[str, list[dict[str, Any]]] = defaultdict(list)
-    for transaction in expenses:
-        if transaction["merchant"]:
-            by_merchant[transaction["merchant"].casefold()].append(transaction)
+    by_merchant: dict[str, list[ExpenseRecord]] = defaultdict(list)
+    for record in expenses:
+        by_merchant[record.merchant_key].append(record)
 
     # Same merchant and amount within 24h is a useful duplicate-payment signal.
     for merchant_key, items in by_merchant.items():
-        items.sort(key=lambda item: item["date"])
+        items.sort(key=lambda item: item.date)
         for first, second in zip(items, items[1:]):
-            if (
-                first["amount"] == second["amount"]
-                and second["date"] - first["date"] <= timedelta(hours=24)
-            ):
-                ids = sorted((str(first["transaction_id"]), str(second["transaction_id"])))
+            if first.paise == second.paise and second.date - first.date <= timedelta(hours=24):
                 insights.append(
-                    _insight(
-                        f"duplicate:{ids[0]}:{ids[1]}",
-                        "possible_duplicate",
-                        "Possible duplicate payment",
-                        f"Two payments of ₹{_money(first['amount']):,.2f} to {first['merchant']} were recorded within 24 hours.",
-                        0.92,
-                        first["amount"],
-                        {
-                            "transaction_ids": ids,
-                            "merchant": first["merchant"],
-                            "time_difference_hours": round(
-                                (second["date"] - first["date"]).total_seconds() / 3600, 1
-                            ),
-                        },
+                    _duplicate_insight(
+                        (first.transaction_id, second.transaction_id),
+                        merchant_key,
+                        first.merchant,
+                        _rupees(first.paise),
+                        second.date - first.date,
                     )
                 )
 
     for merchant_key, items in by_merchant.items():
-        items.sort(key=lambda item: item["date"])
         recent = items[-4:]
         if len(recent) >= 3:
-            gaps = [
-                (right["date"].date() - left["date"].date()).days
-                for left, right in zip(recent, recent[1:])
-            ]
-            typical_gap = median(gaps)
-            if 24 <= typical_gap <= 37 or 340 <= typical_gap <= 390:
-                annual_multiplier = Decimal("12") if typical_gap < 100 else Decimal("1")
-                average = sum((item["amount"] for item in recent), Decimal("0")) / len(recent)
-                cadence = "monthly" if annual_multiplier == 12 else "yearly"
-                next_due = recent[-1]["date"].date() + timedelta(days=round(typical_gap))
-                insights.append(
-                    _insight(
-                        f"recurring:{merchant_key}:{cadence}",
-                        "recurring_expense",
-                        f"Likely {cadence} expense",
-                        f"{recent[-1]['merchant']} has appeared {len(recent)} times at roughly {cadence} intervals. The next payment is likely around {next_due.isoformat()}.",
-                        0.82,
-                        average,
-                        {
-                            "transaction_ids": [str(item["transaction_id"]) for item in recent],
-                            "merchant": recent[-1]["merchant"],
-                            "cadence": cadence,
-                            "typical_gap_days": typical_gap,
-                            "next_expected_date": next_due.isoformat(),
-                        },
-                        average * annual_multiplier,
-                    )
-                )
+            recurring = _recurring_insight(
+                merchant_key,
+                recent[-1].merchant,
+                [item.transaction_id for item in recent],
+                [_rupees(item.paise) for item in recent],
+                [item.date.date() for item in recent],
+            )
+            if recurring:
+                insights.append(recurring)
 
         # Compare a merchant's most recent 30 days with the preceding 30 days.
-        current_window = [item for item in items if item["date"] >= now - timedelta(days=30)]
+        current_window = [item for item in items if item.date >= now - timedelta(days=30)]
         previous_window = [
             item
             for item in items
-            if now - timedelta(days=60) <= item["date"] < now - timedelta(days=30)
+            if now - timedelta(days=60) <= item.date < now - timedelta(days=30)
         ]
         if current_window and previous_window:
-            current_average = sum((item["amount"] for item in current_window), Decimal("0")) / len(current_window)
-            previous_average = sum((item["amount"] for item in previous_window), Decimal("0")) / len(previous_window)
-            increase = current_average - previous_average
-            if previous_average > 0 and increase >= Decimal("100") and current_average >= previous_average * Decimal("1.20"):
-                percent = int((increase / previous_average) * 100)
-                insights.append(
-                    _insight(
-                        f"price-creep:{merchant_key}:{now.strftime('%Y-%m')}",
-                        "price_creep",
-                        "This merchant is costing more",
-                        f"Your average payment to {items[-1]['merchant']} is {percent}% higher than in the previous 30 days.",
-                        0.75,
-                        increase,
-                        {
-                            "transaction_ids": [
-                                str(item["transaction_id"])
-                                for item in current_window + previous_window
-                            ],
-                            "merchant": items[-1]["merchant"],
-                            "current_average": _money(current_average),
-                            "previous_average": _money(previous_average),
-                        },
-                    )
-                )
+            creep = _price_creep_insight(
+                merchant_key,
+                items[-1].merchant,
+                now,
+                [item.transaction_id for item in current_window + previous_window],
+                (_rupees(sum(item.paise for item in current_window)), len(current_window)),
+                (_rupees(sum(item.paise for item in previous_window)), len(previous_window)),
+            )
+            if creep:
+                insights.append(creep)
+    return insights
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_DAY = 86_400_000_000  # microseconds
+
+
+def _columnar_merchant_insights(expenses: list[ExpenseRecord], now: datetime) -> list[dict[str, Any]]:
+    """The same signals as :func:`_merchant_insights`, over sorted NumPy columns.
+
+    Records are read once into int64 columns (epoch microseconds, paise and a
+    merchant code in first-seen order); grouping, gaps and window sums are
+    array operations, and only merchants that pass a vectorised test are
+    confirmed with the shared Decimal builders, so the output is identical.
+    """
+    if not expenses:
+        return []
+    codes: dict[str, int] = {}
+    code = np.array([codes.setdefault(record.merchant_key, len(codes)) for record in expenses], dtype=np.int64)
+    merchant_keys = list(codes)
+    stamp = np.array([(record.date - _EPOCH) // _MICROSECOND for record in expenses], dtype=np.int64)
+    paise = np.array([record.paise for record in expenses], dtype=np.int64)
+    # Calendar days as the row path counts them, in each record's own zone.
+    day = np.array([record.date.toordinal() for record in expenses], dtype=np.int64)
+
+    # lexsort is stable, so equal timestamps keep their input order as in the
+    # row path; ``rows`` maps each sorted position back to its record.
+    order = np.lexsort((stamp, code))
+    code, stamp, paise, day = code[order], stamp[order], paise[order], day[order]
+    starts = np.flatnonzero(np.r_[True, code[1:] != code[:-1]])
+    ends = np.r_[starts[1:], len(code)]
+    counts = ends - starts
+    # Python lists for the few positions the loops below look up one by one.
+    rows, sorted_paise, sorted_days = order.tolist(), paise.tolist(), day.tolist()
+
+    def amount(position: int) -> Decimal:
+        return _rupees(sorted_paise[position])
+
+    insights: list[dict[str, Any]] = []
+    duplicates = (code[1:] == code[:-1]) & (paise[1:] == paise[:-1]) & (stamp[1:] - stamp[:-1] <= _DAY)
+    for position in np.flatnonzero(duplicates).tolist():
+        first, second = rows[position], rows[position + 1]
+        insights.append(
+            _duplicate_insight(
+                (expenses[first].transaction_id, expenses[second].transaction_id),
+                expenses[first].merchant_key,
+                expenses[first].merchant,
+                amount(position),
+                timedelta(microseconds=int(stamp[position + 1] - stamp[position])),
+            )
+        )
+
+    # Day gaps between each merchant's last four payments (three when it has
+    # only three); the median of two gaps is their mean.
+    last = ends - 1
+    gap_1 = day[last] - day[np.maximum(last - 1, 0)]
+    gap_2 = day[np.maximum(last - 1, 0)] - day[np.maximum(last - 2, 0)]
+    gap_3 = day[np.maximum(last - 2, 0)] - day[np.maximum(last - 3, 0)]
+    middle = gap_1 + gap_2 + gap_3 - np.maximum(np.maximum(gap_1, gap_2), gap_3) - np.minimum(np.minimum(gap_1, gap_2), gap_3)
+    typical_gap = np.where(counts >= 4, middle, (gap_1 + gap_2) / 2)
+    recurring = (counts >= 3) & (
+        ((typical_gap >= 24) & (typical_gap <= 37)) | ((typical_gap >= 340) & (typical_gap <= 390))
+    )
+
+    current_from = (now - timedelta(days=30) - _EPOCH) // _MICROSECOND
+    previous_from = (now - timedelta(days=60) - _EPOCH) // _MICROSECOND
+    in_current = stamp >= current_from
+    in_previous = (stamp >= previous_from) & ~in_current
+    current_count = np.add.reduceat(in_current.astype(np.int64), starts)
+    previous_count = np.add.reduceat(in_previous.astype(np.int64), starts)
+    current_total = np.add.reduceat(np.where(in_current, paise, 0), starts)
+    previous_total = np.add.reduceat(np.where(in_previous, paise, 0), starts)
+    # A loose float test; the Decimal builder makes the exact decision.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        current_average = current_total / current_count
+        previous_average = previous_total / previous_count
+        creeping = (
+            (current_count > 0)
+            & (previous_count > 0)
+            & (previous_total > 0)
+            & (current_average - previous_average >= 10_000 * (1 - 1e-9))
+            & (current_average >= previous_average * 1.2 * (1 - 1e-9))
+        )
+
+    current_rows, previous_rows = in_current.tolist(), in_previous.tolist()
+    for merchant in np.flatnonzero(recurring | creeping).tolist():
+        start, end = int(starts[merchant]), int(ends[merchant])
+        if recurring[merchant]:
+            recent = range(max(start, end - 4), end)
+            signal = _recurring_insight(
+                merchant_keys[merchant],
+                expenses[rows[end - 1]].merchant,
+                [expenses[rows[position]].transaction_id for position in recent],
+                [amount(position) for position in recent],
+                [date.fromordinal(sorted_days[position]) for position in recent],
+            )
+            if signal:
+                insights.append(signal)
+        if creeping[merchant]:
+            window = range(start, end)
+            signal = _price_creep_insight(
+                merchant_keys[merchant],
+                expenses[rows[end - 1]].merchant,
+                now,
+                [expenses[rows[position]].transaction_id for position in window if current_rows[position]]
+                + [expenses[rows[position]].transaction_id for position in window if previous_rows[position]],
+                (_rupees(int(current_total[merchant])), int(current_count[merchant])),
+                (_rupees(int(previous_total[merchant])), int(previous_count[merchant])),
+            )
+            if signal:
+                insights.append(signal)
+    return insights
+
 
+def _commitment_insights(commitments: Iterable[dict[str, Any]], now: datetime) -> list[dict[str, Any]]:
+    insights = []
     for commitment in commitments:
         next_due = _as_datetime(commitment["next_due_date"]).date()
         days_until_due = (next_due - now.date()).days
@@ -200,16 +403,86 @@ def build_expense_insights(
                     },
                 )
             )
+    return insights
 
-    # Show urgent, actionable signals first and avoid a noisy feed.
-    priority = {
-        "possible_duplicate": 0,
-        "upcoming_commitment": 1,
-        "price_creep": 2,
-        "recurring_expense": 3,
-    }
-    insights.sort(key=lambda item: (priority[item["kind"]], -item["confidence"], -item["amount"]))
-    return insights[:20]
+
+def build_expense_insights(
+    transactions: Iterable[ExpenseRecord | dict[str, Any]],
+    commitments: Iterable[dict[str, Any]],
+    *,
+    now: datetime | None = None,
+    limit: int | None = 20,
+    columnar: bool | None = None,
+) -> list[dict[str, Any]]:
+    """Return high-confidence expense signals for a single user.
+
+    Transactions must already be authorised and scoped to one user.  The
+    returned evidence contains only the transaction ids and values that led to
+    a conclusion, so the client can always explain an alert.  Merchant
+    signals also record the ``merchant_key`` their expenses were grouped by.
+
+    Pass :class:`ExpenseRecord` values built with :func:`expense_records`;
+    transaction dicts are still accepted and converted, keeping expenses only.
+
+    Every merchant signal depends only on that merchant's transactions, so a
+    caller may pass a subset of merchants with ``limit=None`` and rank the
+    combined results later with :func:`rank_insights`.
+
+    Ledgers of ``COLUMNAR_MIN_ROWS`` expenses or more take the columnar path
+    when NumPy is installed; ``columnar`` forces either path.  Both return the
+    same insights.
+    """
+    now = now or datetime.now(timezone.utc)
+    expenses = _as_records(transactions)
+    if columnar is None:
+        columnar = np is not None and len(expenses) >= COLUMNAR_MIN_ROWS
+    elif columnar and np is None:
+        raise RuntimeError("The columnar insight path needs NumPy.")
+    insights = _columnar_merchant_insights(expenses, now) if columnar else _merchant_insights(expenses, now)
+    insights += _commitment_insights(commitments, now)
+    return rank_insights(insights, limit)
+
+
+def _as_records(transactions: Iterable[ExpenseRecord | dict[str, Any]]) -> list[ExpenseRecord]:
+    transactions = list(transactions)
+    if all(isinstance(transaction, ExpenseRecord) for transaction in transactions):
+        return transactions
+    return expense_records(
+        (
+            (
+                transaction.transaction_id, None, transaction.merchant,
+                _rupees(transaction.paise), transaction.date, transaction.merchant_key,
+            )
+            if isinstance(transaction, ExpenseRecord)
+            else (
+                transaction["transaction_id"],
+                transaction.get("title"),
+                transaction.get("merchant"),
+                transaction["amount"],
+                transaction["date"],
+                expense_merchant_key(transaction.get("merchant"), transaction.get("title")),
+            )
+        )
+        for transaction in transactions
+        if isinstance(transaction, ExpenseRecord) or transaction.get("transaction_type") == "Expense"
+    )
+
+
+INSIGHT_PRIORITY = {
+    "possible_duplicate": 0,
+    "upcoming_commitment": 1,
+    "price_creep": 2,
+    "recurring_expense": 3,
+}
+
+
+def rank_insights(insights: Iterable[dict[str, Any]], limit: int | None = 20) -> list[dict[str, Any]]:
+    """Show urgent, actionable signals first and avoid a noisy feed."""
+    ranked = sorted(
+        insights,
+        key=lambda item: (INSIGHT_PRIORITY[item["kind"]], -item["confidence"], -item["amount"]),
+    )
+    return ranked if limit is None else ranked[:limit]
 
 
 def build_expense_story(insights: Iterable[dict[str, Any]]) -> dict[str, Any]:
@@ -0,0 +1,18 @@
+"""Gunicorn settings, read automatically when gunicorn starts in backend/."""
+
+import os
+
+
+def post_fork(server, worker):
+    # Build the worker's chat model clients before it takes traffic, so the
+    # first chat turn after a deploy does not pay for the import and client set-up.
+    if os.getenv("CHAT_MODEL_WARM", "true") != "true":
+        return
+    try:
+        from app import warm_chat_model
+    except ImportError:
+        from backend.app import warm_chat_model
+    try:
+        warm_chat_model()
+    except Exception:
+        server.log.warning("Could not warm the chat model client.", exc_info=True)
@@ -0,0 +1,336 @@
+"""Expense insights for many users at once.
+
+The API refreshes one user's insights when that user asks for them.  Nightly
+digests and cache warming need every user's, so this job streams the last 400
+days of expenses for all users (or a given list) from one server-side cursor
+ordered by ``user_id``, hands chunks of whole users to a process pool running
+:func:`build_expense_insights`, and writes each chunk back with a few bulk
+statements.  Run it from ``backend/``::
+
+    python insight_batch.py --workers 4 --chunk-size 200
+
+Merchants the triggers have marked dirty stay dirty: a write that races the
+batch is never lost, and the user's next request recomputes only those.  A
+user whose insights a request refreshed after the batch's snapshot was taken
+is skipped, so stale results never overwrite fresher ones.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+try:
+    from .expense_intelligence import build_expense_insights, expense_records
+except ImportError:  # pragma: no cover - direct-script fallback
+    from expense_intelligence import build_expense_insights, expense_records
+
+# A user with no recent expenses still appears once, with NULL columns, so
+# insights that no longer fire are resolved for them too.
+STREAM_SQL = """
+SELECT customer.user_id::text, expense.transaction_id, expense.title, expense.merchant,
+       expense.amount, expense.date, expense_merchant_key(expense.merchant, expense.title)
+FROM customers AS customer
+LEFT JOIN transactions AS expense
+  ON expense.user_id = customer.user_id
+ AND expense.transaction_type = 'Expense'
+ AND expense.date >= CURRENT_TIMESTAMP - INTERVAL '400 days'
+WHERE %(all_users)s OR customer.user_id = ANY(%(user_ids)s::uuid[])
+ORDER BY customer.user_id, expense.date
+"""
+
+# When each user's merchants were last refreshed; read in the batch snapshot
+# and again just before writing, to spot refreshes made in between.
+REFRESHED_SQL = """
+SELECT user_id::text, max(refreshed_at) FROM expense_insight_merchants
+WHERE user_id = ANY(%s::uuid[]) GROUP BY user_id
+"""
+
+
+@dataclass
+class UserInsights:
+    user_id: str
+    insights: list[dict[str, Any]]
+    keys_by_merchant: dict[str, list[str]]
+
+
+@dataclass
+class BatchReport:
+    users: int = 0
+    insights: int = 0
+    skipped: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def users_per_second(self) -> float:
+        return self.users / self.seconds if self.seconds else 0.0
+
+
+def user_chunks(rows: Iterable[tuple], chunk_size: int) -> Iterator[list[tuple[str, list[tuple]]]]:
+    """Group rows ordered by user id into chunks of ``chunk_size`` whole users."""
+    chunk: list[tuple[str, list[tuple]]] = []
+    for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+        chunk.append((user_id, [row[1:] for row in user_rows if row[1] is not None]))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_chunk(
+    users: list[tuple[str, list[tuple]]],
+    commitments: dict[str, list[dict[str, Any]]],
+    now: datetime,
+) -> list[UserInsights]:
+    """Build every user's insights in a chunk; runs in a pool process."""
+    results = []
+    for user_id, rows in users:
+        records = expense_records(rows)
+        insights = build_expense_insights(records, commitments.get(user_id, []), now=now, limit=None)
+        # Keyed as the request path keys them, so its next refresh of a
+        # merchant resolves exactly the insights this run produced.
+        keys_by_merchant: dict[str, list[str]] = {row[-1]: [] for row in rows}
+        for insight in insights:
+            merchant_key = insight["evidence"].get("merchant_key")
+            if merchant_key in keys_by_merchant:
+                keys_by_merchant[merchant_key].append(insight["insight_key"])
+        results.append(UserInsights(user_id, insights, keys_by_merchant))
+    return results
+
+
+def store_chunk(
+    cursor: RealDictCursor,
+    results: list[UserInsights],
+    refreshed: Mapping[str, datetime] | None = None,
+) -> list[UserInsights]:
+    """Upsert a chunk's insights and resolve every open one that did not fire.
+
+    ``refreshed`` is ``REFRESHED_SQL`` as the batch snapshot saw it.  Users a
+    request has refreshed since, or who were deleted, are left alone; the
+    results actually stored are returned.
+    """
+    if not results:
+        return []
+    # The request path upserts the same state row first thing in its refresh,
+    # so holding these locks until commit keeps the two from interleaving.  A
+    # new row is dated yesterday so the user's first request still re-marks
+    # recent merchants, as it would have without the batch.
+    cursor.execute(
+        """
+        INSERT INTO expense_insight_state (user_id, computed_on)
+        SELECT user_id, CURRENT_DATE - 1 FROM customers WHERE user_id = ANY(%s::uuid[])
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET computed_on = expense_insight_state.computed_on
+        RETURNING user_id::text
+        """,
+        ([result.user_id for result in results],),
+    )
+    present = {row["user_id"] for row in cursor.fetchall()}
+    cursor.execute(REFRESHED_SQL, (list(present),))
+    current = {row["user_id"]: row["max"] for row in cursor.fetchall()}
+    snapshot = refreshed or {}
+    results = [
+        result for result in results
+        if result.user_id in present and current.get(result.user_id) == snapshot.get(result.user_id)
+    ]
+    if not results:
+        return []
+    insights = [(result.user_id, insight) for result in results for insight in result.insights]
+    cursor.execute(
+        """
+        WITH generated AS (
+          SELECT * FROM UNNEST(
+            %s::uuid[], %s::text[], %s::text[], %s::text[], %s::text[],
+            %s::numeric[], %s::numeric[], %s::numeric[], %s::jsonb[]
+          ) AS generated (user_id, insight_key, kind, title, message, confidence, amount, projected_annual_cost, evidence)
+        ), resolved AS (
+          UPDATE expense_insights AS insight SET status = 'resolved', updated_at = CURRENT_TIMESTAMP
+          WHERE insight.user_id = ANY(%s::uuid[]) AND insight.status = 'open'
+            AND NOT EXISTS (
+              SELECT 1 FROM generated
+              WHERE generated.user_id = insight.user_id AND generated.insight_key = insight.insight_key
+            )
+        )
+        INSERT INTO expense_insights (
+          insight_id, user_id, insight_key, kind, title, message, confidence,
+          amount, projected_annual_cost, evidence
+        )
+        SELECT uuid_generate_v4(), user_id, insight_key, kind, title, message, confidence,
+               amount, projected_annual_cost, evidence
+        FROM generated
+        ON CONFLICT (user_id, insight_key) DO UPDATE SET
+          title=EXCLUDED.title, message=EXCLUDED.message, confidence=EXCLUDED.confidence,
+          amount=EXCLUDED.amount, projected_annual_cost=EXCLUDED.projected_annual_cost,
+          evidence=EXCLUDED.evidence, updated_at=CURRENT_TIMESTAMP,
+          status=CASE WHEN expense_insights.status = 'resolved' THEN 'open' ELSE expense_insights.status END
+        """,
+        (
+            [user_id for user_id, _insight in insights],
+            [insight["insight_key"] for _user_id, insight in insights],
+            [insight["kind"] for _user_id, insight in insights],
+            [insight["title"] for _user_id, insight in insights],
+            [insight["message"] for _user_id, insight in insights],
+            [insight["confidence"] for _user_id, insight in insights],
+            [insight["amount"] for _user_id, insight in insights],
+            [insight["projected_annual_cost"] for _user_id, insight in insights],
+            [json.dumps(insight["evidence"]) for _user_id, insight in insights],
+            [result.user_id for result in results],
+        ),
+    )
+    merchants = [
+        (result.user_id, merchant_key, keys)
+        for result in results
+        for merchant_key, keys in result.keys_by_merchant.items()
+    ]
+    if merchants:
+        # New rows start clean; existing ones keep their dirty flag (see above).
+        execute_values(
+            cursor,
+            """
+            INSERT INTO expense_insight_merchants (user_id, merchant_key, dirty, insight_keys, refreshed_at)
+            SELECT refreshed.user_id::uuid, refreshed.merchant_key, FALSE, refreshed.insight_keys::text[], CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS refreshed (user_id, merchant_key, insight_keys)
+            ON CONFLICT (user_id, merchant_key) DO UPDATE SET
+              insight_keys = EXCLUDED.insight_keys, refreshed_at = EXCLUDED.refreshed_at
+            """,
+            merchants,
+            page_size=1_000,
+        )
+    return results
+
+
+def _due_commitments(cursor: RealDictCursor, user_ids: list[str]) -> dict[str, list[dict[str, Any]]]:
+    cursor.execute(
+        """
+        SELECT user_id::text, commitment_id, title, expected_amount, frequency, next_due_date
+        FROM recurring_commitments WHERE user_id = ANY(%s::uuid[]) AND is_active = TRUE
+          AND next_due_date <= CURRENT_DATE + 7
+        """,
+        (user_ids,),
+    )
+    commitments: dict[str, list[dict[str, Any]]] = {}
+    for row in cursor.fetchall():
+        commitments.setdefault(row.pop("user_id"), []).append(dict(row))
+    return commitments
+
+
+def run_batch(
+    connect: Callable[[], Any],
+    *,
+    workers: int = 4,
+    chunk_size: int = 200,
+    itersize: int = 20_000,
+    user_ids: list[str] | None = None,
+    now: datetime | None = None,
+    progress: Callable[[BatchReport], None] | None = None,
+) -> BatchReport:
+    """Generate and store insights for every user, or for ``user_ids``.
+
+    At most ``2 * workers`` chunks are in flight, so memory stays bounded by
+    the chunk size rather than by the number of users.  ``workers=0`` builds
+    chunks inline.  ``progress`` is called after each stored chunk.
+    """
+    now = now or datetime.now(timezone.utc)
+    report = BatchReport()
+    started = time.perf_counter()
+    reader, writer = connect(), connect()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context) if workers else None
+    # Each chunk in flight, with its users' refresh times in the snapshot.
+    pending: dict[Future, dict[str, datetime]] = {}
+
+    def store(results: list[UserInsights], refreshed: dict[str, datetime]) -> None:
+        with writer.cursor(cursor_factory=RealDictCursor) as cursor:
+            stored = store_chunk(cursor, results, refreshed)
+        writer.commit()
+        report.users += len(stored)
+        report.skipped += len(results) - len(stored)
+        report.insights += sum(len(result.insights) for result in stored)
+        report.chunks += 1
+        report.seconds = time.perf_counter() - started
+        if progress:
+            progress(report)
+
+    def drain(limit: int) -> None:
+        while len(pending) > limit:
+            done, _running = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                store(future.result(), pending.pop(future))
+
+    try:
+        # One snapshot for the stream and every REFRESHED_SQL read beside it.
+        reader.set_session(readonly=True, isolation_level="REPEATABLE READ")
+        with reader.cursor(name="insight_batch") as stream:
+            stream.itersize = itersize
+            stream.execute(STREAM_SQL, {"all_users": user_ids is None, "user_ids": user_ids or []})
+            for chunk in user_chunks(stream, chunk_size):
+                chunk_user_ids = [user_id for user_id, _rows in chunk]
+                with reader.cursor() as cursor:
+                    cursor.execute(REFRESHED_SQL, (chunk_user_ids,))
+                    refreshed = dict(cursor.fetchall())
+                with writer.cursor(cursor_factory=RealDictCursor) as cursor:
+                    commitments = _due_commitments(cursor, chunk_user_ids)
+                writer.commit()
+                if executor is None:
+                    store(generate_chunk(chunk, commitments, now), refreshed)
+                    continue
+                pending[executor.submit(generate_chunk, chunk, commitments, now)] = refreshed
+                drain(2 * workers)
+            drain(0)
+        reader.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        reader.close()
+        writer.close()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    import argparse
+    import logging
+    import os
+
+    try:
+        from .app import get_db_connection
+    except ImportError:  # pragma: no cover - direct-script fallback
+        from app import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Generate expense insights for many users.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INSIGHT_BATCH_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("INSIGHT_BATCH_CHUNK_SIZE", "200")))
+    parser.add_argument("--user", dest="user_ids", action="append", help="limit the run to this user id (repeatable)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("insight_batch")
+
+    def progress(report: BatchReport) -> None:
+        logger.info("%d users, %d insights, %.1f users/s", report.users, report.insights, report.users_per_second)
+
+    report = run_batch(
+        get_db_connection,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        user_ids=args.user_ids,
+        progress=progress,
+    )
+    logger.info(
+        "Done: %d users in %d chunks, %d insights, %d users skipped, %.1fs, %.1f users/s",
+        report.users, report.chunks, report.insights, report.skipped, report.seconds, report.users_per_second,
+    )
+
+
+if __name__ == "__main__":
+    main()
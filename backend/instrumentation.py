@@ -0,0 +1,287 @@
+"""Opt-in request instrumentation: SQL timing, timers, metrics and profiles.
+
+With instrumentation on, every request gets a ``RequestProfile`` that the
+timed cursors and ``timer()`` blocks record into: each statement's text,
+duration and row count, and the total time spent in named functions.  The
+app turns a finished profile into a ``Server-Timing`` header and feeds it to
+``Metrics``, which renders per-route latency histograms and the process's
+pool and cache counters in the Prometheus text format.
+``SlowRequestProfiler`` runs cProfile on a sample of requests and keeps the
+dump of any that turn out slow.
+
+Outside a profiled request every hook is a single context-variable lookup,
+so the timed code paths cost nothing measurable when instrumentation is off.
+Metrics are per process; scrape each worker, or run one per container.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Iterable, Iterator
+
+from psycopg2.extensions import cursor as TupleCursor
+from psycopg2.extras import RealDictCursor
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_STATEMENT_LENGTH = 160
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class Statement:
+    text: str
+    seconds: float
+    rows: int
+
+
+@dataclass
+class RequestProfile:
+    """What one request spent its time on."""
+
+    started: float = field(default_factory=time.perf_counter)
+    statements: list[Statement] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def sql_seconds(self) -> float:
+        return sum(statement.seconds for statement in self.statements)
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """The ``Server-Timing`` header value, durations in milliseconds."""
+        parts = [f'sql;dur={self.sql_seconds * 1000:.1f};desc="{len(self.statements)} statements"']
+        parts += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def slowest_statements(self, count: int = 5) -> list[Statement]:
+        return sorted(self.statements, key=lambda statement: statement.seconds, reverse=True)[:count]
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar("request_profile", default=None)
+
+
+def begin_profile() -> RequestProfile:
+    profile = RequestProfile()
+    _current.set(profile)
+    return profile
+
+
+def end_profile() -> RequestProfile | None:
+    profile = _current.get()
+    _current.set(None)
+    return profile
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Add the block's wall time to the current request's ``name`` timing."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_timing(name, time.perf_counter() - started)
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of ``timer``."""
+
+    def decorate(function: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(function)
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            if _current.get() is None:
+                return function(*args, **kwargs)
+            with timer(name):
+                return function(*args, **kwargs)
+
+        return wrapped
+
+    return decorate
+
+
+def statement_text(query: Any) -> str:
+    """A short, parameter-free label for a statement.
+
+    ``execute_values`` hands the cursor an already-composed ``bytes`` query, so
+    everything from its ``VALUES`` list on is dropped: it holds user data.
+    """
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+        query = query[: query.find("VALUES") + len("VALUES")] + " ..." if "VALUES" in query else query
+    elif not isinstance(query, str):
+        query = str(query)
+    return _WHITESPACE.sub(" ", query).strip()[:_STATEMENT_LENGTH]
+
+
+class _TimedCursorMixin:
+    def execute(self, query: Any, vars: Any = None) -> None:
+        profile = _current.get()
+        if profile is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            profile.statements.append(Statement(statement_text(query), time.perf_counter() - started, max(self.rowcount, 0)))
+
+    def executemany(self, query: Any, vars_list: Any) -> None:
+        profile = _current.get()
+        if profile is None:
+            return super().executemany(query, vars_list)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            profile.statements.append(Statement(statement_text(query), time.perf_counter() - started, max(self.rowcount, 0)))
+
+
+class TimedRealDictCursor(_TimedCursorMixin, RealDictCursor):
+    """``RealDictCursor`` that records its statements in the current profile."""
+
+
+class TimedCursor(_TimedCursorMixin, TupleCursor):
+    """Plain tuple cursor that records its statements in the current profile."""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metrics:
+    """Per-route latency histograms and SQL totals for one process."""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS, *, prefix: str = "finmanager"):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # (method, route, status) -> [bucket counts..., +Inf count, sum]
+        self._requests: dict[tuple[str, str, str], list[float]] = {}
+        # route -> [statements, seconds]
+        self._sql: dict[str, list[float]] = {}
+        # name -> [calls, seconds]
+        self._timings: dict[str, list[float]] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, profile: RequestProfile | None = None) -> None:
+        with self._lock:
+            histogram = self._requests.setdefault((method, route, str(status)), [0.0] * (len(self.buckets) + 2))
+            histogram[bisect_left(self.buckets, seconds)] += 1
+            histogram[-1] += seconds
+            if profile is None:
+                return
+            sql = self._sql.setdefault(route, [0.0, 0.0])
+            sql[0] += len(profile.statements)
+            sql[1] += profile.sql_seconds
+            for name, spent in profile.timings.items():
+                self._add_timing(name, spent)
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        """Record a timed call made after its request's profile was closed.
+
+        Streamed responses run past ``after_request``; their generators
+        report here directly instead of through ``timer()``.
+        """
+        with self._lock:
+            self._add_timing(name, seconds)
+
+    def _add_timing(self, name: str, seconds: float) -> None:
+        timing = self._timings.setdefault(name, [0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+
+    def render(self, gauges: dict[str, dict[str, Any]] | None = None) -> str:
+        """The Prometheus text exposition of everything observed so far.
+
+        ``gauges`` maps a component name to its ``stats()``; numeric values
+        become ``<prefix>_<component>_<key>`` gauges.
+        """
+        name = f"{self.prefix}_http_request_duration_seconds"
+        lines = [f"# HELP {name} Request latency by route.", f"# TYPE {name} histogram"]
+        with self._lock:
+            requests = {key: list(value) for key, value in self._requests.items()}
+            sql = {key: list(value) for key, value in self._sql.items()}
+            timings = {key: list(value) for key, value in self._timings.items()}
+        for (method, route, status), histogram in sorted(requests.items()):
+            labels = {"method": method, "route": route, "status": status}
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, "+Inf"), histogram[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': str(bound)})} {cumulative:g}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram[-1]:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative:g}")
+
+        for metric, help_text, rows, index in (
+            ("sql_statements_total", "SQL statements run, by route.", sql, 0),
+            ("sql_duration_seconds_total", "Time spent in SQL, by route.", sql, 1),
+            ("function_calls_total", "Requests that ran a timed function.", timings, 0),
+            ("function_duration_seconds_total", "Time spent in timed functions.", timings, 1),
+        ):
+            label = "route" if rows is sql else "function"
+            lines += [f"# HELP {self.prefix}_{metric} {help_text}", f"# TYPE {self.prefix}_{metric} counter"]
+            lines += [f"{self.prefix}_{metric}{_labels({label: key})} {value[index]:g}" for key, value in sorted(rows.items())]
+
+        for component, stats in (gauges or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"{self.prefix}_{component}_{key}"
+                    lines += [f"# TYPE {metric} gauge", f"{metric} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+class SlowRequestProfiler:
+    """cProfile a sample of requests and keep the dumps of the slow ones.
+
+    Only one request is profiled at a time: Python allows a single active
+    profiler per process on newer versions, and one is plenty for sampling.
+    """
+
+    def __init__(self, sample_rate: float, threshold: float, directory: str, *, rng: Callable[[], float] = random.random):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.directory = directory
+        self._rng = rng
+        self._busy = threading.Lock()
+
+    def start(self) -> cProfile.Profile | None:
+        if self.sample_rate <= 0 or self._rng() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is active
+            self._busy.release()
+            return None
+        return profiler
+
+    def finish(self, profiler: cProfile.Profile, seconds: float, label: str) -> str | None:
+        """Stop profiling; return the dump's path if the request was slow."""
+        try:
+            profiler.disable()
+        finally:
+            self._busy.release()
+        if seconds < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "request"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{int(seconds * 1000)}ms-{slug}.prof")
+        profiler.dump_stats(path)
+        return path
@@ -0,0 +1,282 @@
+"""Compiled per-user merchant rules.
+
+A rule rewrites a transaction's merchant, category or essential flag when its
+pattern matches the merchant text (the merchant, or the title when there is
+none), compared trimmed and case-insensitively.  Rules used to be looked up
+with one exact-match query per transaction; ``CompiledRules`` instead loads
+all of a user's rules once and matches in memory:
+
+* ``exact`` rules sit in a dict;
+* ``prefix`` rules share a trie, and the longest matching prefix wins;
+* ``contains`` rules share an Aho-Corasick automaton, so one pass over the
+  text finds every pattern in it, and the longest one wins;
+* ``regex`` rules are tried in the order they were created.
+
+A more specific kind always beats a less specific one, in that order.  The
+compiled set is immutable, so one instance can serve every thread.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import deque
+from typing import Any, Collection, Iterable, Mapping
+
+MATCH_TYPES = ("exact", "prefix", "contains", "regex")
+
+# Python's regex engine backtracks, so a rule pattern is kept to shapes whose
+# worst case stays small on a merchant text: short, with at most two
+# variable-length repeats ("?" and "{1,3}" included) and alternating groups
+# between them (a top-level "a|b" is free), and no group repeated
+# more than once that holds a variable repeat or an alternation ("(a+)+",
+# "(a|a)*", "(a?){20}").  Texts are cut to the column width.
+MAX_REGEX_LENGTH = 100
+_MAX_VARIABLE_REPEATS = 2
+_MAX_TEXT_LENGTH = 255
+_REPEAT = re.compile(r"[*+?]|\{(\d*),(\d*)\}|\{(\d+)\}")
+
+
+def merchant_text(transaction: Mapping[str, Any]) -> str:
+    """The text rules match against: the merchant, else the title, trimmed and casefolded.
+
+    Patterns are casefolded the same way, so this is not the SQL
+    ``expense_merchant_key``, which only trims spaces and lowercases.
+    """
+    return (transaction.get("merchant") or transaction.get("title") or "").strip().casefold()
+
+
+def merge_rule(transaction: Mapping[str, Any], rule: Mapping[str, Any] | None, categories: Collection[str]) -> dict[str, Any]:
+    """``transaction`` with ``rule`` applied.
+
+    ``categories`` are those valid for the transaction's type; a rule's
+    category outside them is ignored.
+    """
+    if not rule:
+        return dict(transaction)
+    updated = dict(transaction)
+    if rule["display_merchant"]:
+        updated["merchant"] = rule["display_merchant"]
+    if rule["category"] and rule["category"] in categories:
+        updated["category"] = rule["category"]
+    if rule["is_essential"] is not None:
+        updated["is_essential"] = rule["is_essential"]
+    return updated
+
+
+def _class_end(pattern: str, position: int) -> int:
+    """The position just past the character class opening at ``position``."""
+    position += 1
+    if pattern.startswith("^", position):
+        position += 1
+    if pattern.startswith("]", position):
+        position += 1
+    while position < len(pattern) and pattern[position] != "]":
+        position += 2 if pattern[position] == "\\" else 1
+    return position + 1
+
+
+def _backtracking_risk(pattern: str) -> str | None:
+    """Why ``pattern`` could backtrack badly, or None; it must already compile."""
+    # For each open group: whether it holds a variable repeat, and an alternation.
+    groups = [[False, False]]
+    variable = 0
+    position = 0
+    while position < len(pattern):
+        character = pattern[position]
+        atom = [False, False]
+        if character == "(":
+            groups.append([False, False])
+            # "(?:", "(?P<name>" and the like: skip the "?" so it is not read as a repeat.
+            position += 2 if pattern.startswith("?", position + 1) else 1
+            continue
+        if character == "|":
+            groups[-1][1] = True
+            position += 1
+            continue
+        if character == ")":
+            atom = groups.pop()
+            groups[-1][0] |= atom[0]
+            groups[-1][1] |= atom[1]
+            # Each alternating group multiplies the paths to try, like a repeat.
+            variable += atom[1]
+            position += 1
+        elif character == "[":
+            position = _class_end(pattern, position)
+        else:
+            position += 2 if character == "\\" else 1
+        repeat = _REPEAT.match(pattern, position)
+        if repeat is None:
+            continue
+        token, lower, upper, exact = repeat.group(0), repeat.group(1), repeat.group(2), repeat.group(3)
+        if exact is not None:
+            most, varies = int(exact), False
+        elif token in "*+?":
+            most, varies = (1 if token == "?" else None), True
+        else:
+            most = int(upper) if upper else None
+            varies = most is None or most > int(lower or 0)
+        if (most is None or most > 1) and (atom[0] or atom[1]):
+            return "must not repeat a group that holds a variable repeat or an alternation"
+        variable += varies
+        groups[-1][0] |= varies
+        position = repeat.end()
+        # A lazy or possessive suffix belongs to the same repeat.
+        if pattern.startswith(("?", "+"), position):
+            position += 1
+    if variable > _MAX_VARIABLE_REPEATS:
+        return f"may use at most {_MAX_VARIABLE_REPEATS} variable-length repeats and alternating groups"
+    return None
+
+
+def normalise_pattern(match_type: str, pattern: str) -> str:
+    """Validate a rule's pattern and return it in the form it is stored.
+
+    Literal patterns are trimmed and casefolded.  Regular expressions are kept
+    as written, compiled case-insensitively, and refused if they do not
+    compile, are longer than ``MAX_REGEX_LENGTH`` or could backtrack badly.
+    Raises ``ValueError`` with a message fit for the client.
+    """
+    if match_type not in MATCH_TYPES:
+        raise ValueError(f"match_type must be one of {', '.join(MATCH_TYPES)}.")
+    pattern = pattern.strip()
+    if not pattern:
+        raise ValueError("merchant_pattern is required.")
+    if match_type != "regex":
+        return pattern.casefold()
+    if len(pattern) > MAX_REGEX_LENGTH:
+        raise ValueError(f"merchant_pattern must be at most {MAX_REGEX_LENGTH} characters for regex rules.")
+    try:
+        re.compile(pattern, re.IGNORECASE)
+    except re.error as error:
+        raise ValueError(f"merchant_pattern is not a valid regular expression: {error}.") from None
+    risk = _backtracking_risk(pattern)
+    if risk:
+        raise ValueError(f"merchant_pattern {risk}.")
+    return pattern
+
+
+class _Node:
+    __slots__ = ("children", "fail", "rule", "depth", "best")
+
+    def __init__(self, depth: int = 0):
+        self.children: dict[str, _Node] = {}
+        self.fail: _Node | None = None
+        self.rule: Mapping[str, Any] | None = None
+        self.depth = depth
+        # The longest pattern ending here: this node's own, or one reached
+        # through its failure links.
+        self.best: _Node | None = None
+
+
+def _insert(root: _Node, pattern: str, rule: Mapping[str, Any]) -> None:
+    node = root
+    for character in pattern:
+        child = node.children.get(character)
+        if child is None:
+            child = node.children[character] = _Node(node.depth + 1)
+        node = child
+    if node.rule is None:
+        node.rule = rule
+
+
+def _link(root: _Node) -> None:
+    """Add the Aho-Corasick failure links, breadth first."""
+    root.fail = root
+    queue: deque[_Node] = deque()
+    for child in root.children.values():
+        child.fail = root
+        child.best = child if child.rule is not None else None
+        queue.append(child)
+    while queue:
+        node = queue.popleft()
+        for character, child in node.children.items():
+            fail = node.fail
+            while fail is not root and character not in fail.children:
+                fail = fail.fail
+            child.fail = fail.children.get(character, root)
+            child.best = child if child.rule is not None else child.fail.best
+            queue.append(child)
+
+
+class CompiledRules:
+    """One user's rules, ready to match.
+
+    ``rows`` need ``match_type`` and ``merchant_pattern`` as stored, and are
+    expected oldest first; whatever else a row holds is what ``match``
+    returns.
+    """
+
+    def __init__(self, rows: Iterable[Mapping[str, Any]]):
+        self._exact: dict[str, Mapping[str, Any]] = {}
+        self._prefixes = _Node()
+        self._contains = _Node()
+        self._regexes: list[tuple[re.Pattern[str], Mapping[str, Any]]] = []
+        self.size = 0
+        for row in rows:
+            pattern, match_type = row["merchant_pattern"], row["match_type"]
+            if match_type == "exact":
+                self._exact.setdefault(pattern, row)
+            elif match_type == "prefix":
+                _insert(self._prefixes, pattern, row)
+            elif match_type == "contains":
+                _insert(self._contains, pattern, row)
+            elif match_type == "regex":
+                # Validated on the way in, but rules saved under older checks
+                # are skipped rather than run or allowed to fail imports.
+                try:
+                    self._regexes.append((re.compile(normalise_pattern("regex", pattern), re.IGNORECASE), row))
+                except ValueError:
+                    continue
+            else:
+                continue
+            self.size += 1
+        _link(self._contains)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _longest_prefix(self, text: str) -> Mapping[str, Any] | None:
+        node, found = self._prefixes, None
+        for character in text:
+            node = node.children.get(character)
+            if node is None:
+                break
+            if node.rule is not None:
+                found = node.rule
+        return found
+
+    def _longest_contained(self, text: str) -> Mapping[str, Any] | None:
+        root = self._contains
+        if not root.children:
+            return None
+        node, best = root, None
+        for character in text:
+            while node is not root and character not in node.children:
+                node = node.fail
+            node = node.children.get(character, root)
+            if node.best is not None and (best is None or node.best.depth > best.depth):
+                best = node.best
+        return best.rule if best is not None else None
+
+    def match(self, text: str) -> Mapping[str, Any] | None:
+        """The rule for a ``merchant_text``, or None."""
+        if not text or not self.size:
+            return None
+        rule = self._exact.get(text) or self._longest_prefix(text) or self._longest_contained(text)
+        if rule is not None:
+            return rule
+        text = text[:_MAX_TEXT_LENGTH]
+        for expression, row in self._regexes:
+            if expression.search(text):
+                return row
+        return None
+
+    def match_many(self, texts: Iterable[str]) -> list[Mapping[str, Any] | None]:
+        """``match`` for a batch; repeated merchants are matched once."""
+        seen: dict[str, Mapping[str, Any] | None] = {}
+        matched = []
+        for text in texts:
+            if text not in seen:
+                seen[text] = self.match(text)
+            matched.append(seen[text])
+        return matched
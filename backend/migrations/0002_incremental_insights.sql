@@ -0,0 +1,89 @@
+-- Apply after 0001_expense_intelligence.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+-- Incremental expense insights. Every expense write marks the merchants it
+-- touched as dirty, so a refresh recomputes only those merchants instead of
+-- re-reading the user's whole history. The key mirrors the merchant grouping
+-- in expense_intelligence.build_expense_insights.
+CREATE OR REPLACE FUNCTION expense_merchant_key(merchant TEXT, title TEXT)
+RETURNS TEXT LANGUAGE SQL IMMUTABLE AS $$
+    SELECT lower(btrim(COALESCE(NULLIF(merchant, ''), title, '')))
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_merchant_key
+    ON transactions (user_id, expense_merchant_key(merchant, title))
+    WHERE transaction_type = 'Expense';
+
+CREATE TABLE IF NOT EXISTS expense_insight_merchants (
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    merchant_key VARCHAR(255) NOT NULL,
+    dirty BOOLEAN NOT NULL DEFAULT TRUE,
+    insight_keys TEXT[] NOT NULL DEFAULT '{}',
+    refreshed_at TIMESTAMPTZ,
+    PRIMARY KEY (user_id, merchant_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_expense_insight_merchants_dirty
+    ON expense_insight_merchants (user_id) WHERE dirty;
+
+-- Price-creep windows move with the calendar, so recent merchants are
+-- re-marked once per day even without writes.
+CREATE TABLE IF NOT EXISTS expense_insight_state (
+    user_id UUID PRIMARY KEY REFERENCES customers(user_id) ON DELETE CASCADE,
+    computed_on DATE NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION mark_expense_merchants_dirty()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO expense_insight_merchants (user_id, merchant_key)
+        SELECT DISTINCT user_id, expense_merchant_key(merchant, title)
+        FROM new_rows WHERE transaction_type = 'Expense'
+        ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO expense_insight_merchants (user_id, merchant_key)
+        -- Rows removed by an account deletion cascade have no owner to mark.
+        SELECT DISTINCT user_id, expense_merchant_key(merchant, title)
+        FROM old_rows WHERE transaction_type = 'Expense'
+          AND EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
+    ELSE
+        -- Only columns the insight rules read can change a merchant's signals.
+        INSERT INTO expense_insight_merchants (user_id, merchant_key)
+        SELECT DISTINCT changed.user_id, changed.merchant_key
+        FROM old_rows AS before_row
+        JOIN new_rows AS after_row USING (transaction_id)
+        CROSS JOIN LATERAL (VALUES
+            (before_row.user_id, expense_merchant_key(before_row.merchant, before_row.title), before_row.transaction_type),
+            (after_row.user_id, expense_merchant_key(after_row.merchant, after_row.title), after_row.transaction_type)
+        ) AS changed (user_id, merchant_key, transaction_type)
+        WHERE changed.transaction_type = 'Expense'
+          AND (before_row.amount, before_row.date, before_row.merchant, before_row.title, before_row.transaction_type)
+              IS DISTINCT FROM (after_row.amount, after_row.date, after_row.merchant, after_row.title, after_row.transaction_type)
+        ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_insights_insert ON transactions;
+CREATE TRIGGER trg_transactions_insights_insert AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_expense_merchants_dirty();
+DROP TRIGGER IF EXISTS trg_transactions_insights_update ON transactions;
+CREATE TRIGGER trg_transactions_insights_update AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_expense_merchants_dirty();
+DROP TRIGGER IF EXISTS trg_transactions_insights_delete ON transactions;
+CREATE TRIGGER trg_transactions_insights_delete AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_expense_merchants_dirty();
+
+-- Existing ledgers start with every recent merchant dirty, so the first read
+-- after this migration computes a complete set of insights once.
+INSERT INTO expense_insight_merchants (user_id, merchant_key)
+SELECT DISTINCT user_id, expense_merchant_key(merchant, title)
+FROM transactions
+WHERE transaction_type = 'Expense' AND date >= CURRENT_TIMESTAMP - INTERVAL '400 days'
+ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
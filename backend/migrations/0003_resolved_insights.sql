@@ -0,0 +1,8 @@
+-- Apply after 0002_incremental_insights.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+-- Insights that stop firing are marked resolved in the same statement that
+-- writes a refresh, instead of lingering as open alerts.
+ALTER TABLE expense_insights DROP CONSTRAINT IF EXISTS expense_insights_status_check;
+ALTER TABLE expense_insights ADD CONSTRAINT expense_insights_status_check
+    CHECK (status IN ('open', 'helpful', 'incorrect', 'expected', 'ignored', 'resolved'));
@@ -0,0 +1,18 @@
+-- Apply after 0003_resolved_insights.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+ALTER TABLE import_batches ADD COLUMN IF NOT EXISTS rows_processed INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE import_batches ADD COLUMN IF NOT EXISTS rows_duplicate INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE import_batches ADD COLUMN IF NOT EXISTS rows_invalid INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE import_batches ADD COLUMN IF NOT EXISTS error_message VARCHAR(255);
+
+-- A user's column mapping for a bank export, keyed by its normalised header row.
+CREATE TABLE IF NOT EXISTS import_header_profiles (
+    profile_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    header_signature CHAR(64) NOT NULL,
+    headers JSONB NOT NULL,
+    column_map JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, header_signature)
+);
@@ -0,0 +1,9 @@
+-- Apply after 0004_statement_uploads.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+-- GET /transactions pages on (date, created_at, transaction_id); covering the
+-- whole key lets every page, however deep, be a single index range scan.
+-- The old (user_id, date DESC) index is a prefix of this one and is replaced.
+DROP INDEX IF EXISTS idx_transactions_user_date;
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+    ON transactions (user_id, date DESC, created_at DESC, transaction_id DESC);
@@ -0,0 +1,101 @@
+-- Apply after 0005_transaction_keyset_index.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+BEGIN;
+
+-- Monthly rollups. Every transaction write adjusts the per-month totals it
+-- touched, so expense guidance and the assistant's context read a few rows
+-- per month instead of scanning the whole ledger. Months are truncated in the
+-- server's time zone, as the queries that read them are.
+CREATE TABLE IF NOT EXISTS transaction_monthly_rollups (
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    transaction_type VARCHAR(50) NOT NULL,
+    is_essential BOOLEAN NOT NULL,
+    total NUMERIC(16, 2) NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month, category, transaction_type, is_essential)
+);
+
+CREATE OR REPLACE FUNCTION apply_transaction_rollups()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    -- Deltas are grouped per key and applied in key order, so one statement
+    -- touches each rollup row once and concurrent writers lock in the same order.
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO transaction_monthly_rollups AS rollup
+            (user_id, month, category, transaction_type, is_essential, total, transaction_count)
+        SELECT user_id, date_trunc('month', date)::date, category, transaction_type, is_essential,
+               SUM(amount), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4, 5 ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (user_id, month, category, transaction_type, is_essential) DO UPDATE SET
+            total = rollup.total + EXCLUDED.total,
+            transaction_count = rollup.transaction_count + EXCLUDED.transaction_count;
+        RETURN NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO transaction_monthly_rollups AS rollup
+            (user_id, month, category, transaction_type, is_essential, total, transaction_count)
+        -- Rows removed by an account deletion cascade have no owner to update.
+        SELECT user_id, date_trunc('month', date)::date, category, transaction_type, is_essential,
+               -SUM(amount), -COUNT(*)
+        FROM old_rows
+        WHERE EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        GROUP BY 1, 2, 3, 4, 5 ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (user_id, month, category, transaction_type, is_essential) DO UPDATE SET
+            total = rollup.total + EXCLUDED.total,
+            transaction_count = rollup.transaction_count + EXCLUDED.transaction_count;
+    ELSE
+        INSERT INTO transaction_monthly_rollups AS rollup
+            (user_id, month, category, transaction_type, is_essential, total, transaction_count)
+        SELECT changed.user_id, changed.month, changed.category, changed.transaction_type,
+               changed.is_essential, SUM(changed.amount), SUM(changed.count)
+        FROM old_rows AS before_row
+        JOIN new_rows AS after_row USING (transaction_id)
+        CROSS JOIN LATERAL (VALUES
+            (before_row.user_id, date_trunc('month', before_row.date)::date, before_row.category,
+             before_row.transaction_type, before_row.is_essential, -before_row.amount, -1),
+            (after_row.user_id, date_trunc('month', after_row.date)::date, after_row.category,
+             after_row.transaction_type, after_row.is_essential, after_row.amount, 1)
+        ) AS changed (user_id, month, category, transaction_type, is_essential, amount, count)
+        WHERE (before_row.user_id, before_row.date, before_row.category, before_row.transaction_type,
+               before_row.is_essential, before_row.amount)
+              IS DISTINCT FROM (after_row.user_id, after_row.date, after_row.category,
+               after_row.transaction_type, after_row.is_essential, after_row.amount)
+        GROUP BY 1, 2, 3, 4, 5 ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (user_id, month, category, transaction_type, is_essential) DO UPDATE SET
+            total = rollup.total + EXCLUDED.total,
+            transaction_count = rollup.transaction_count + EXCLUDED.transaction_count;
+    END IF;
+    DELETE FROM transaction_monthly_rollups
+    WHERE transaction_count = 0 AND user_id IN (SELECT DISTINCT user_id FROM old_rows);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_rollups_insert ON transactions;
+CREATE TRIGGER trg_transactions_rollups_insert AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_rollups();
+DROP TRIGGER IF EXISTS trg_transactions_rollups_update ON transactions;
+CREATE TRIGGER trg_transactions_rollups_update AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_rollups();
+DROP TRIGGER IF EXISTS trg_transactions_rollups_delete ON transactions;
+CREATE TRIGGER trg_transactions_rollups_delete AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_rollups();
+
+-- Rebuild the rollups from the ledger. Writers wait on the lock, so no write
+-- lands between the rebuild and the triggers above taking over.
+LOCK TABLE transactions IN SHARE MODE;
+TRUNCATE transaction_monthly_rollups;
+INSERT INTO transaction_monthly_rollups
+    (user_id, month, category, transaction_type, is_essential, total, transaction_count)
+SELECT user_id, date_trunc('month', date)::date, category, transaction_type, is_essential,
+       SUM(amount), COUNT(*)
+FROM transactions
+GROUP BY 1, 2, 3, 4, 5;
+
+COMMIT;
@@ -0,0 +1,54 @@
+-- Apply after 0006_monthly_rollups.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+-- Ledger versions. Any write to a user's transactions or commitments bumps
+-- their version, which keys the cached chat snapshot (story and financial
+-- context), so a snapshot is reused exactly until the ledger changes.
+CREATE TABLE IF NOT EXISTS ledger_versions (
+    user_id UUID PRIMARY KEY REFERENCES customers(user_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+CREATE OR REPLACE FUNCTION bump_ledger_versions()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO ledger_versions (user_id)
+        -- Rows removed by an account deletion cascade have no owner to bump.
+        SELECT DISTINCT user_id FROM old_rows
+        WHERE EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = ledger_versions.version + 1;
+    ELSE
+        INSERT INTO ledger_versions (user_id)
+        SELECT DISTINCT user_id FROM new_rows ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = ledger_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_version_insert ON transactions;
+CREATE TRIGGER trg_transactions_version_insert AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_transactions_version_update ON transactions;
+CREATE TRIGGER trg_transactions_version_update AFTER UPDATE ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_transactions_version_delete ON transactions;
+CREATE TRIGGER trg_transactions_version_delete AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_commitments_version_insert ON recurring_commitments;
+CREATE TRIGGER trg_commitments_version_insert AFTER INSERT ON recurring_commitments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_commitments_version_update ON recurring_commitments;
+CREATE TRIGGER trg_commitments_version_update AFTER UPDATE ON recurring_commitments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
+DROP TRIGGER IF EXISTS trg_commitments_version_delete ON recurring_commitments;
+CREATE TRIGGER trg_commitments_version_delete AFTER DELETE ON recurring_commitments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ledger_versions();
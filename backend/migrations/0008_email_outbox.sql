@@ -0,0 +1,28 @@
+-- Apply after 0007_ledger_versions.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+-- Transactional email outbox. Routes insert messages in the same transaction
+-- as the change that caused them; email_outbox.py delivers them with retries,
+-- so a Brevo slowdown never holds a request or a database connection.
+CREATE TABLE IF NOT EXISTS email_outbox (
+    email_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID REFERENCES customers(user_id) ON DELETE CASCADE,
+    kind VARCHAR(32) NOT NULL,
+    recipient VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    text_content TEXT,
+    html_content TEXT,
+    -- Replacing or deleting the reset token cancels its queued email.
+    reset_token_id UUID REFERENCES password_reset_tokens(token_id) ON DELETE SET NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'cancelled')),
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMPTZ,
+    last_error VARCHAR(500),
+    sent_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+    ON email_outbox (next_attempt_at) WHERE status IN ('pending', 'sending');
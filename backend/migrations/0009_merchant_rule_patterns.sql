@@ -0,0 +1,53 @@
+-- Apply after 0008_email_outbox.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+-- Merchant rules can match by prefix, substring or regular expression as
+-- well as exactly. Existing rules keep exact matching.
+ALTER TABLE merchant_rules ADD COLUMN IF NOT EXISTS match_type VARCHAR(16) NOT NULL DEFAULT 'exact';
+ALTER TABLE merchant_rules DROP CONSTRAINT IF EXISTS merchant_rules_match_type_check;
+ALTER TABLE merchant_rules ADD CONSTRAINT merchant_rules_match_type_check
+    CHECK (match_type IN ('exact', 'prefix', 'contains', 'regex'));
+ALTER TABLE merchant_rules DROP CONSTRAINT IF EXISTS merchant_rules_user_id_merchant_pattern_key;
+ALTER TABLE merchant_rules DROP CONSTRAINT IF EXISTS merchant_rules_user_id_match_type_merchant_pattern_key;
+ALTER TABLE merchant_rules ADD CONSTRAINT merchant_rules_user_id_match_type_merchant_pattern_key
+    UNIQUE (user_id, match_type, merchant_pattern);
+
+-- Merchant rule versions. Any write to a user's merchant rules bumps their
+-- version, which keys each worker's compiled copy of the rules, so imports
+-- match in memory and a changed rule is picked up on the next request.
+CREATE TABLE IF NOT EXISTS merchant_rule_versions (
+    user_id UUID PRIMARY KEY REFERENCES customers(user_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+CREATE OR REPLACE FUNCTION bump_merchant_rule_versions()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO merchant_rule_versions (user_id)
+        -- Rules removed by an account deletion cascade have no owner to bump.
+        SELECT DISTINCT user_id FROM old_rows
+        WHERE EXISTS (SELECT 1 FROM customers WHERE customers.user_id = old_rows.user_id)
+        ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = merchant_rule_versions.version + 1;
+    ELSE
+        INSERT INTO merchant_rule_versions (user_id)
+        SELECT DISTINCT user_id FROM new_rows ORDER BY 1
+        ON CONFLICT (user_id) DO UPDATE SET version = merchant_rule_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_merchant_rules_version_insert ON merchant_rules;
+CREATE TRIGGER trg_merchant_rules_version_insert AFTER INSERT ON merchant_rules
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_merchant_rule_versions();
+DROP TRIGGER IF EXISTS trg_merchant_rules_version_update ON merchant_rules;
+CREATE TRIGGER trg_merchant_rules_version_update AFTER UPDATE ON merchant_rules
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_merchant_rule_versions();
+DROP TRIGGER IF EXISTS trg_merchant_rules_version_delete ON merchant_rules;
+CREATE TRIGGER trg_merchant_rules_version_delete AFTER DELETE ON merchant_rules
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_merchant_rule_versions();
@@ -0,0 +1,30 @@
+-- Apply after 0009_merchant_rule_patterns.sql. It is idempotent; new installations
+-- can use ../Schema.sql directly.
+
+-- Retroactive merchant rules. Creating or changing a rule queues a backfill
+-- that rule_backfill.py applies to the user's past transactions in chunks,
+-- each committed on its own; the row reports its progress to the client.
+-- The transaction triggers above keep insights, rollups and ledger versions
+-- current as the chunks land.
+CREATE TABLE IF NOT EXISTS merchant_rule_backfills (
+    rule_id UUID PRIMARY KEY REFERENCES merchant_rules(rule_id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES customers(user_id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    rows_total INTEGER,
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    rows_updated INTEGER NOT NULL DEFAULT 0,
+    -- Keyset position of the last chunk, newest transactions first.
+    after_date TIMESTAMPTZ,
+    after_created_at TIMESTAMPTZ,
+    after_transaction_id UUID,
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    lease_id UUID,
+    locked_until TIMESTAMPTZ,
+    error_message VARCHAR(255),
+    queued_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_merchant_rule_backfills_due
+    ON merchant_rule_backfills (queued_at) WHERE status IN ('pending', 'running');
@@ -0,0 +1,25 @@
+-- Apply after 0010_merchant_rule_backfills.sql. It is idempotent; new
+-- installations can use ../Schema.sql directly.
+
+-- A refresh resolves only the merchant insights recorded in
+-- expense_insight_merchants.insight_keys. Open insights written by the full
+-- recompute before 0002, or keyed by a casefolded merchant name rather than
+-- expense_merchant_key(), are recorded nowhere and would stay open forever.
+-- Resolve them, and mark their owners' recent merchants dirty so the next
+-- read rebuilds whatever still fires under tracked keys.
+WITH untracked AS (
+    UPDATE expense_insights AS insight
+    SET status = 'resolved', updated_at = CURRENT_TIMESTAMP
+    WHERE insight.status = 'open' AND insight.kind <> 'upcoming_commitment'
+      AND NOT EXISTS (
+        SELECT 1 FROM expense_insight_merchants AS state
+        WHERE state.user_id = insight.user_id AND insight.insight_key = ANY(state.insight_keys)
+      )
+    RETURNING insight.user_id
+)
+INSERT INTO expense_insight_merchants (user_id, merchant_key)
+SELECT DISTINCT user_id, expense_merchant_key(merchant, title)
+FROM transactions
+WHERE user_id IN (SELECT user_id FROM untracked)
+  AND transaction_type = 'Expense' AND date >= CURRENT_TIMESTAMP - INTERVAL '400 days'
+ON CONFLICT (user_id, merchant_key) DO UPDATE SET dirty = TRUE;
@@ -0,0 +1,115 @@
+"""Process-wide chat model clients with call metrics.
+
+Building a LangChain chat model per request re-imports nothing after the
+first time, but it does create a fresh HTTP client, so every call paid for a
+new connection and TLS handshake.  ``ModelClients`` builds one client per
+temperature per process and hands the same instance to every caller, so the
+underlying connection pool is reused.  Clients built before a fork are
+dropped in the child, which opens its own.  Every call is timed and failures
+are counted, which ``stats()`` reports.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator
+
+
+def _percentile(ordered: list[float], fraction: float) -> float | None:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelClients:
+    """Lazily created, shared chat model clients.
+
+    ``create(temperature)`` returns a client with LangChain's ``invoke`` and
+    ``stream`` methods.  Latencies of the last ``window`` calls are kept for
+    the percentiles in ``stats()``.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[float], Any],
+        *,
+        window: int = 512,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self._create = create
+        self._clock = clock
+        self._clients: dict[float, Any] = {}
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._first_chunks: deque[float] = deque(maxlen=window)
+        self._counters = {"clients_created": 0, "calls": 0, "errors": 0, "timeouts": 0}
+
+    def client(self, temperature: float) -> Any:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._clients = {}
+                self._pid = os.getpid()
+            client = self._clients.get(temperature)
+            if client is None:
+                client = self._clients[temperature] = self._create(temperature)
+                self._counters["clients_created"] += 1
+            return client
+
+    def warm(self, temperatures: Iterable[float]) -> None:
+        """Build clients ahead of the first request, e.g. in a gunicorn hook."""
+        for temperature in temperatures:
+            self.client(temperature)
+
+    def _record(self, started: float, failed: bool) -> None:
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["errors"] += failed
+            self._latencies.append(self._clock() - started)
+
+    def record_timeout(self) -> None:
+        """Count a call the caller gave up waiting for."""
+        with self._lock:
+            self._counters["timeouts"] += 1
+
+    def invoke(self, prompt: str, *, temperature: float) -> str:
+        started, failed = self._clock(), True
+        try:
+            content = self.client(temperature).invoke(prompt).content
+            failed = False
+            return content
+        finally:
+            self._record(started, failed)
+
+    def stream(self, prompt: str, *, temperature: float) -> Iterator[str]:
+        """Yield the reply's text chunks; the call is timed until the stream ends."""
+        started, failed, first = self._clock(), True, True
+        try:
+            for chunk in self.client(temperature).stream(prompt):
+                if first:
+                    first = False
+                    with self._lock:
+                        self._first_chunks.append(self._clock() - started)
+                yield chunk.content
+            failed = False
+        except GeneratorExit:
+            # The caller stopped reading, e.g. after a timeout; not a model error.
+            failed = False
+            raise
+        finally:
+            self._record(started, failed)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            first_chunks = sorted(self._first_chunks)
+            return {
+                **self._counters,
+                "latency_p50_seconds": _percentile(latencies, 0.50),
+                "latency_p95_seconds": _percentile(latencies, 0.95),
+                "latency_max_seconds": latencies[-1] if latencies else None,
+                "first_chunk_p50_seconds": _percentile(first_chunks, 0.50),
+            }
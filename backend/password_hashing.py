@@ -0,0 +1,141 @@
+"""bcrypt hashing on a small, bounded process pool.
+
+bcrypt is slow on purpose, and a login storm run on request threads leaves
+the worker doing nothing else.  ``PasswordHasher`` sends each hash or check to
+a per-process pool of ``workers`` processes and admits at most ``max_queue``
+more jobs waiting behind them; anything beyond that is refused at once with
+``HasherBusy`` so the API can answer 503 instead of queueing without bound.
+With ``workers=0`` the work runs inline, which keeps tests and ``python
+app.py`` simple.
+
+Hashes are standard ``$2b$`` strings, compatible with those Flask-Bcrypt
+wrote, and like them only the first 72 bytes of a password count.
+``needs_rehash`` reports hashes whose cost differs from the configured
+one, so a login can upgrade (or downgrade) the stored hash in place.
+"""
+
+from __future__ import annotations
+
+import hmac
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable
+
+import bcrypt
+
+_COST = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+# bcrypt only reads this many bytes.  bcrypt 5 raises on longer input where
+# older releases and Flask-Bcrypt silently cut it, so it is cut here.
+_MAX_BYTES = 72
+
+
+class HasherBusy(RuntimeError):
+    """Raised when the hashing pool is saturated or too slow to answer."""
+
+
+def hash_password(password: str, rounds: int) -> str:
+    if not password:
+        raise ValueError("Password must be non-empty.")
+    return bcrypt.hashpw(password.encode("utf-8")[:_MAX_BYTES], bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def check_password(password: str, hashed: str) -> bool:
+    stored = hashed.encode("utf-8")
+    return hmac.compare_digest(bcrypt.hashpw(password.encode("utf-8")[:_MAX_BYTES], stored), stored)
+
+
+def hash_cost(hashed: str) -> int | None:
+    match = _COST.match(hashed)
+    return int(match.group(1)) if match else None
+
+
+class PasswordHasher:
+    """Bounded bcrypt executor shared by every request thread of a process."""
+
+    def __init__(self, *, rounds: int = 12, workers: int = 2, max_queue: int = 16, timeout: float = 10.0):
+        if not 4 <= rounds <= 31:
+            raise ValueError("bcrypt rounds must be between 4 and 31.")
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_queue) if workers else None
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_pid: int | None = None
+        self._lock = threading.Lock()
+        self._counters = {"jobs": 0, "rejected": 0, "timeouts": 0, "rehashes": 0}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            # A pool inherited across a fork belongs to the parent.
+            if self._executor is None or self._executor_pid != os.getpid():
+                # Children come from a fork server: forking a threaded worker
+                # could copy a lock some other thread holds.
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, function: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            self._counters["jobs"] += 1
+        if self._slots is None:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise HasherBusy("Too many password checks are waiting.")
+        try:
+            future: Future = self._pool().submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _future: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise HasherBusy("A password check did not finish in time.")
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self.rounds)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(check_password, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_cost(hashed) != self.rounds
+
+    def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Check a password and, if it matches a hash of another cost, rehash it.
+
+        Returns ``(matches, new_hash)``; ``new_hash`` is None when the stored
+        hash is current or the pool was too busy to rehash this time.
+        """
+        if not self.verify(password, hashed):
+            return False, None
+        if not self.needs_rehash(hashed):
+            return True, None
+        try:
+            new_hash = self.hash(password)
+        except HasherBusy:
+            return True, None
+        with self._lock:
+            self._counters["rehashes"] += 1
+        return True, new_hash
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "workers": self.workers, "max_queue": self.max_queue, "rounds": self.rounds}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,109 @@
+"""Named prepared statements for the hottest queries.
+
+psycopg2 sends every query as text, so PostgreSQL parses, analyses and plans
+the same few statements again on each call.  ``QueryRegistry`` holds those
+statements under fixed names; the first time a pooled connection runs one it
+is ``PREPARE``d on that connection, and from then on it runs as ``EXECUTE
+name (...)``, which skips parsing and lets the server reuse a generic plan.
+
+Statements are written with psycopg2's ``%s`` placeholders and numbered for
+``PREPARE`` when registered.  Prepared statements belong to the server
+session and survive rollbacks, so the registry only remembers which names
+each connection has; when it first sees a connection (new, or opened before
+the registry existed) it reads ``pg_prepared_statements`` once rather than
+assume.  With ``enabled=False``, e.g. behind a PgBouncer in transaction
+mode where a session's statements do not follow it, every call runs as
+plain text.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Sequence
+from weakref import WeakKeyDictionary
+
+_NAME = re.compile(r"[a-z_][a-z0-9_]{0,62}")
+
+
+def numbered(query: str) -> tuple[str, int]:
+    """Turn ``%s`` placeholders into ``$1, $2, ...``; ``%%`` becomes ``%``."""
+    pieces = query.split("%%")
+    count = 0
+    for index, piece in enumerate(pieces):
+        parts = piece.split("%s")
+        text = parts[0]
+        for part in parts[1:]:
+            count += 1
+            text += f"${count}{part}"
+        pieces[index] = text
+    return "%".join(pieces), count
+
+
+class QueryRegistry:
+    """Statements by name, prepared lazily on each connection that runs them."""
+
+    def __init__(self, *, enabled: bool = True):
+        self.enabled = enabled
+        self._queries: dict[str, tuple[str, str, str]] = {}
+        self._prepared: WeakKeyDictionary[Any, set[str]] = WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._counters = {"prepares": 0, "executions": 0, "plain_executions": 0}
+
+    def register(self, name: str, query: str) -> str:
+        """Add a statement; registering the same name and text again is a no-op."""
+        if not _NAME.fullmatch(name):
+            raise ValueError(f"{name!r} is not a valid statement name.")
+        body, count = numbered(query)
+        execute = f"EXECUTE {name} ({', '.join(['%s'] * count)})" if count else f"EXECUTE {name}"
+        with self._lock:
+            if name in self._queries and self._queries[name][0] != query:
+                raise ValueError(f"{name!r} is already registered with another statement.")
+            self._queries[name] = (query, f"PREPARE {name} AS {body}", execute)
+        return name
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._queries
+
+    def statement(self, name: str) -> str:
+        """The statement's text as registered, with ``%s`` placeholders."""
+        return self._queries[name][0]
+
+    def _names_on(self, connection: Any) -> set[str]:
+        with self._lock:
+            names = self._prepared.get(connection)
+        if names is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM pg_prepared_statements")
+                names = {row[0] for row in cursor.fetchall()}
+            with self._lock:
+                names = self._prepared.setdefault(connection, names)
+        return names
+
+    def execute(self, cursor: Any, name: str, params: Sequence[Any] = ()) -> None:
+        """Run a registered statement on ``cursor``; fetch from it as usual."""
+        query, prepare, execute = self._queries[name]
+        if not self.enabled:
+            with self._lock:
+                self._counters["plain_executions"] += 1
+            cursor.execute(query, params)
+            return
+        # A connection is used by one thread at a time, so its set is too.
+        names = self._names_on(cursor.connection)
+        if name not in names:
+            cursor.execute(prepare)
+            names.add(name)
+            with self._lock:
+                self._counters["prepares"] += 1
+        with self._lock:
+            self._counters["executions"] += 1
+        cursor.execute(execute, params)
+
+    def forget(self, connection: Any) -> None:
+        """Drop what is known about a connection, e.g. after ``DISCARD ALL``."""
+        with self._lock:
+            self._prepared.pop(connection, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "statements": len(self._queries), "connections": len(self._prepared)}
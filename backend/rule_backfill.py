@@ -0,0 +1,298 @@
+"""Retroactive merchant rules: apply a new or changed rule to past transactions.
+
+``POST /merchant-rules`` queues a row in ``merchant_rule_backfills`` in the
+same transaction as the rule, and this worker applies it.  It claims one job
+at a time with ``FOR UPDATE SKIP LOCKED`` under a lease, so several workers
+can run side by side and a job whose worker died is picked up again, then
+walks the user's transactions newest first in chunks of ``chunk_size``.
+
+Each chunk is one short transaction: the rows are read and locked, matched
+against the user's whole compiled rule set (so a more specific rule still
+wins over the new one), and those the rule changes are rewritten in a single
+``UPDATE``.  Rows with ``user_category_override`` are never touched.  The
+chunk commits together with the job's position and row counts, which is the
+progress the API reports on the rule, and a restarted job resumes from there.
+The transaction triggers mark the changed merchants' insights dirty, move
+amounts between rollup categories and bump the ledger version, so nothing
+else needs invalidating.
+
+Run it next to the web process, from ``backend/``::
+
+    python rule_backfill.py
+"""
+
+from __future__ import annotations
+
+import select
+import time
+import uuid
+from typing import Any, Callable, Collection, Iterable, Mapping
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+try:
+    from .merchant_rules import CompiledRules, merchant_text, merge_rule
+except ImportError:  # pragma: no cover - direct-script fallback
+    from merchant_rules import CompiledRules, merchant_text, merge_rule
+
+NOTIFY_CHANNEL = "merchant_rule_backfills"
+
+_CHUNK = """
+SELECT transaction_id, date, created_at, title, merchant, category, transaction_type, is_essential
+FROM transactions
+WHERE user_id = %s AND NOT user_category_override{after}
+ORDER BY date DESC, created_at DESC, transaction_id DESC
+LIMIT %s
+FOR UPDATE
+"""
+_AFTER = " AND (date, created_at, transaction_id) < (%s, %s, %s::uuid)"
+
+
+def rule_changes(
+    rows: Iterable[Mapping[str, Any]],
+    rules: CompiledRules,
+    rule_id: str,
+    categories: Mapping[str, Collection[str]],
+) -> list[tuple[str, str | None, str, bool]]:
+    """``(transaction_id, merchant, category, is_essential)`` for each row the rule rewrites.
+
+    Rows another rule matches more specifically, or that the rule would leave
+    as they are, are skipped.  ``categories`` maps a transaction type to the
+    categories valid for it.
+    """
+    rows = list(rows)
+    changes = []
+    for row, rule in zip(rows, rules.match_many(merchant_text(row) for row in rows)):
+        if rule is None or str(rule["rule_id"]) != rule_id:
+            continue
+        updated = merge_rule(row, rule, categories.get(row["transaction_type"], ()))
+        if (updated["merchant"], updated["category"], updated["is_essential"]) != (
+            row["merchant"], row["category"], row["is_essential"]
+        ):
+            changes.append((str(row["transaction_id"]), updated["merchant"], updated["category"], updated["is_essential"]))
+    return changes
+
+
+class BackfillWorker:
+    """Claims queued rule backfills and applies them chunk by chunk."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        categories: Mapping[str, Collection[str]],
+        *,
+        chunk_size: int = 1000,
+        max_attempts: int = 3,
+        lease_seconds: int = 300,
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+        self._connect = connect
+        self.categories = categories
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._connection: Any = None
+
+    def _cursor(self) -> RealDictCursor:
+        if self._connection is None or self._connection.closed:
+            self._connection = self._connect()
+        return self._connection.cursor(cursor_factory=RealDictCursor)
+
+    def _reset(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+
+    def _claim(self) -> dict[str, Any] | None:
+        # A job stuck in 'running' past its lease belongs to a worker that
+        # died mid-run, and is claimed again from its last committed chunk.
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE merchant_rule_backfills AS backfill
+                SET status = 'running', attempts = backfill.attempts + 1, lease_id = %s,
+                    locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    rows_total = COALESCE(backfill.rows_total, (
+                      SELECT count(*) FROM transactions
+                      WHERE user_id = backfill.user_id AND NOT user_category_override
+                    ))
+                WHERE backfill.rule_id = (
+                  SELECT rule_id FROM merchant_rule_backfills
+                  WHERE status = 'pending' OR (status = 'running' AND locked_until < CURRENT_TIMESTAMP)
+                  ORDER BY queued_at
+                  LIMIT 1
+                  FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+                """,
+                (str(uuid.uuid4()), self.lease_seconds),
+            )
+            job = cursor.fetchone()
+        self._connection.commit()
+        return job
+
+    def _rules(self, user_id: str) -> CompiledRules:
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT rule_id, match_type, merchant_pattern, display_merchant, category, is_essential
+                FROM merchant_rules WHERE user_id = %s ORDER BY created_at, rule_id
+                """,
+                (user_id,),
+            )
+            rules = CompiledRules(cursor.fetchall())
+        self._connection.commit()
+        return rules
+
+    def _run_chunk(self, job: dict[str, Any], rules: CompiledRules) -> bool:
+        """Apply the rule to the next chunk; returns whether there is more to do."""
+        rule_id, user_id = str(job["rule_id"]), str(job["user_id"])
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT after_date, after_created_at, after_transaction_id FROM merchant_rule_backfills
+                WHERE rule_id = %s AND lease_id = %s FOR UPDATE
+                """,
+                (rule_id, job["lease_id"]),
+            )
+            position = cursor.fetchone()
+            if position is None:
+                # The rule was changed (and requeued) or deleted meanwhile.
+                self._connection.rollback()
+                return False
+            after = () if position["after_transaction_id"] is None else (
+                position["after_date"], position["after_created_at"], position["after_transaction_id"]
+            )
+            cursor.execute(_CHUNK.format(after=_AFTER if after else ""), (user_id, *after, self.chunk_size))
+            rows = cursor.fetchall()
+            changes = rule_changes(rows, rules, rule_id, self.categories)
+            updated = 0
+            if changes:
+                transaction_ids, merchants, categories, essentials = (list(column) for column in zip(*changes))
+                cursor.execute(
+                    """
+                    UPDATE transactions AS transaction
+                    SET merchant = change.merchant, category = change.category,
+                        is_essential = change.is_essential, updated_at = CURRENT_TIMESTAMP
+                    FROM unnest(%s::uuid[], %s::varchar[], %s::varchar[], %s::boolean[])
+                         AS change (transaction_id, merchant, category, is_essential)
+                    WHERE transaction.transaction_id = change.transaction_id AND transaction.user_id = %s
+                    """,
+                    (transaction_ids, merchants, categories, essentials, user_id),
+                )
+                updated = cursor.rowcount
+            done = len(rows) < self.chunk_size
+            last = rows[-1] if rows else {"date": None, "created_at": None, "transaction_id": None}
+            cursor.execute(
+                """
+                UPDATE merchant_rule_backfills SET
+                  rows_processed = rows_processed + %(processed)s,
+                  rows_updated = rows_updated + %(updated)s,
+                  after_date = COALESCE(%(date)s, after_date),
+                  after_created_at = COALESCE(%(created_at)s, after_created_at),
+                  after_transaction_id = COALESCE(%(transaction_id)s::uuid, after_transaction_id),
+                  status = CASE WHEN %(done)s THEN 'completed' ELSE status END,
+                  error_message = CASE WHEN %(done)s THEN NULL ELSE error_message END,
+                  finished_at = CASE WHEN %(done)s THEN CURRENT_TIMESTAMP END,
+                  lease_id = CASE WHEN %(done)s THEN NULL ELSE lease_id END,
+                  locked_until = CASE WHEN %(done)s THEN NULL
+                                      ELSE CURRENT_TIMESTAMP + make_interval(secs => %(lease)s) END
+                WHERE rule_id = %(rule_id)s
+                """,
+                {
+                    "processed": len(rows), "updated": updated, "date": last["date"],
+                    "created_at": last["created_at"], "transaction_id": last["transaction_id"] and str(last["transaction_id"]),
+                    "done": done, "lease": self.lease_seconds, "rule_id": rule_id,
+                },
+            )
+        self._connection.commit()
+        return not done
+
+    def _release(self, job: dict[str, Any], error: str) -> None:
+        """Requeue a job that hit an error, or fail it once it is out of attempts."""
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE merchant_rule_backfills SET
+                  status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                  finished_at = CASE WHEN attempts >= %s THEN CURRENT_TIMESTAMP END,
+                  error_message = %s, lease_id = NULL, locked_until = NULL
+                WHERE rule_id = %s AND lease_id = %s
+                """,
+                (self.max_attempts, self.max_attempts, error[:255], str(job["rule_id"]), job["lease_id"]),
+            )
+        self._connection.commit()
+
+    def run_once(self) -> dict[str, Any] | None:
+        """Run one due backfill to the end; returns its job as claimed, or None."""
+        try:
+            job = self._claim()
+            if job is None:
+                return None
+            if job["attempts"] > self.max_attempts:
+                self._release(job, job["error_message"] or "The backfill was interrupted too many times.")
+                return job
+            try:
+                rules = self._rules(str(job["user_id"]))
+                while self._run_chunk(job, rules):
+                    pass
+            except psycopg2.Error:
+                raise
+            except Exception as error:
+                # Anything else is a bug for this job alone; record it and move on.
+                self._connection.rollback()
+                self._release(job, str(error))
+            return job
+        except psycopg2.Error:
+            # The lease expires and the job is claimed again, attempts permitting.
+            self._reset()
+            raise
+
+    def run_forever(self, listen: Any = None, *, poll_interval: float = 5.0) -> None:
+        """Drain due jobs, then sleep until NOTIFY wakes the worker or a poll is due.
+
+        ``listen`` is an autocommit connection that has run ``LISTEN
+        merchant_rule_backfills``; without it the worker polls.
+        """
+        while True:
+            try:
+                if self.run_once() is not None:
+                    continue
+            except psycopg2.Error:
+                time.sleep(poll_interval)
+                continue
+            if listen is None:
+                time.sleep(poll_interval)
+                continue
+            if select.select([listen], [], [], poll_interval)[0]:
+                listen.poll()
+                listen.notifies.clear()
+
+
+def main() -> None:
+    import logging
+    import os
+
+    try:
+        from .app import EXPENSE_CATEGORIES, INCOME_CATEGORIES, get_db_connection
+    except ImportError:  # pragma: no cover - direct-script fallback
+        from app import EXPENSE_CATEGORIES, INCOME_CATEGORIES, get_db_connection
+
+    logging.basicConfig(level=logging.INFO)
+    worker = BackfillWorker(
+        get_db_connection,
+        {"Expense": EXPENSE_CATEGORIES, "Income": INCOME_CATEGORIES},
+        chunk_size=int(os.getenv("RULE_BACKFILL_CHUNK_SIZE", "1000")),
+        max_attempts=int(os.getenv("RULE_BACKFILL_MAX_ATTEMPTS", "3")),
+    )
+    listen = get_db_connection()
+    listen.autocommit = True
+    with listen.cursor() as cursor:
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+    worker.run_forever(listen, poll_interval=float(os.getenv("RULE_BACKFILL_POLL_SECONDS", "5")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Versioned cache of per-user chat snapshots.
+
+A chat turn needs the user's expense story and financial context, which cost
+several queries and an insight refresh to build.  Both only change when the
+ledger does, so they are cached under ``(user_id, version)``, where the version
+comes from ``ledger_versions`` and is bumped by database triggers on every
+write to transactions or commitments.  A stale entry is never served: a new
+version is simply a different key.
+
+Two backends share one interface: an in-process LRU for a single worker, and
+a shared backend for any Redis-compatible client (``get``/``set`` with ``ex``)
+so every worker reuses the same snapshot.  Snapshots must be JSON-serialisable.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any
+
+
+class LocalSnapshotCache:
+    """Least-recently-used snapshots for up to ``max_entries`` users.
+
+    Only the newest version per user is kept; storing a new version replaces
+    the old one, which is all the invalidation the cache needs.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, user_id: str, version: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def set(self, user_id: str, version: str, snapshot: Any) -> None:
+        with self._lock:
+            self._entries[user_id] = (version, snapshot)
+            self._entries.move_to_end(user_id)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def discard(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries), "max_entries": self.max_entries}
+
+
+class SharedSnapshotCache:
+    """Snapshots in a Redis-compatible store, shared by every worker.
+
+    Old versions are left to expire after ``ttl`` seconds.  The store is an
+    optimisation only: any error counts as a miss and the snapshot is rebuilt.
+    """
+
+    def __init__(self, client: Any, *, ttl: int = 3600, prefix: str = "finmanager:snapshot:"):
+        self._client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _key(self, user_id: str, version: str) -> str:
+        return f"{self.prefix}{user_id}:{version}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, user_id: str, version: str) -> Any | None:
+        try:
+            raw = self._client.get(self._key(user_id, version))
+            snapshot = None if raw is None else json.loads(raw)
+        except Exception:
+            self._count("errors")
+            snapshot = None
+        self._count("misses" if snapshot is None else "hits")
+        return snapshot
+
+    def set(self, user_id: str, version: str, snapshot: Any) -> None:
+        try:
+            self._client.set(self._key(user_id, version), json.dumps(snapshot), ex=self.ttl)
+        except Exception:
+            self._count("errors")
+            return
+        self._count("stores")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
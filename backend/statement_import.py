@@ -0,0 +1,316 @@
+"""Incremental parsing of uploaded bank statements.
+
+Statements arrive as a text stream and are turned into import item payloads
+one row at a time, so a large export never has to be held in memory.  The
+column heuristics mirror the Flutter importer: header names are matched
+fuzzily, amounts are cleaned of currency symbols, the transaction type comes
+from a type column, debit/credit columns or the sign, and categories are
+clamped into the allowed set.  Validation stays with the API, which runs every
+payload through the same checks as a JSON import.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Iterator
+
+ALIASES = {
+    "amount": ["amount", "amt", "value", "transactionamount", "price", "total", "money"],
+    "debit": [
+        "debit", "withdrawal", "withdrawalamt", "withdrawalamount", "dr", "debitamount",
+        "moneyout", "paidout", "outflow", "spent",
+    ],
+    "credit": [
+        "credit", "deposit", "depositamt", "depositamount", "cr", "creditamount",
+        "moneyin", "paidin", "inflow", "received",
+    ],
+    "date": [
+        "date", "transactiondate", "txndate", "valuedate", "posteddate", "postingdate",
+        "datetime", "bookingdate", "trandate",
+    ],
+    "type": ["type", "transactiontype", "drcr", "crdr", "debitcredit", "direction", "kind"],
+    "category": ["category", "categories", "tag", "tags", "group", "head"],
+    "title": [
+        "title", "description", "desc", "narration", "particulars", "details", "detail", "memo",
+        "notes", "note", "name", "transaction", "remarks", "reference", "purpose",
+    ],
+    "merchant": ["merchant", "payee", "vendor", "beneficiary", "party", "counterparty"],
+}
+COLUMN_FIELDS = tuple(ALIASES)
+HEADER_SCAN_ROWS = 20
+
+_DATE_FORMATS = [
+    "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%m/%d/%Y", "%Y/%m/%d", "%d %b %Y", "%b %d %Y",
+    "%B %d %Y", "%d-%b-%Y", "%d/%m/%y", "%m/%d/%y", "%Y%m%d",
+]
+_EXPENSE_KEYWORDS = [
+    ("Food", r"food|restaurant|cafe|coffee|grocer|dining|snack|swiggy|zomato|meal|lunch|dinner|breakfast|pizza|bakery"),
+    ("Travel", r"travel|uber|ola|taxi|cab|train|flight|bus|fuel|petrol|diesel|metro|irctc|transport|toll|parking"),
+    ("Bills", r"bill|electric|water|gas|internet|wifi|phone|mobile|recharge|dth|utility|broadband|insurance|emi|loan|subscription"),
+    ("Shopping", r"shop|amazon|flipkart|myntra|cloth|movie|entertain|store|mall|gadget|electronic|apparel|fashion"),
+    ("Rent", r"\brent\b|lease"),
+]
+_INCOME_KEYWORDS = [
+    ("Salary", r"salary|payroll|wage|stipend"),
+    ("Bonus", r"bonus|incentive"),
+    ("Gift", r"gift|reward|cashback"),
+    ("Investment", r"interest|dividend|investment|return|maturity"),
+]
+EXPENSE_CATEGORIES = ("Food", "Travel", "Bills", "Shopping", "Rent", "Others")
+INCOME_CATEGORIES = ("Salary", "Bonus", "Gift", "Investment", "Others")
+
+
+class StatementFormatError(ValueError):
+    """The upload is not a statement this parser can read."""
+
+
+def normalise_header(header: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", header.lower())
+
+
+def header_signature(headers: Iterable[str]) -> str:
+    """Stable identity of a header row, used to look up a stored column profile."""
+    return hashlib.sha256("|".join(normalise_header(header) for header in headers).encode()).hexdigest()
+
+
+def _column(headers: list[str], aliases: list[str]) -> int:
+    # Exact normalised match first, then a header-contains-alias fallback.
+    for alias in aliases:
+        if alias in headers:
+            return headers.index(alias)
+    for index, header in enumerate(headers):
+        if any(len(alias) >= 3 and alias in header for alias in aliases):
+            return index
+    return -1
+
+
+def guess_columns(headers: list[str]) -> dict[str, int]:
+    normalised = [normalise_header(header) for header in headers]
+    return {field: _column(normalised, aliases) for field, aliases in ALIASES.items()}
+
+
+def profile_columns(headers: list[str], column_map: dict[str, str]) -> dict[str, int]:
+    """Resolve a stored ``{field: header}`` profile, guessing unmapped fields."""
+    columns = guess_columns(headers)
+    normalised = [normalise_header(header) for header in headers]
+    for field, header in column_map.items():
+        if field in columns and header:
+            target = normalise_header(header)
+            columns[field] = normalised.index(target) if target in normalised else -1
+    return columns
+
+
+def parse_amount(raw: str) -> float | None:
+    text = raw.strip()
+    if not text:
+        return None
+    negative = (
+        text.startswith("-")
+        or (text.startswith("(") and text.endswith(")"))
+        or re.search(r"\b(dr|debit)\b", text, re.IGNORECASE) is not None
+    )
+    digits = re.sub(r"[^0-9.]", "", text)
+    try:
+        value = float(digits)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def parse_date(raw: str) -> str | None:
+    text = raw.strip().replace(",", "")
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date().isoformat()
+    except ValueError:
+        pass
+    for pattern in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, pattern).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def infer_type(raw_type: str, *, debit: bool, credit: bool) -> str:
+    if credit and not debit:
+        return "Income"
+    if debit and not credit:
+        return "Expense"
+    kind = raw_type.lower().strip()
+    if re.search(r"income|credit|^cr$|deposit|inflow|received|refund|salary", kind):
+        return "Income"
+    # Expense-looking types, negative amounts and anything unclear are treated
+    # as expenses, the safest default for a statement.
+    return "Expense"
+
+
+def map_category(raw: str, transaction_type: str, context: str) -> str:
+    allowed = INCOME_CATEGORIES if transaction_type == "Income" else EXPENSE_CATEGORIES
+    cleaned = raw.strip()
+    for category in allowed:
+        if category.lower() == cleaned.lower():
+            return category
+    text = f"{cleaned} {context}".lower()
+    keywords = _INCOME_KEYWORDS if transaction_type == "Income" else _EXPENSE_KEYWORDS
+    return next((category for category, pattern in keywords if re.search(pattern, text)), "Others")
+
+
+def _csv_item(row: list[str], columns: dict[str, int], today: str) -> dict[str, Any] | None:
+    def cell(field: str) -> str:
+        index = columns[field]
+        return row[index].strip() if 0 <= index < len(row) else ""
+
+    debit_value = parse_amount(cell("debit"))
+    credit_value = parse_amount(cell("credit"))
+    signed = parse_amount(cell("amount"))
+    is_debit = is_credit = False
+    if debit_value:
+        amount, is_debit = abs(debit_value), True
+    elif credit_value:
+        amount, is_credit = abs(credit_value), True
+    elif signed:
+        amount, is_debit = abs(signed), signed < 0
+    else:
+        return None  # No usable amount, as in the client importer.
+
+    transaction_type = infer_type(cell("type"), debit=is_debit, credit=is_credit)
+    title = cell("title") or cell("merchant") or "Imported transaction"
+    merchant = cell("merchant") or cell("title")
+    item = {
+        "title": title[:255],
+        "amount": amount,
+        "category": map_category(cell("category"), transaction_type, f"{title} {merchant}"),
+        "transaction_type": transaction_type,
+        "date": parse_date(cell("date")) or today,
+    }
+    if merchant:
+        item["merchant"] = merchant
+    return item
+
+
+def iter_csv_items(
+    lines: Iterable[str],
+    resolve_profile: Callable[[list[str]], dict[str, str] | None] = lambda _headers: None,
+) -> Iterator[dict[str, Any]]:
+    """Yield one import payload per usable CSV row.
+
+    The delimiter is sniffed from the first non-blank line and the header row
+    is the first of the opening rows that names an amount, debit or credit
+    column.  ``resolve_profile(headers)`` may return a stored ``{field:
+    header}`` mapping, which takes precedence over the guessed columns.
+    """
+    lines = iter(lines)
+    opening: list[str] = []
+    for line in lines:
+        opening.append(line)
+        if line.strip():
+            break
+    if not opening or not opening[-1].strip():
+        raise StatementFormatError("The statement is empty.")
+    first = opening[-1]
+    delimiter = max((",", ";", "\t"), key=first.count)
+
+    def replay() -> Iterator[str]:
+        yield from opening
+        yield from lines
+
+    reader = csv.reader(replay(), delimiter=delimiter)
+    columns: dict[str, int] | None = None
+    for scanned, row in enumerate(reader, start=1):
+        if any(cell.strip() for cell in row):
+            guessed = guess_columns(row)
+            found = max(guessed["amount"], guessed["debit"], guessed["credit"]) >= 0
+            # A stored profile is only consulted for a likely header row, or
+            # while no row has looked like one yet.
+            profile = resolve_profile(row)
+            if profile:
+                columns = profile_columns(row, profile)
+                break
+            if found:
+                columns = guessed
+                break
+        if scanned >= HEADER_SCAN_ROWS:
+            break
+    if columns is None or max(columns["amount"], columns["debit"], columns["credit"]) < 0:
+        raise StatementFormatError("No amount column was found (need an amount, or debit/credit, column).")
+
+    today = date.today().isoformat()
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        item = _csv_item(row, columns, today)
+        if item is not None:
+            yield item
+
+
+def _ofx_tokens(chunks: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """Yield ``(tag, text)`` pairs from SGML or XML OFX.
+
+    ``chunks`` may split the document anywhere, including inside a tag, and
+    the plain-text OFX header before the first tag is skipped.
+    """
+    pending: str | None = None
+    for chunk in chunks:
+        if pending is None:
+            if "<" not in chunk:
+                continue
+            pending, chunk = "", chunk[chunk.index("<") + 1:]
+        parts = (pending + chunk).split("<")
+        # The last part may be a tag cut off by the chunk boundary; keep it.
+        pending = parts.pop()
+        for part in parts:
+            tag, _, text = part.partition(">")
+            if tag:
+                yield tag.strip().upper(), text.strip()
+    if pending:
+        tag, _, text = pending.partition(">")
+        yield tag.strip().upper(), text.strip()
+
+
+def iter_ofx_items(chunks: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """Yield one import payload per OFX ``STMTTRN`` block."""
+    today = date.today().isoformat()
+    transaction: dict[str, str] | None = None
+    seen_header = False
+    for tag, text in _ofx_tokens(chunks):
+        if tag == "OFX":
+            seen_header = True
+        elif tag == "STMTTRN":
+            transaction = {}
+        elif tag == "/STMTTRN" and transaction is not None:
+            item = _ofx_item(transaction, today)
+            transaction = None
+            if item is not None:
+                yield item
+        elif transaction is not None and not tag.startswith("/"):
+            transaction[tag] = text
+    if not seen_header:
+        raise StatementFormatError("The statement is not an OFX file.")
+
+
+def _ofx_item(fields: dict[str, str], today: str) -> dict[str, Any] | None:
+    signed = parse_amount(fields.get("TRNAMT", ""))
+    if not signed:
+        return None
+    kind = fields.get("TRNTYPE", "")
+    transaction_type = infer_type(kind, debit=signed < 0, credit=signed > 0)
+    title = fields.get("NAME") or fields.get("MEMO") or "Imported transaction"
+    posted = fields.get("DTPOSTED", "")[:8]
+    item = {
+        "title": title[:255],
+        "amount": abs(signed),
+        "category": map_category("", transaction_type, f"{title} {fields.get('MEMO', '')}"),
+        "transaction_type": transaction_type,
+        "date": parse_date(posted) or today,
+        "merchant": fields.get("NAME") or None,
+        "description": fields.get("MEMO") or None,
+    }
+    if fitid := fields.get("FITID"):
+        # The bank's own transaction id tells genuine same-day repeats apart.
+        item["import_fingerprint"] = hashlib.sha256(f"ofx|{fitid}|{posted}|{signed}".encode()).hexdigest()
+    return item
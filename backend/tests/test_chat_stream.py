@@ -0,0 +1,32 @@
+import json
+
+from backend.chat_stream import ReplyExtractor, sse_event
+
+
+def feed_all(text, size):
+    extractor = ReplyExtractor()
+    deltas = [extractor.feed(text[index:index + size]) for index in range(0, len(text), size)]
+    return extractor, "".join(deltas)
+
+
+def test_reply_text_is_decoded_across_any_chunk_boundary():
+    action = {"intent": "chat", "ready_to_add": False, "transaction": None, "reply": 'Spent "₹1,200"\non food 🍕 \\ ok'}
+    text = json.dumps(action)
+
+    for size in (1, 2, 3, 7, len(text)):
+        extractor, reply = feed_all(text, size)
+        assert reply == action["reply"]
+        assert extractor.complete
+        assert not extractor.adds_transaction()
+
+
+def test_ready_add_is_recognised_before_its_reply():
+    text = '{"intent": "add_transaction", "ready_to_add": true, "transaction": {"title": "Tea"}, "reply": "Adding"}'
+
+    extractor, _reply = feed_all(text, 4)
+
+    assert extractor.adds_transaction()
+
+
+def test_sse_event_keeps_payload_on_one_data_line():
+    assert sse_event("delta", {"text": "a\nb"}) == 'event: delta\ndata: {"text": "a\\nb"}\n\n'
@@ -0,0 +1,54 @@
+import csv
+import gzip
+import io
+import json
+
+from backend.data_export import encode_stream, write_csv, write_json, write_ndjson
+
+
+def sections():
+    return [
+        ("profile", iter([{"user_id": "u1", "name": "Asha"}])),
+        ("transactions", iter([{"title": "Tea", "amount": 20}, {"title": "Rent", "amount": 9000}])),
+        ("merchant_rules", iter([])),
+    ]
+
+
+def same(value):
+    return value
+
+
+def test_json_export_keeps_the_original_document_shape():
+    body = b"".join(encode_stream(write_json(sections())))
+
+    assert json.loads(body) == {
+        "status": "success",
+        "export": {
+            "profile": {"user_id": "u1", "name": "Asha"},
+            "transactions": [{"title": "Tea", "amount": 20}, {"title": "Rent", "amount": 9000}],
+            "merchant_rules": [],
+        },
+    }
+
+
+def test_ndjson_and_csv_write_one_line_per_row():
+    lines = b"".join(encode_stream(write_ndjson(sections()))).decode().splitlines()
+    rows = list(csv.reader(io.StringIO(b"".join(encode_stream(write_csv(sections(), same))).decode())))
+
+    assert [json.loads(line)["section"] for line in lines] == ["profile", "transactions", "transactions"]
+    assert rows == [
+        ["section", "user_id", "name"],
+        ["profile", "u1", "Asha"],
+        ["section", "title", "amount"],
+        ["transactions", "Tea", "20"],
+        ["transactions", "Rent", "9000"],
+    ]
+
+
+def test_gzip_stream_is_flushed_in_bounded_chunks():
+    pieces = (json.dumps({"n": index}) + "\n" for index in range(50_000))
+
+    chunks = list(encode_stream(pieces, compress=True))
+
+    assert len(chunks) > 1
+    assert gzip.decompress(b"".join(chunks)).decode().count("\n") == 50_000
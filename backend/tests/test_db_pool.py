@@ -0,0 +1,88 @@
+import pytest
+
+from backend.db_pool import ConnectionPool, PoolExhausted
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, _sql):
+        self.connection.pings += 1
+        if self.connection.broken:
+            raise RuntimeError("server closed the connection")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.pings = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def test_reuses_returned_connections_without_reconnecting():
+    opened = []
+    pool = ConnectionPool(lambda: opened.append(FakeConnection()) or opened[-1], min_size=1, max_size=2)
+
+    first = pool.getconn()
+    pool.putconn(first)
+    second = pool.getconn()
+
+    assert second is first
+    assert len(opened) == 1
+    assert pool.stats()["checkouts"] == 2
+
+
+def test_exhaustion_is_bounded_and_counted():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, checkout_timeout=0)
+    pool.getconn()
+
+    with pytest.raises(PoolExhausted):
+        pool.getconn()
+
+    stats = pool.stats()
+    assert stats["exhausted_waits"] == 1
+    assert stats["exhausted_timeouts"] == 1
+    assert stats["in_use"] == 1
+
+
+def test_recycles_expired_and_unhealthy_connections():
+    clock = FakeClock()
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=2, max_lifetime=100, ping_after=10, clock=clock)
+
+    expired = pool.getconn()
+    clock.now = 150
+    pool.putconn(expired)
+    assert expired.closed and pool.stats()["idle"] == 0
+
+    stale = pool.getconn()
+    pool.putconn(stale)
+    stale.broken = True
+    clock.now = 170
+    replacement = pool.getconn()
+
+    assert replacement is not stale and stale.closed
+    assert pool.stats()["failed_health_checks"] == 1
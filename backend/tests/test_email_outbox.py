@@ -0,0 +1,127 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.email_outbox import BrevoSender, DeliveryError, deliver_batch
+
+NOW = datetime(2026, 7, 24, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def fake_brevo():
+    """A local HTTP server standing in for Brevo; queue the statuses to answer with."""
+    received, statuses = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.headers["api-key"], json.loads(body)))
+            payload = b'{"messageId": "1"}'
+            self.send_response(statuses.pop(0) if statuses else 201)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    sender = BrevoSender("key", "no-reply@example.com", url=f"http://127.0.0.1:{server.server_port}/v3/smtp/email")
+    yield sender, received, statuses
+    sender.close()
+    server.shutdown()
+
+
+def message(email_id, attempts=1, kind="welcome", reset_token_id=None, reset_expires_at=None):
+    return {
+        "email_id": email_id,
+        "kind": kind,
+        "recipient": f"{email_id}@example.com",
+        "subject": "Welcome to FinManager",
+        "text_content": "Hello",
+        "html_content": "<p>Hello</p>",
+        "attempts": attempts,
+        "reset_token_id": reset_token_id,
+        "reset_expires_at": reset_expires_at,
+    }
+
+
+def test_batch_is_sent_over_one_connection(fake_brevo):
+    sender, received, _statuses = fake_brevo
+
+    outcomes = deliver_batch([message("a"), message("b")], sender, now=NOW)
+
+    assert [(outcome.email_id, outcome.status) for outcome in outcomes] == [("a", "sent"), ("b", "sent")]
+    assert [payload["to"] for _key, payload in received] == [[{"email": "a@example.com"}], [{"email": "b@example.com"}]]
+    assert received[0][0] == "key"
+
+
+def test_server_errors_back_off_and_rejections_fail(fake_brevo):
+    sender, _received, statuses = fake_brevo
+    statuses.extend([503, 400, 503])
+
+    outcomes = deliver_batch(
+        [message("retry", attempts=2), message("bad"), message("last", attempts=6)],
+        sender,
+        now=NOW,
+        base_delay=30,
+        jitter=lambda: 1.0,
+    )
+
+    assert [(outcome.status, outcome.next_attempt_at) for outcome in outcomes] == [
+        ("pending", NOW + timedelta(seconds=60)),
+        ("failed", None),
+        ("failed", None),
+    ]
+    assert outcomes[0].error == "Brevo returned HTTP 503."
+
+
+def test_superseded_reset_email_is_cancelled_without_sending(fake_brevo):
+    sender, received, _statuses = fake_brevo
+
+    outcomes = deliver_batch([message("old", kind="password_reset")], sender, now=NOW)
+
+    assert outcomes[0].status == "cancelled"
+    assert received == []
+
+
+def test_reset_email_is_not_retried_past_its_code(fake_brevo):
+    sender, received, statuses = fake_brevo
+    statuses.extend([503, 503])
+    reset = {"kind": "password_reset", "reset_token_id": "token"}
+
+    outcomes = deliver_batch(
+        [
+            message("soon", **reset, reset_expires_at=NOW + timedelta(seconds=20)),
+            message("later", **reset, reset_expires_at=NOW + timedelta(minutes=15)),
+            message("expired", **reset, reset_expires_at=NOW),
+        ],
+        sender,
+        now=NOW,
+        base_delay=30,
+        jitter=lambda: 1.0,
+    )
+
+    assert [(outcome.status, outcome.next_attempt_at) for outcome in outcomes] == [
+        ("failed", None),
+        ("pending", NOW + timedelta(seconds=30)),
+        ("cancelled", None),
+    ]
+    assert len(received) == 2
+
+
+def test_unreachable_brevo_is_retryable():
+    sender = BrevoSender("key", "no-reply@example.com", url="http://127.0.0.1:9/v3/smtp/email", timeout=1)
+
+    with pytest.raises(DeliveryError) as error:
+        sender(message("a"))
+
+    assert error.value.retryable
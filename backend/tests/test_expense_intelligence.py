@@ -1,6 +1,14 @@
 from datetime import datetime, timedelta, timezone
 
-from backend.expense_intelligence import build_expense_insights, build_expense_story
+import pytest
+
+from backend.expense_intelligence import (
+    build_expense_insights,
+    build_expense_story,
+    expense_merchant_key,
+    expense_records,
+    rank_insights,
+)
 
 
 NOW = datetime(2026, 7, 24, tzinfo=timezone.utc)
@@ -63,3 +71,78 @@ def test_story_limits_the_user_to_three_signals():
     story = build_expense_story(results)
     assert len(story["insight_keys"]) <= 3
     assert story["headline"] == "Possible duplicate payment"
+
+
+def test_merchant_subsets_rank_like_a_full_run():
+    ledger = [
+        expense("a", "Metro", "499", 2),
+        expense("b", "Metro", "499", 1.5),
+        expense("c", "StreamCo", "199", 89),
+        expense("d", "StreamCo", "199", 59),
+        expense("e", "StreamCo", "199", 29),
+    ]
+    full = build_expense_insights(ledger, [], now=NOW)
+    per_merchant = [
+        *build_expense_insights(ledger[:2], [], now=NOW, limit=None),
+        *build_expense_insights(ledger[2:], [], now=NOW, limit=None),
+    ]
+
+    assert rank_insights(per_merchant) == full
+
+
+def test_columnar_path_matches_the_row_path():
+    pytest.importorskip("numpy")
+    ledger = [
+        expense("a", "Metro", "499", 2),
+        expense("b", "metro ", "499.00", 1.5),
+        expense("c", "StreamCo", "199", 89),
+        expense("d", "StreamCo", "199", 59),
+        expense("e", "StreamCo", "199", 29),
+        expense("f", "Gym", "500", 45),
+        expense("g", "Gym", "900", 10),
+        expense("h", "Gym", "950", 3),
+        {**expense("i", "", "120", 1), "title": "Bus"},
+    ]
+    expected = build_expense_insights(ledger, [], now=NOW, limit=None, columnar=False)
+
+    assert {item["kind"] for item in expected} == {"possible_duplicate", "recurring_expense", "price_creep"}
+    assert build_expense_insights(ledger, [], now=NOW, limit=None, columnar=True) == expected
+
+    # Late-evening UTC payments fall on the next calendar day in IST.
+    ist = timezone(timedelta(hours=5, minutes=30))
+    shifted = [{**item, "date": (item["date"] - timedelta(hours=4)).astimezone(ist)} for item in ledger]
+    expected = build_expense_insights(shifted, [], now=NOW, limit=None, columnar=False)
+    assert build_expense_insights(shifted, [], now=NOW, limit=None, columnar=True) == expected
+
+
+def test_records_from_tuple_rows_match_dict_rows():
+    ledger = [expense("a", "Metro", "499", 2), expense("b", " metro", "499.00", 1.5), expense("c", "", "80", 1)]
+    records = expense_records(
+        (
+            item["transaction_id"], item["title"], item["merchant"], item["amount"], item["date"],
+            expense_merchant_key(item["merchant"], item["title"]),
+        )
+        for item in ledger
+    )
+
+    assert [(record.merchant, record.merchant_key, record.paise) for record in records] == [
+        ("Metro", "metro", 49900),
+        ("metro", "metro", 49900),
+    ]
+    assert records[0].merchant_key is records[1].merchant_key
+    assert build_expense_insights(records, [], now=NOW) == build_expense_insights(ledger, [], now=NOW)
+    with pytest.raises(ValueError):
+        expense_records([("d", "Cafe", None, "1.005", NOW, "cafe")])
+
+
+def test_merchant_keys_follow_the_sql_function():
+    # lower(btrim(...)) keeps "ß" and trims spaces only, unlike casefold/strip.
+    assert expense_merchant_key(None, " Straße ") == "straße"
+    assert expense_merchant_key("\tUber", "Ride") == "\tuber"
+    records = expense_records([
+        ("a", None, "Straße Cafe", "120", NOW - timedelta(days=1), "straße cafe"),
+        ("b", None, "STRASSE CAFE", "120", NOW - timedelta(hours=20), "strasse cafe"),
+    ])
+
+    # Different SQL keys are different merchants, so no duplicate fires.
+    assert build_expense_insights(records, [], now=NOW) == []
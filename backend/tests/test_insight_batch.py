@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.insight_batch import generate_chunk, user_chunks
+
+NOW = datetime(2026, 7, 24, tzinfo=timezone.utc)
+
+
+def row(user_id, transaction_id, merchant, amount, days_ago):
+    return (user_id, transaction_id, merchant, merchant, amount, NOW - timedelta(days=days_ago), merchant.lower())
+
+
+def test_chunks_hold_whole_users_and_keep_users_without_expenses():
+    rows = [
+        row("u1", "a", "Metro", "499", 2),
+        row("u1", "b", "Metro", "499", 1.5),
+        ("u2", None, None, None, None, None, None),
+        row("u3", "c", "Gym", "900", 3),
+    ]
+
+    chunks = list(user_chunks(rows, 2))
+
+    assert [[user_id for user_id, _rows in chunk] for chunk in chunks] == [["u1", "u2"], ["u3"]]
+    assert [len(user_rows) for _user_id, user_rows in chunks[0]] == [2, 0]
+
+
+def test_generated_insights_are_keyed_by_merchant_and_user():
+    chunk = next(user_chunks([
+        row("u1", "a", "Metro", "499", 2),
+        row("u1", "b", "Metro", "499", 1.5),
+        row("u2", "c", "Gym", "900", 3),
+    ], 10))
+    commitments = {"u2": [{
+        "commitment_id": "rent", "title": "Rent", "expected_amount": "20000",
+        "frequency": "monthly", "next_due_date": "2026-07-25",
+    }]}
+
+    first, second = generate_chunk(chunk, commitments, NOW)
+
+    assert first.keys_by_merchant == {"metro": ["duplicate:a:b"]}
+    assert second.keys_by_merchant == {"gym": []}
+    assert [insight["kind"] for insight in second.insights] == ["upcoming_commitment"]
@@ -0,0 +1,74 @@
+from backend.instrumentation import (
+    Metrics,
+    SlowRequestProfiler,
+    Statement,
+    begin_profile,
+    end_profile,
+    statement_text,
+    timed,
+    timer,
+)
+
+
+def test_timers_record_only_inside_a_profiled_request():
+    @timed("double")
+    def double(value):
+        return value * 2
+
+    assert double(2) == 4
+    with timer("outside"):
+        pass
+
+    profile = begin_profile()
+    try:
+        assert double(3) == 6
+        with timer("double"):
+            pass
+        profile.statements.append(Statement("SELECT 1", 0.002, 1))
+    finally:
+        assert end_profile() is profile
+
+    assert list(profile.timings) == ["double"]
+    header = profile.server_timing(0.01)
+    assert header.startswith('sql;dur=2.0;desc="1 statements", double;dur=')
+    assert header.endswith("total;dur=10.0")
+
+
+def test_composed_statements_drop_their_values():
+    composed = b"INSERT INTO t (a, b)\n  VALUES ('alice@example.com', 1),('bob', 2)"
+    assert statement_text(composed) == "INSERT INTO t (a, b) VALUES ..."
+    assert statement_text("SELECT *\n  FROM t WHERE a = %s") == "SELECT * FROM t WHERE a = %s"
+
+
+def test_metrics_render_cumulative_histograms_and_gauges():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    profile = begin_profile()
+    end_profile()
+    profile.statements.append(Statement("SELECT 1", 0.05, 1))
+    for seconds in (0.05, 0.5, 5.0):
+        metrics.observe("GET", "/expense-insights", 200, seconds, profile)
+    metrics.add_timing("agent_reply", 1.5)
+
+    text = metrics.render({"db_pool": {"in_use": 2, "label": "ignored"}})
+    prefix = 'finmanager_http_request_duration_seconds_bucket{method="GET",route="/expense-insights",status="200",'
+    assert f'{prefix}le="0.1"}} 1' in text
+    assert f'{prefix}le="1.0"}} 2' in text
+    assert f'{prefix}le="+Inf"}} 3' in text
+    assert 'finmanager_sql_statements_total{route="/expense-insights"} 3' in text
+    assert 'finmanager_function_duration_seconds_total{function="agent_reply"} 1.5' in text
+    assert "finmanager_db_pool_in_use 2" in text
+    assert "label" not in text
+
+
+def test_slow_request_profiler_keeps_only_slow_samples(tmp_path):
+    profiler = SlowRequestProfiler(sample_rate=0.5, threshold=0.1, directory=str(tmp_path), rng=iter([0.9, 0.1, 0.1]).__next__)
+    assert profiler.start() is None
+
+    fast = profiler.start()
+    assert fast is not None
+    assert profiler.finish(fast, 0.01, "GET /transactions") is None
+
+    slow = profiler.start()
+    path = profiler.finish(slow, 0.25, "GET /expense-insights")
+    assert path.endswith("-250ms-GET_expense_insights.prof")
+    assert (tmp_path / path.rsplit("/", 1)[-1]).exists()
@@ -0,0 +1,60 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify, request
+
+from backend import json_encoding
+from backend.json_encoding import FastJSONProvider, to_json, to_json_bytes
+
+ROW = {
+    "transaction_id": uuid.UUID(int=7),
+    "amount": Decimal("199.50"),
+    "date": datetime(2026, 7, 1, 10, 30, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+    "next_due_date": date(2026, 8, 1),
+    "title": "Chai ₹",
+    "tags": ("a", "b"),
+    "evidence": {"count": 3, "ids": [uuid.UUID(int=1)]},
+}
+EXPECTED = {
+    "transaction_id": "00000000-0000-0000-0000-000000000007",
+    "amount": 199.5,
+    "date": "2026-07-01T10:30:00+05:30",
+    "next_due_date": "2026-08-01",
+    "title": "Chai ₹",
+    "tags": ["a", "b"],
+    "evidence": {"count": 3, "ids": ["00000000-0000-0000-0000-000000000001"]},
+}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_encoding, "orjson", None)
+    return request.param
+
+
+def test_rows_encode_as_the_api_always_returned_them(encoder):
+    text = to_json(ROW)
+    assert json.loads(text) == EXPECTED
+    assert list(json.loads(text)) == list(ROW)
+    assert to_json_bytes(ROW) == text.encode("utf-8")
+    with pytest.raises(TypeError):
+        to_json({"unknown": object()})
+
+
+def test_provider_serves_jsonify_and_request_bodies(encoder):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.post("/echo")
+    def echo():
+        return jsonify({"status": "success", "row": ROW, "received": request.get_json()})
+
+    response = app.test_client().post("/echo", json={"amount": 20.5})
+    assert response.mimetype == "application/json"
+    assert response.get_json() == {"status": "success", "row": EXPECTED, "received": {"amount": 20.5}}
@@ -0,0 +1,66 @@
+import pytest
+
+from backend.merchant_rules import CompiledRules, merchant_text, normalise_pattern
+
+
+def rule(match_type, pattern, category):
+    return {"match_type": match_type, "merchant_pattern": normalise_pattern(match_type, pattern), "category": category}
+
+
+def test_more_specific_kinds_and_longer_patterns_win():
+    rules = CompiledRules([
+        rule("regex", r"^amzn\b", "Shopping"),
+        rule("contains", "uber", "Travel"),
+        rule("contains", "uber eats", "Food"),
+        rule("prefix", "AMZN", "Bills"),
+        rule("prefix", "amzn prime", "Others"),
+        rule("exact", "Uber", "Others"),
+    ])
+
+    def category(text):
+        matched = rules.match(merchant_text({"merchant": text}))
+        return matched and matched["category"]
+
+    assert category("  UBER ") == "Others"
+    assert category("POS UBER EATS 1234") == "Food"
+    assert category("uber trip help.uber.com") == "Travel"
+    assert category("AMZN Prime Video") == "Others"
+    assert category("AMZN Mktp UK") == "Bills"
+    assert category("Cafe Nero") is None
+    assert len(rules) == 6
+
+
+def test_contains_automaton_follows_failure_links():
+    rules = CompiledRules([rule("contains", "she", "Food"), rule("contains", "hers", "Bills"), rule("contains", "his", "Rent")])
+
+    assert rules.match("ushers")["category"] == "Bills"
+    assert rules.match("this")["category"] == "Rent"
+    assert rules.match_many(["ushe", "nope", "ushe"]) == [rules.match("ushe"), None, rules.match("ushe")]
+    assert merchant_text({"merchant": "", "title": " Tesco "}) == "tesco"
+
+
+def test_risky_regexes_saved_before_the_checks_are_skipped():
+    legacy = {"match_type": "regex", "merchant_pattern": r"(a|a)*b", "category": "Food"}
+    rules = CompiledRules([legacy, rule("regex", "^a", "Bills")])
+
+    assert len(rules) == 1
+    assert rules.match("a" * 40)["category"] == "Bills"
+
+
+@pytest.mark.parametrize("match_type, pattern", [
+    ("fuzzy", "tesco"),
+    ("regex", "(unclosed"),
+    ("regex", r"(\w+)+$"),
+    ("regex", r"(a|a)*b"),
+    ("regex", r"((a|b)c)*"),
+    ("regex", r"\w*\w*\w*x"),
+    ("regex", "a?" * 24 + "a" * 24),
+    ("regex", r"(a?){20}a{20}"),
+    ("regex", r"(a|b){2}"),
+    ("regex", "(a|a)" * 3 + "b"),
+    ("regex", "a" * 101),
+    ("exact", "   "),
+])
+def test_invalid_patterns_are_refused(match_type, pattern):
+    with pytest.raises(ValueError):
+        normalise_pattern(match_type, pattern)
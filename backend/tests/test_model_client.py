@@ -0,0 +1,52 @@
+import pytest
+
+from backend.model_client import ModelClients
+
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeModel:
+    def __init__(self, temperature):
+        self.temperature = temperature
+        self.fail = False
+
+    def invoke(self, prompt):
+        if self.fail:
+            raise TimeoutError("model timed out")
+        return Reply(f"{prompt}@{self.temperature}")
+
+    def stream(self, prompt):
+        for word in prompt.split():
+            yield Reply(word)
+
+
+def test_clients_are_built_once_per_temperature_and_reused():
+    created = []
+    clients = ModelClients(lambda temperature: created.append(temperature) or FakeModel(temperature))
+    clients.warm([0.1, 0.0])
+
+    assert clients.invoke("hi", temperature=0.1) == "hi@0.1"
+    assert list(clients.stream("a b c", temperature=0.0)) == ["a", "b", "c"]
+    assert clients.client(0.1) is clients.client(0.1)
+    assert created == [0.1, 0.0]
+
+
+def test_failures_and_latency_are_recorded():
+    ticks = iter(range(100))
+    clients = ModelClients(FakeModel, clock=lambda: next(ticks))
+    clients.invoke("ok", temperature=0.1)
+    clients.client(0.1).fail = True
+    with pytest.raises(TimeoutError):
+        clients.invoke("slow", temperature=0.1)
+    stream = clients.stream("x y", temperature=0.1)
+    next(stream)
+    stream.close()
+    clients.record_timeout()
+
+    stats = clients.stats()
+    assert (stats["calls"], stats["errors"], stats["timeouts"], stats["clients_created"]) == (3, 1, 1, 1)
+    assert stats["latency_max_seconds"] is not None
+    assert stats["first_chunk_p50_seconds"] is not None
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import bcrypt
+import pytest
+
+from backend.password_hashing import HasherBusy, PasswordHasher, hash_cost
+
+
+def test_inline_hasher_verifies_existing_hashes_and_rehashes_other_costs():
+    hasher = PasswordHasher(rounds=5, workers=0)
+    # Flask-Bcrypt stored plain $2b$ strings, so old accounts keep working.
+    legacy = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(rounds=4)).decode()
+
+    assert hasher.verify_and_update("wrong horse", legacy) == (False, None)
+    matches, new_hash = hasher.verify_and_update("correct horse", legacy)
+    assert matches and hash_cost(new_hash) == 5
+    assert hasher.verify_and_update("correct horse", new_hash) == (True, None)
+    assert hasher.stats()["rehashes"] == 1
+
+
+def test_passwords_longer_than_bcrypt_reads_still_round_trip():
+    hasher = PasswordHasher(rounds=4, workers=0)
+    long_password = "correct horse battery staple " * 4  # 116 bytes
+    hashed = hasher.hash(long_password)
+
+    assert hasher.verify(long_password, hashed)
+    assert not hasher.verify("x" + long_password, hashed)
+    # A hash from a release that cut the password itself still verifies.
+    legacy = bcrypt.hashpw(long_password.encode()[:72], bcrypt.gensalt(rounds=4)).decode()
+    assert hasher.verify(long_password, legacy)
+
+
+def test_saturated_pool_rejects_instead_of_queueing():
+    hasher = PasswordHasher(rounds=4, workers=1, max_queue=0)
+    slow = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds=13)).decode()
+    try:
+        assert hasher.verify("password", hasher.hash("password"))
+        worker = threading.Thread(target=hasher.verify, args=("password", slow))
+        worker.start()
+        time.sleep(0.1)
+        with pytest.raises(HasherBusy):
+            hasher.hash("another password")
+        worker.join()
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,69 @@
+import pytest
+
+from backend.prepared_statements import QueryRegistry, numbered
+
+
+class FakeConnection:
+    def __init__(self, existing=()):
+        self.sent = []
+        self.existing = list(existing)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.connection.sent.append((query, params))
+
+    def fetchall(self):
+        return [(name,) for name in self.connection.existing]
+
+
+def test_placeholders_are_numbered_and_escaped_percent_kept():
+    assert numbered("SELECT * FROM t WHERE a = %s AND b LIKE 'x%%' AND c = ANY(%s)") == (
+        "SELECT * FROM t WHERE a = $1 AND b LIKE 'x%' AND c = ANY($2)",
+        2,
+    )
+
+
+def test_statements_are_prepared_once_per_connection():
+    registry = QueryRegistry()
+    registry.register("rule", "SELECT * FROM merchant_rules WHERE user_id = %s AND merchant_pattern = %s")
+    first, second = FakeConnection(), FakeConnection(existing=["rule"])
+
+    registry.execute(first.cursor(), "rule", ("u1", "swiggy"))
+    registry.execute(first.cursor(), "rule", ("u1", "zomato"))
+    registry.execute(second.cursor(), "rule", ("u2", "swiggy"))
+
+    assert [query for query, _params in first.sent] == [
+        "SELECT name FROM pg_prepared_statements",
+        "PREPARE rule AS SELECT * FROM merchant_rules WHERE user_id = $1 AND merchant_pattern = $2",
+        "EXECUTE rule (%s, %s)",
+        "EXECUTE rule (%s, %s)",
+    ]
+    # A connection that already has the statement is not asked to prepare it.
+    assert [query for query, _params in second.sent] == ["SELECT name FROM pg_prepared_statements", "EXECUTE rule (%s, %s)"]
+    assert registry.stats()["prepares"] == 1
+
+
+def test_disabled_registry_sends_plain_text_and_names_are_checked():
+    registry = QueryRegistry(enabled=False)
+    registry.register("all_rules", "SELECT * FROM merchant_rules")
+    connection = FakeConnection()
+    registry.execute(connection.cursor(), "all_rules")
+
+    assert connection.sent == [("SELECT * FROM merchant_rules", ())]
+    with pytest.raises(ValueError):
+        registry.register("all_rules", "SELECT 1")
+    with pytest.raises(ValueError):
+        registry.register("bad name; DROP", "SELECT 1")
@@ -0,0 +1,45 @@
+import pytest
+
+from backend.merchant_rules import CompiledRules
+from backend.rule_backfill import BackfillWorker, rule_changes
+
+CATEGORIES = {"Expense": {"Food", "Travel", "Others"}, "Income": {"Salary", "Others"}}
+
+
+def rule(rule_id, match_type, pattern, category, display_merchant=None, is_essential=None):
+    return {
+        "rule_id": rule_id, "match_type": match_type, "merchant_pattern": pattern,
+        "display_merchant": display_merchant, "category": category, "is_essential": is_essential,
+    }
+
+
+def row(transaction_id, merchant, category="Others", transaction_type="Expense", is_essential=False):
+    return {
+        "transaction_id": transaction_id, "title": merchant, "merchant": merchant, "category": category,
+        "transaction_type": transaction_type, "is_essential": is_essential,
+    }
+
+
+def test_only_rows_the_rule_wins_and_changes_are_rewritten():
+    rules = CompiledRules([
+        rule("eats", "exact", "uber eats", "Food"),
+        rule("uber", "contains", "uber", "Travel", display_merchant="Uber", is_essential=True),
+    ])
+    rows = [
+        row("t1", "POS UBER TRIP"),
+        row("t2", "Uber Eats"),
+        row("t3", "Uber", category="Travel", is_essential=True),
+        row("t4", "uber refund", transaction_type="Income"),
+        row("t5", "Tesco"),
+    ]
+
+    assert rule_changes(rows, rules, "uber", CATEGORIES) == [
+        ("t1", "Uber", "Travel", True),
+        ("t4", "Uber", "Others", True),
+    ]
+    assert rule_changes(rows, rules, "eats", CATEGORIES) == [("t2", "Uber Eats", "Food", False)]
+
+
+def test_chunks_must_hold_at_least_one_row():
+    with pytest.raises(ValueError):
+        BackfillWorker(lambda: None, CATEGORIES, chunk_size=0)
@@ -0,0 +1,53 @@
+from backend.snapshot_cache import LocalSnapshotCache, SharedSnapshotCache
+
+
+class FakeRedis:
+    """Local stand-in for the Redis get/set calls the shared cache makes."""
+
+    def __init__(self):
+        self.values = {}
+        self.down = False
+
+    def get(self, key):
+        if self.down:
+            raise ConnectionError("redis is down")
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.down:
+            raise ConnectionError("redis is down")
+        self.values[key] = value.encode()
+
+
+def test_local_cache_serves_only_the_current_version_and_evicts_lru():
+    cache = LocalSnapshotCache(max_entries=2)
+    cache.set("u1", "1:2026-07-24", {"story": "a"})
+
+    assert cache.get("u1", "1:2026-07-24") == {"story": "a"}
+    assert cache.get("u1", "2:2026-07-24") is None
+
+    cache.set("u2", "1:2026-07-24", {"story": "b"})
+    cache.get("u1", "1:2026-07-24")
+    cache.set("u3", "1:2026-07-24", {"story": "c"})
+
+    assert cache.get("u2", "1:2026-07-24") is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "stores": 3, "evictions": 1, "size": 2, "max_entries": 2}
+
+    cache.discard("u1")
+    assert cache.get("u1", "1:2026-07-24") is None
+    assert cache.stats()["size"] == 1
+
+
+def test_shared_cache_is_visible_to_other_workers_and_survives_outages():
+    redis = FakeRedis()
+    writer, reader = SharedSnapshotCache(redis), SharedSnapshotCache(redis)
+    writer.set("u1", "3:2026-07-24", {"context": {"totals": {"income": 10.0}}})
+
+    assert reader.get("u1", "3:2026-07-24") == {"context": {"totals": {"income": 10.0}}}
+    assert reader.get("u1", "4:2026-07-24") is None
+
+    redis.down = True
+    assert reader.get("u1", "3:2026-07-24") is None
+    writer.set("u1", "4:2026-07-24", {})
+    assert reader.stats() == {"hits": 1, "misses": 2, "stores": 0, "errors": 1}
+    assert writer.stats()["errors"] == 1
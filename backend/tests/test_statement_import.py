@@ -0,0 +1,64 @@
+import pytest
+
+from backend.statement_import import StatementFormatError, header_signature, iter_csv_items, iter_ofx_items
+
+
+def test_csv_header_is_found_below_preamble_and_debit_credit_set_type():
+    lines = [
+        "Account statement;;\n",
+        "Period: July 2026;;\n",
+        "Txn Date;Narration;Withdrawal Amt;Deposit Amt\n",
+        "03/07/2026;SWIGGY ORDER;450.00;\n",
+        "05/07/2026;ACME PAYROLL;;52,000.00\n",
+        "06/07/2026;Opening balance;;\n",
+    ]
+
+    items = list(iter_csv_items(lines))
+
+    assert [(item["title"], item["amount"], item["transaction_type"], item["category"]) for item in items] == [
+        ("SWIGGY ORDER", 450.0, "Expense", "Food"),
+        ("ACME PAYROLL", 52000.0, "Income", "Salary"),
+    ]
+    assert items[0]["date"] == "2026-07-03"
+
+
+def test_csv_uses_stored_profile_for_unrecognised_headers():
+    headers = ["When", "What", "Sum"]
+    profiles = {header_signature(headers): {"date": "When", "title": "What", "amount": "Sum"}}
+    lines = ["When,What,Sum\n", "2026-07-01,Corner shop,-12.50\n"]
+
+    items = list(iter_csv_items(lines, lambda row: profiles.get(header_signature(row))))
+
+    assert items == [
+        {
+            "title": "Corner shop",
+            "amount": 12.5,
+            "category": "Shopping",
+            "transaction_type": "Expense",
+            "date": "2026-07-01",
+            "merchant": "Corner shop",
+        }
+    ]
+
+
+def test_csv_without_amount_column_is_rejected():
+    with pytest.raises(StatementFormatError):
+        list(iter_csv_items(["Name,Note\n", "a,b\n"]))
+
+
+def test_ofx_parses_across_chunk_boundaries():
+    document = (
+        "OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>"
+        "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260702120000<TRNAMT>-899.00<FITID>A1<NAME>Amazon<MEMO>Order</STMTTRN>"
+        "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260703<TRNAMT>1500.00<FITID>A2<NAME>Interest</STMTTRN>"
+        "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>"
+    )
+    chunks = [document[index:index + 7] for index in range(0, len(document), 7)]
+
+    items = list(iter_ofx_items(chunks))
+
+    assert [(item["title"], item["amount"], item["transaction_type"], item["date"]) for item in items] == [
+        ("Amazon", 899.0, "Expense", "2026-07-02"),
+        ("Interest", 1500.0, "Income", "2026-07-03"),
+    ]
+    assert items[0]["import_fingerprint"] != items[1]["import_fingerprint"]
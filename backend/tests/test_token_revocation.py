@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+
+from backend.token_revocation import RevocationCache
+
+
+def at(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_answers_from_memory_until_the_refresh_interval_passes():
+    clock = FakeClock()
+    calls = []
+
+    def loader(since):
+        calls.append(since)
+        return [("revoked", at(5_000), at(900))] if since is None else []
+
+    cache = RevocationCache(loader, refresh_interval=5, clock=clock)
+
+    assert cache.is_revoked("revoked")
+    assert not cache.is_revoked("active")
+    assert calls == [None]
+
+    clock.now += 6
+    assert not cache.is_revoked("active")
+    assert len(calls) == 2 and calls[1] < at(900)
+
+
+def test_drops_revocations_once_the_token_expires():
+    clock = FakeClock()
+    cache = RevocationCache(lambda _since: [("short", at(1_003), at(990))], refresh_interval=5, clock=clock)
+
+    assert cache.is_revoked("short")
+    clock.now = 1_010
+    assert not cache.is_revoked("short")
+    assert len(cache) == 0
+
+
+def test_fails_closed_when_it_cannot_refresh_within_the_staleness_bound():
+    clock = FakeClock()
+    healthy = [True]
+
+    def loader(_since):
+        if not healthy[0]:
+            raise ConnectionError("database unavailable")
+        return []
+
+    cache = RevocationCache(loader, refresh_interval=5, max_staleness=30, clock=clock)
+    assert not cache.is_revoked("active")
+
+    healthy[0] = False
+    clock.now += 10
+    assert not cache.is_revoked("active")
+    clock.now += 25
+    assert cache.is_revoked("active")
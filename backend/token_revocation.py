@@ -0,0 +1,95 @@
+"""In-process cache of revoked JWT ids.
+
+Almost no access token is ever revoked, so asking PostgreSQL on every request
+is wasted work.  Each worker keeps the set of revoked, unexpired ``jti`` values
+in memory, bulk-loads it on first use and then polls only for rows created
+since the last refresh.  A token that is absent from a fresh set is accepted
+without touching the database; when the set cannot be refreshed within the
+staleness bound every token is treated as revoked, as before.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable
+
+# Rows are polled by ``created_at``, which PostgreSQL stamps at transaction
+# start.  Re-reading a short overlap catches a logout that committed after a
+# later-stamped one was already seen.
+POLL_OVERLAP = timedelta(seconds=30)
+
+RevocationRow = tuple[str, datetime, datetime]
+
+
+class RevocationCache:
+    """Hash set of revoked ``jti`` values, each dropped once its token expires.
+
+    ``loader(since)`` returns ``(jti, expires_at, created_at)`` rows for
+    unexpired revocations, limited to rows created after ``since`` when it is
+    not ``None``.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[datetime | None], Iterable[RevocationRow]],
+        *,
+        refresh_interval: float = 5.0,
+        max_staleness: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self._clock = clock
+        self._revoked: dict[str, float] = {}
+        self._watermark: datetime | None = None
+        self._refreshed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _stale(self, now: float) -> bool:
+        return now - self._refreshed_at > self.max_staleness
+
+    def refresh(self) -> bool:
+        """Poll for new revocations; return whether the cache is now current."""
+        # While the set is still within its staleness bound, one thread
+        # refreshes and the rest keep answering from memory.
+        if not self._lock.acquire(blocking=self._stale(self._clock())):
+            return True
+        try:
+            since = self._watermark - POLL_OVERLAP if self._watermark else None
+            try:
+                rows = list(self._loader(since))
+            except Exception:
+                return False
+            now = self._clock()
+            for jti, expires_at, created_at in rows:
+                self._revoked[jti] = expires_at.timestamp()
+                if self._watermark is None or created_at > self._watermark:
+                    self._watermark = created_at
+            for jti, expiry in list(self._revoked.items()):
+                if expiry <= now:
+                    self._revoked.pop(jti, None)
+            self._refreshed_at = now
+            return True
+        finally:
+            self._lock.release()
+
+    def add(self, jti: str, expires_at: float) -> None:
+        """Record a revocation made by this process without waiting for a poll."""
+        self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti: str) -> bool:
+        now = self._clock()
+        if now - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+            now = self._clock()
+        if self._stale(now):
+            return True
+        expiry = self._revoked.get(jti)
+        return expiry is not None and expiry > now
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+